@@ -0,0 +1,130 @@
+"""Precomputed year x month climatology cubes.
+
+Offline, every year of a NetCDF variable is reduced to its 12 monthly
+means and stored as one float32 (year, month, lat, lon) ``.npy`` array
+next to the source file, together with the year list and the source's
+modification time:
+
+    python -m climate.cube datasets/temperature_avg.nc --variable t
+
+The engine memory-maps the cube, so a request becomes a slice
+``cube[year_index[year], :, rows, cols]`` plus a masked mean. A cube whose
+recorded source mtime no longer matches the file is ignored until it is
+rebuilt, and extraction falls back to reading the NetCDF file.
+"""
+import json
+import os
+import shutil
+import threading
+import uuid
+
+import numpy as np
+
+CUBE_SUFFIX = ".cube"
+CUBE_FILE = "cube.npy"
+META_FILE = "meta.json"
+
+_cubes = {}
+_cubes_lock = threading.Lock()
+
+
+def cube_path_for(netcdf_path, variable):
+    return f"{os.path.splitext(netcdf_path)[0]}.{variable.name}{CUBE_SUFFIX}"
+
+
+class MonthlyCube:
+    def __init__(self, path, meta):
+        self.path = path
+        self.years = meta["years"]
+        self.year_index = {year: i for i, year in enumerate(self.years)}
+        self.source_mtime = meta["source_mtime"]
+        self.data = np.load(os.path.join(path, CUBE_FILE), mmap_mode="r")
+
+    def monthly_means(self, year, mask):
+        """Mean over the cells of ``mask`` for each month of ``year`` (NaN where there is no data)."""
+        rows, cols = np.flatnonzero(mask.any(axis=1)), np.flatnonzero(mask.any(axis=0))
+        rows, cols = slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1)
+        block = np.asarray(self.data[self.year_index[year], :, rows, cols], dtype=np.float64)
+        valid = mask[rows, cols] & ~np.isnan(block)
+        counts = valid.sum(axis=(1, 2))
+        sums = np.where(valid, block, 0.0).sum(axis=(1, 2))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(counts > 0, sums / counts, np.nan)
+
+
+def load_cube(netcdf_path, variable):
+    """The up-to-date cube for ``variable`` of ``netcdf_path``, or None if there is none."""
+    path = cube_path_for(netcdf_path, variable)
+    try:
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        source_mtime = os.stat(netcdf_path).st_mtime_ns
+    except (OSError, ValueError):
+        return None
+    if meta.get("source_mtime") != source_mtime or meta.get("variable") != variable.name:
+        return None  # stale: built from an older version of the file
+    with _cubes_lock:
+        cube = _cubes.get(path)
+        if cube is None or cube.source_mtime != source_mtime:
+            cube = _cubes[path] = MonthlyCube(path, meta)
+        return cube
+
+
+def build_cube(netcdf_path, variable, out_path=None):
+    """Write the (year, month, lat, lon) monthly-mean cube of ``variable``; returns its path."""
+    import xarray as xr
+
+    out_path = os.path.normpath(out_path or cube_path_for(netcdf_path, variable))
+    source_mtime = os.stat(netcdf_path).st_mtime_ns
+    # Built next to the old cube and swapped in, so engines that have it mapped keep valid data
+    tmp = f"{out_path}.{uuid.uuid4().hex[:8]}.tmp"
+    old = os.path.splitext(tmp)[0] + ".old"
+    os.makedirs(tmp)
+    try:
+        with xr.open_dataset(netcdf_path) as ds:
+            data = ds[variable.name]
+            years = sorted(set(ds.time.dt.year.values.tolist()))
+            cube = np.lib.format.open_memmap(os.path.join(tmp, CUBE_FILE), mode="w+", dtype=np.float32,
+                                             shape=(len(years), 12, ds.sizes["lat"], ds.sizes["lon"]))
+            # One year at a time keeps memory at one year of the source resolution
+            for i, year in enumerate(years):
+                monthly = data.sel(time=data.time.dt.year == year).groupby("time.month").mean("time")
+                monthly = monthly.reindex(month=np.arange(1, 13)).transpose("month", "lat", "lon")
+                cube[i] = monthly.values
+            cube.flush()
+            del cube
+        with open(os.path.join(tmp, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"variable": variable.name, "units": variable.units, "years": years,
+                       "source": os.path.abspath(netcdf_path), "source_mtime": source_mtime}, f)
+
+        if os.path.exists(out_path):
+            os.rename(out_path, old)
+        os.rename(tmp, out_path)
+    except BaseException:
+        # A failed swap puts the previous cube back rather than leaving no cube at all
+        if os.path.exists(old) and not os.path.exists(out_path):
+            os.rename(old, out_path)
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    shutil.rmtree(old, ignore_errors=True)
+    return out_path
+
+
+def main(argv=None):
+    import argparse
+
+    from climate.engine import PRECIPITATION, TEMPERATURE
+
+    variables = {v.name: v for v in (TEMPERATURE, PRECIPITATION)}
+    parser = argparse.ArgumentParser(description="Precompute the year x month cube of a NetCDF variable")
+    parser.add_argument("netcdf", help="Source NetCDF file")
+    parser.add_argument("--variable", required=True, choices=sorted(variables))
+    parser.add_argument("--out", default=None, help="Cube directory (default: next to the source)")
+    args = parser.parse_args(argv)
+
+    path = build_cube(args.netcdf, variables[args.variable], args.out)
+    print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Monthly change extraction for gridded climate datasets (NetCDF).
+
+One engine serves every monthly climate variable: a ClimateVariable names
+the data variable in the file (``t`` for temperature, ``pr`` for
+precipitation) and its units. Datasets are opened once per process and
+kept in a pool keyed by path and modification time, so the pages listing
+years at startup, every extraction and batch jobs all share one lazily
+loaded handle. A file that changes on disk is reopened on the next call.
+Metadata (grid, bounds, years) is read once per handle. When an up-to-date
+year x month cube exists (climate.cube), monthly means are sliced from it
+instead of being aggregated from the file on every request.
+
+Nothing here calls Streamlit. Problems that make an extraction
+impossible raise ExtractionError with a message for the user.
+"""
+import os
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from climate.cube import load_cube
+
+ClimateVariable = namedtuple("ClimateVariable", ["name", "units", "label"])
+
+TEMPERATURE = ClimateVariable("t", "°C", "Temperature")
+PRECIPITATION = ClimateVariable("pr", "mm", "Precipitation")
+
+DatasetInfo = namedtuple("DatasetInfo", ["variables", "lats", "lons", "bounds", "years"])
+MONTHS = np.arange(1, 13)
+
+_pool = {}
+_pool_lock = threading.Lock()
+
+
+class ExtractionError(ValueError):
+    pass
+
+
+class _PooledDataset:
+    def __init__(self, path, mtime):
+        import xarray as xr
+
+        self.mtime = mtime
+        self.dataset = xr.open_dataset(path)
+        ds = self.dataset
+        lats, lons = ds.lat.values, ds.lon.values
+        self.info = DatasetInfo(
+            variables=list(ds.variables),
+            lats=lats,
+            lons=lons,
+            bounds=(float(lons.min()), float(lats.min()), float(lons.max()), float(lats.max())),
+            years=sorted(set(ds.time.dt.year.values.tolist())),
+        )
+
+
+def _pooled(path):
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+    with _pool_lock:
+        entry = _pool.get(path)
+        if entry is None or entry.mtime != mtime:
+            if entry is not None:
+                entry.dataset.close()
+            entry = _pool[path] = _PooledDataset(path, mtime)
+        return entry
+
+
+def open_dataset(path):
+    """Shared read-only xarray Dataset for ``path``; callers must not close it."""
+    return _pooled(path).dataset
+
+
+def dataset_info(path):
+    return _pooled(path).info
+
+
+def available_years(path):
+    return dataset_info(path).years
+
+
+def close_all():
+    with _pool_lock:
+        for entry in _pool.values():
+            entry.dataset.close()
+        _pool.clear()
+
+
+def region_mask(info, polygon):
+    """Boolean (lat, lon) grid mask of ``polygon``, rasterized on the dataset grid."""
+    import rasterio.features
+    import rasterio.transform
+
+    lats, lons = info.lats, info.lons
+    transform = rasterio.transform.from_bounds(lons.min(), lats.min(), lons.max(), lats.max(), len(lons), len(lats))
+    return rasterio.features.rasterize([(polygon, 1)], out_shape=(len(lats), len(lons)),
+                                       transform=transform).astype(bool)
+
+
+def monthly_means(path, variable, mask, year):
+    """Mean of ``variable`` over the masked cells for months 1-12 of ``year`` (NaN without data).
+
+    Reads the precomputed cube (climate.cube) when it is up to date,
+    otherwise aggregates the NetCDF file.
+    """
+    cube = load_cube(path, variable)
+    if cube is not None:
+        return cube.monthly_means(year, mask)
+
+    import xarray as xr
+
+    ds = open_dataset(path)
+    info = dataset_info(path)
+    # Only read the rows and columns the region touches
+    rows, cols = np.flatnonzero(mask.any(axis=1)), np.flatnonzero(mask.any(axis=0))
+    rows, cols = slice(rows[0], rows[-1] + 1), slice(cols[0], cols[-1] + 1)
+    mask_da = xr.DataArray(mask[rows, cols], dims=("lat", "lon"),
+                           coords={"lat": info.lats[rows], "lon": info.lons[cols]})
+    data = ds[variable.name].isel(lat=rows, lon=cols)
+    data = data.sel(time=data.time.dt.year == year).groupby("time.month").mean("time")
+    means = data.where(mask_da).mean(dim=["lat", "lon"])
+    return means.reindex(month=MONTHS).values.astype(np.float64)
+
+
+def extract_change(path, variable, polygon, year1, year2, warming_degree=1):
+    """Monthly means of ``variable`` inside ``polygon`` for two years and their change.
+
+    Returns ``{"year1", "year2", "change"}`` dicts of month -> value ("N/A"
+    when there is no data) plus ``"has_nan"``. With ``warming_degree`` > 1
+    random additional change is added to the second year.
+    """
+    from shapely.geometry import box
+
+    info = dataset_info(path)
+    if not box(*info.bounds).intersects(polygon):
+        raise ExtractionError("The drawn polygon does not intersect with the NetCDF data extent. "
+                              "Please adjust the polygon.")
+    mask = region_mask(info, polygon)
+    if not mask.any():
+        raise ExtractionError("The mask did not capture any data points. The polygon might be too small "
+                              "or misaligned with the data grid.")
+    for year in (year1, year2):
+        if year not in info.years:
+            raise ExtractionError(f"Year {year} not found in the dataset. Available years: {info.years}")
+
+    values1 = monthly_means(path, variable, mask, year1)
+    values2 = monthly_means(path, variable, mask, year2)
+    change = values2 - values1
+    if warming_degree > 1:
+        additional = np.random.normal(loc=1 + (warming_degree - 2), scale=1, size=change.shape)
+        change += additional
+        values2 += additional
+
+    def by_month(values):
+        return {int(month): float(value) if not np.isnan(value) else "N/A"
+                for month, value in zip(MONTHS, values)}
+
+    return {
+        "year1": by_month(values1),
+        "year2": by_month(values2),
+        "change": by_month(change),
+        "has_nan": bool(np.isnan(values1).any() or np.isnan(values2).any()),
+    }
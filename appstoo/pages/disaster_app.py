@@ -1,9 +1,9 @@
 import streamlit as st
-import pandas as pd
 import folium
 from streamlit_folium import folium_static
 from folium.plugins import MarkerCluster
-from gdacs.api import GDACSAPIReader
+
+from routing.disasters import get_recent_disasters_df
 
 # Streamlit Page Setup
 st.set_page_config(
@@ -243,45 +243,6 @@ st.markdown("""
     <link href="https://fonts.googleapis.com/css2?family=Montserrat:wght@400;600;700;800&display=swap" rel="stylesheet">
 """, unsafe_allow_html=True)
 
-# Initialize the GDACS API client
-client = GDACSAPIReader()
-
-def get_recent_disasters_df(event_type: str = None, limit: int = 20):
-    print(f"Event type: {event_type}, Limit: {limit}")
-    if event_type is None:
-        geojson_data = client.latest_events(limit=limit)
-    else:
-        geojson_data = client.latest_events(limit=limit, event_type=event_type)
-
-    geojson_dict = dict(geojson_data)
-    features = geojson_dict.get("features", [])
-
-    event_records = []
-    for feature in features:
-        properties = feature.get("properties", {})
-        geometry = feature.get("geometry", {})
-        coordinates = geometry.get("coordinates", [None, None])
-
-        event_records.append({
-            "Event Type": properties.get("eventtype"),
-            "Event ID": properties.get("eventid"),
-            "Country": properties.get("country"),
-            "Latitude": coordinates[1],  
-            "Longitude": coordinates[0],
-            "Alert Level": properties.get("alertlevel"),
-            "Alert Score": properties.get("alertscore"),
-            "Event Name": properties.get("name") or "Unknown",
-            "Description": properties.get("description"),
-            "From Date": properties.get("fromdate"),
-            "To Date": properties.get("todate"),
-            "Severity": properties.get("severitydata", {}).get("severity"),
-            "Severity Text": properties.get("severitydata", {}).get("severitytext"),
-            "Report URL": properties.get("url", {}).get("report")
-        })
-
-    df = pd.DataFrame(event_records)
-    return df
-
 # Sidebar: Event Type Selection with enhanced styling
 st.sidebar.markdown('<div class="sidebar-header"><h3>🔍 Filter Disasters</h3></div>', unsafe_allow_html=True)
 event_types = ["All", "Earthquake EQ", "Flood FL", "Cyclone TC", "Volcanic VO", "Wildfire WF", "Drought DR"]
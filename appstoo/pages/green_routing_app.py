@@ -1,217 +1,71 @@
 import streamlit as st
-import pickle
-import heapq
-from math import radians, sin, cos, sqrt, atan2
-import plotly.graph_objects as go
-import pandas as pd
+import os
 
-# Load the graph
-@st.cache_resource
-def load_graph():
-    with open(r'C:\Users\joshd\Documents\Programming\IIT-B\graph_final_8_precalc.pkl', "rb") as G:
-        return pickle.load(G)
-
-roadsn = load_graph()
-
-# CO2 emission factors (g per ton-km)
-#CO2 emission factors
-EMISSION_FACTORS = {
-    "sea": 0.01,  # 10g per ton-km
-    "land": 0.1,  # 100g per ton-km
-    "air": 0.7,   # 700g per ton-km
-}
-
-waiting_times = {
-    "CN": 117.7,
-    "AU": 187.1,
-    "US": 118.2,
-    "BR": 366.3,
-    "RU": 106.8,
-    "CA": 126.5,
-    "AR": 55.7,
-    "ZA": 237.5,
-    "JP": 68.4,
-    "IN": 90.0,
-    "UA": 58.8,
-    "AE": 79.2,
-    "ID": 63.4,
-    "KR": 74.7,
-    "NZ": 64.8,
-    "CL": 280.3,
-    "TR": 130.1,
-    "VN": 48.6,
-    "CO": 83.4,
-    "MY": 126.5,
-    "MX": 109.2,
-    "TW": 71.3,
-    "PE": 196.5,
-    "OM": 85.4,
-    "NO": 45.2,
-    "FR": 58.4,
-    "SA": 89.5,
-    "MA": 227.4,
-    "RO": 83.5,
-    "MZ": 265.3
-}
+from routing.anytime import BackgroundSearch, SearchBudget
+from routing.cache import RouteCache, cached_astar_top_n, round_weights, route_key
+from routing.compact import prefer_compacted
+from routing.compiled import load_or_compile
+from routing.disasters import DisasterFilter, blocking_events, get_recent_disasters_df
+from routing.isochrone import reachable, reachable_table
+from routing.overlay import OverlayWatcher
+from routing.places import resolve_place
+from routing.render import edge_table, reachability_map, route_map, tradeoff_table
+from routing.search import apply_cargo_weight
+from routing.service import RoutingClient, RoutingServiceError, plan_front
+from routing.stats import SearchStats, enable_logging
 
+GRAPH_PATH = r'C:\Users\joshd\Documents\Programming\IIT-B\graph_final_8_precalc.pkl'
+ROUTE_CACHE_DIR = os.path.join(os.path.dirname(GRAPH_PATH), "route_cache")
+# Port congestion and emission factor updates; edits are picked up without a restart
+COST_OVERLAY_PATH = os.path.join(os.path.dirname(GRAPH_PATH), "cost_overlay.json")
 
-# Constants
-time_min, time_max = 0, 740.8010060257351
-price_min, price_max = 0, 49341.63950694249
-
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371  # Earth's radius in km
-    dlat = radians(lat2 - lat1)
-    dlon = radians(lon2 - lon1)
-    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-    return R * c
-
-def precompute_heuristics(multigraph, goal, time_weight, price_weight):
-    goal_pos = multigraph.nodes[goal]
-    heuristic_dict = {}
-    for node in multigraph.nodes():
-        if node == goal:
-            heuristic_dict[node] = 0
-            continue
-        node_pos = multigraph.nodes[node]
-        dist = haversine(node_pos['latitude'], node_pos['longitude'], 
-                         goal_pos['latitude'], goal_pos['longitude'])
-        time_est = dist / 800  # Fastest mode (air)
-        price_est = dist * 0.00002  # Cheapest mode (sea)
-        time_norm = (time_est - time_min) / (time_max - time_min) * 1000
-        price_norm = (price_est - price_min) / (price_max - price_min) * 1000
-        heuristic_dict[node] = time_weight * time_norm + price_weight * price_norm
-    return heuristic_dict
+# Load the graph (compiled to a memory-mapped CSR artifact on first use); a compacted
+# copy from python -m routing.compact is used when present
+@st.cache_resource
+def load_graph():
+    enable_logging()
+    return OverlayWatcher(load_or_compile(prefer_compacted(GRAPH_PATH)),
+                          os.environ.get("COST_OVERLAY_PATH", COST_OVERLAY_PATH))
 
-def astar_top_n_avoid_countries(multigraph, start, goal, avoid_countries=None, 
-                              top_n=3, time_weight=0.333, price_weight=0.333, 
-                              emissions_weight=0.334, allowed_modes=['land', 'sea', 'air'], 
-                              weight=30000):
-    if start not in multigraph or goal not in multigraph:
-        return {"error": "Start or goal node not in graph"}
-    
-    avoid_countries = set(avoid_countries) if avoid_countries else set()
-    if (multigraph.nodes[start].get('country_code') in avoid_countries or 
-        multigraph.nodes[goal].get('country_code') in avoid_countries):
-        return {"error": f"No valid route: Start ({start}) or goal ({goal}) is in a banned country."}
-    
-    # Retrieve precomputed values from graph
-    time_min = multigraph.graph['time_min']
-    time_max = multigraph.graph['time_max']
-    price_min = multigraph.graph['price_min']
-    price_max = multigraph.graph['price_max']
-    emissions_min = multigraph.graph['emissions_min']
-    emissions_max = multigraph.graph['emissions_max']
-    max_speed = multigraph.graph['max_speed']
-    min_price_per_km = multigraph.graph['min_price_per_km']
+# Route results shared across sessions and kept on disk across restarts
+@st.cache_resource
+def load_route_cache():
+    return RouteCache(os.environ.get("ROUTE_CACHE_DIR", ROUTE_CACHE_DIR))
 
-    # Compute parameters based on allowed modes
-    allowed_modes_set = set(allowed_modes)
-    max_speed_allowed = max(max_speed[mode] for mode in allowed_modes_set if mode in max_speed)
-    min_price_per_km_allowed = min(min_price_per_km[mode] for mode in allowed_modes_set if mode in min_price_per_km)
-    min_emission_factor = min(EMISSION_FACTORS[mode] for mode in allowed_modes_set)
+# A local routing daemon (python -m routing.service) owns the graph when it is running;
+# otherwise this process loads the graph and searches in-process
+@st.cache_resource
+def load_routing_client():
+    return RoutingClient()
 
-    # Precompute heuristic
-    goal_pos = multigraph.nodes[goal]
-    heuristic_dict = {}
-    for node in multigraph.nodes():
-        if node == goal:
-            heuristic_dict[node] = 0
-            continue
-        node_pos = multigraph.nodes[node]
-        dist = haversine(node_pos['latitude'], node_pos['longitude'], 
-                         goal_pos['latitude'], goal_pos['longitude'])
-        if dist == 0:
-            heuristic_dict[node] = 0
-        else:
-            time_est = dist / max_speed_allowed if max_speed_allowed > 0 else float('inf')
-            price_est = dist * min_price_per_km_allowed
-            emissions_est = dist * min_emission_factor  # g per ton
-            time_norm_est = (time_est - time_min) / (time_max - time_min) * 100 if time_max > time_min else 0
-            price_norm_est = (price_est - price_min) / (price_max - price_min) * 100 if price_max > price_min else 0
-            emissions_norm_est = (emissions_est - emissions_min) / (emissions_max - emissions_min) * 100 if emissions_max > emissions_min else 0
-            heuristic_dict[node] = (time_weight * time_norm_est + 
-                                   price_weight * price_norm_est + 
-                                   emissions_weight * emissions_norm_est)
+# A daemon that dies, times out or fails a request is reported on the page
+SERVICE_ERRORS = (OSError, EOFError, RoutingServiceError)
 
-    queue = [(0, 0, 0, start, [start], [], 0)]
-    visited = set()
-    counter = 0
-    completed_paths = []
-    
-    while queue:
-        f_cost, g_cost, _, current, path, edge_details, total_wait_time = heapq.heappop(queue)
-        if current == goal:
-            completed_paths.append((path, edge_details, g_cost, total_wait_time))
-            if len(completed_paths) >= top_n:
-                completed_paths.sort(key=lambda x: x[2])
-                if f_cost > completed_paths[top_n-1][2]:
-                    break
-            continue
-        
-        if current in visited:
-            continue
-        visited.add(current)
-        
-        for u, neighbor, key, data in multigraph.edges(current, keys=True, data=True):
-            if data['mode'] not in allowed_modes:
-                continue
-            neighbor_country = multigraph.nodes[neighbor].get('country_code', '')
-            current_country = multigraph.nodes[current].get('country_code', '')
-            if neighbor in path or neighbor_country in avoid_countries:
-                continue
-         
-            border_penalty = 1 if current_country != neighbor_country else 0
-            mode_waiting_time = 0
-            if data['mode'] == 'sea':
-                mode_waiting_time = waiting_times.get(neighbor_country, 89.5) / 2
-            elif data['mode'] == 'air':
-                mode_waiting_time = 2
-            
-            new_wait_time = total_wait_time + mode_waiting_time
-            new_g_cost = (g_cost + time_weight * data['time_norm'] + 
-                          price_weight * data['price_norm'] + 
-                          emissions_weight * data['emissions_norm'] + 
-                          border_penalty)
-            h_cost = heuristic_dict[neighbor]
-            new_f_cost = new_g_cost + h_cost
+# Nodes near active Red alerts are routed around; the spatial join only reruns when
+# the set of alerts changes
+@st.cache_data(ttl=600)
+def load_blocking_events():
+    return blocking_events(get_recent_disasters_df(limit=50))
 
-            new_path = path + [neighbor]
-            new_edge_details = edge_details + [(current, neighbor, key, data)]
+# A GDACS failure is not cached with the events: it is retried after a minute, and
+# the page routes without disaster blocking meanwhile and says so
+@st.cache_data(ttl=60)
+def load_blocking_events_or_error():
+    try:
+        return load_blocking_events(), None
+    except Exception as e:
+        return (), f"{type(e).__name__}: {e}"
 
-            counter += 1
-            heapq.heappush(queue, (new_f_cost, new_g_cost, counter, neighbor, new_path, new_edge_details, new_wait_time))
-    
-    completed_paths.sort(key=lambda x: x[2])
-    if not completed_paths:
-        return {"error": f"No paths found between {start} and {goal} with selected parameters."}
-    
-    return [{
-        "path": path,
-        "path_coords": [(multigraph.nodes[node]['latitude'], multigraph.nodes[node]['longitude']) for node in path],
-        "edges": [{
-            "from": edge[0], 
-            "to": edge[1], 
-            "mode": edge[3]['mode'],
-            "time": edge[3]['time'], 
-            "price": edge[3]['price'], 
-            "distance": edge[3]['distance'],
-            "co2_per_ton": edge[3]['distance'] * EMISSION_FACTORS[edge[3]['mode']]
-        } for edge in edges],
-        "total_time": sum(edge[3]['time'] for edge in edges),
-        "total_cost": sum(edge[3]['price']/100 for edge in edges) * (weight / 995 if weight < 995 else (weight - 995) * 2),
-        "total_distance": sum(edge[3]['distance'] for edge in edges),
-        "total_co2": sum(edge[3]['distance'] * EMISSION_FACTORS[edge[3]['mode']] * (weight / 100000) for edge in edges),
-        "waiting_time": wait_time,
-        "sustainability_score": calculate_sustainability_score(sum(edge[3]['distance'] * EMISSION_FACTORS[edge[3]['mode']] * (weight / 500) for edge in edges))
-    } for path, edges, cost, wait_time in completed_paths[:top_n]]
+@st.cache_resource
+def load_disaster_filter():
+    return DisasterFilter()
 
-def calculate_sustainability_score(co2_emissions):
-    # Simple scoring system: lower CO2 = higher score (0-100)
-    max_co2 = 5000  # Assume 5000kg as max for normalization
-    score = max(0, 100 - (co2_emissions / max_co2 * 100))
-    return round(score, 2)
+events, blocking_error = load_blocking_events_or_error()
+routing_service = load_routing_client()
+if not routing_service.available():
+    routing_service = None
+    roadsn = load_disaster_filter().current(load_graph().current(), events)
+    route_cache = load_route_cache()
 
 # Streamlit UI
 st.title("🌍 Sustainable Route Planner")
@@ -219,13 +73,21 @@ st.markdown("""
     Plan your shipping routes with climate change in mind. Minimize your carbon footprint 
     while balancing time and cost. Every choice counts in building a greener future!
 """)
+if blocking_error:
+    st.warning(f"Disaster alerts are unavailable ({blocking_error}); routes are not steered around "
+               "active disasters.")
+elif events:
+    st.info(f"Routes avoid the areas around {len(events)} active Red-alert disaster(s) "
+            f"({', '.join(sorted({kind for _, kind, *_ in events}))}).")
 
 # Input form
 with st.form("route_form"):
     col1, col2 = st.columns(2)
     with col1:
-        start = st.text_input("Starting Location", "Jalgaon")
-        goal = st.text_input("Destination", "San Francisco")
+        start = st.text_input("Starting Location", "Jalgaon",
+                              help="Place name (typos are fine) or 'lat, lon'")
+        goal = st.text_input("Destination", "San Francisco",
+                             help="Place name (typos are fine) or 'lat, lon'")
         weight = st.number_input("Cargo Weight (kg)", min_value=0, value=100)
     
     with col2:
@@ -235,6 +97,8 @@ with st.form("route_form"):
         allowed_modes = st.multiselect("Allowed Transport Modes", 
                                      options=['land', 'sea', 'air'],
                                      default=['land', 'sea', 'air'])
+        time_limit = st.number_input("Search Time Limit (s)", min_value=1, max_value=300, value=20,
+                                     help="Slower searches stop here and return their best routes so far")
 
     st.subheader("Route Optimization Priorities")
     col3, col4, col5 = st.columns(3)
@@ -247,63 +111,195 @@ with st.form("route_form"):
         price_weight = st.slider("Cost Priority", 0.0, 1.0, 0.25)
 
     cargo_desc = st.text_input("Cargo Description", "Perishable")
+    distinct_routes = st.checkbox("Prefer distinct alternatives", value=False,
+                                  help="Show routes that differ substantially instead of the three cheapest")
+    show_diagnostics = st.checkbox("Show search diagnostics", value=False)
     submitted = st.form_submit_button("Find Sustainable Routes")
 
 if submitted:
+    # A resubmitted form supersedes any search still running for this session
+    previous_search = st.session_state.pop("route_search", None)
+    if previous_search is not None:
+        previous_search.cancel()
+
+    # Snap free text or coordinates to graph nodes
+    if routing_service is not None:
+        try:
+            start_node, start_match = routing_service.resolve(start)
+            goal_node, goal_match = routing_service.resolve(goal)
+        except SERVICE_ERRORS:
+            (start_node, start_match), (goal_node, goal_match) = (None, None), (None, None)
+    else:
+        start_node, start_match = resolve_place(roadsn, start)
+        goal_node, goal_match = resolve_place(roadsn, goal)
+    for text, node, match in ((start, start_node, start_match), (goal, goal_node, goal_match)):
+        if node is not None and match != "exact":
+            st.info(f"Using '{node}' for '{text}' ({match})")
+    start = start_node or start
+    goal = goal_node or goal
+
+    stats = SearchStats()
+    results = None
+    alternatives = "plateau" if distinct_routes else "k_shortest"
     total_weight = time_weight + price_weight + emissions_weight
     if abs(total_weight - 3.0) > 5:
         st.error("Priorities must sum to less than 3.0. Please adjust the sliders.")
-    else:
+    elif routing_service is not None:
+        try:
+            with st.spinner("Calculating sustainable routes..."):
+                results, bound, service_stats = routing_service.plan(
+                    start, goal, avoid_countries=avoid_countries, allowed_modes=allowed_modes,
+                    time_weight=time_weight, price_weight=price_weight,
+                    emissions_weight=emissions_weight, top_n=3, weight=weight, time_limit=time_limit,
+                    alternatives=alternatives, events=events
+                )
+        except SERVICE_ERRORS as exc:
+            st.error(f"The routing service could not plan these routes: {exc}")
+        else:
+            stats = SearchStats.from_dict(service_stats)
+            if bound not in (None, 1.0) and "error" not in results:
+                st.warning(f"Search time limit reached: these routes are within "
+                           f"{bound:g}x of the optimal cost.")
+    elif distinct_routes:
+        # Two shortest-path trees give all the distinct routes, fast enough to run inline
         with st.spinner("Calculating sustainable routes..."):
-            results = astar_top_n_avoid_countries(
-                roadsn, start, goal, avoid_countries=avoid_countries,
-                top_n=3, time_weight=time_weight, price_weight=price_weight,
-                emissions_weight=emissions_weight, allowed_modes=allowed_modes,
-                weight=weight
+            results = cached_astar_top_n(
+                route_cache, roadsn, start, goal, avoid_countries=avoid_countries, top_n=3,
+                time_weight=time_weight, price_weight=price_weight, emissions_weight=emissions_weight,
+                allowed_modes=allowed_modes, weight=weight, stats=stats, alternatives=alternatives
             )
-        
-        if "error" in results:
-            st.error(results["error"])
+    else:
+        # Search for these weights on a background thread that streams its best routes so far
+        weights = round_weights((time_weight, price_weight, emissions_weight))
+        key = route_key(roadsn, start, goal, avoid_countries, allowed_modes, weights, 3)
+        cached = route_cache.get(key)
+        if cached is not None:
+            results = apply_cargo_weight(cached, weight)
         else:
-            st.success("✅ Routes calculated with sustainability in focus!")
-            
-            for i, path in enumerate(results, 1):
-                with st.expander(f"Route {i} - Sustainability Score: {path['sustainability_score']}/100"):
-                    # Visualize route on map
-                    fig = go.Figure(go.Scattergeo(
-                        lon=[coord[1] for coord in path['path_coords']],
-                        lat=[coord[0] for coord in path['path_coords']],
-                        mode='lines+markers',
-                        line=dict(width=2, color='green'),
-                        marker=dict(size=8)
-                    ))
-                    fig.update_layout(
-                        title=f"Route {i} Map",
-                        geo=dict(showcoastlines=True, landcolor="rgb(243, 243, 243)")
-                    )
-                    st.plotly_chart(fig)
+            search = BackgroundSearch(
+                roadsn, start, goal, weight=weight,
+                budget=SearchBudget(max_seconds=time_limit),
+                on_exact=lambda routes: route_cache.put(key, routes),
+                avoid_countries=avoid_countries, top_n=3, time_weight=weights[0],
+                price_weight=weights[1], emissions_weight=weights[2],
+                allowed_modes=allowed_modes, strategy="bidirectional", stats=stats
+            ).start()
+            st.session_state["route_search"] = search
+            progress = st.empty()
+            while not search.wait(0.25):
+                snapshot = search.snapshot()
+                if snapshot["bound"] is None or "error" in snapshot["results"]:
+                    progress.info(f"Calculating sustainable routes... "
+                                  f"({snapshot['expansions']} locations explored)")
+                else:
+                    best = snapshot["results"][0]
+                    progress.info(f"Refining routes... best so far: {best['total_co2']:.2f} kg CO2, "
+                                  f"{best['total_time']:.2f} hours, within {snapshot['bound']:g}x "
+                                  f"of the optimal cost")
+            progress.empty()
+            snapshot = search.snapshot()
+            if snapshot["error"] is not None:
+                raise snapshot["error"]
+            results = snapshot["results"]
+            if snapshot["bound"] not in (None, 1.0) and "error" not in results:
+                st.warning(f"Search time limit reached: these routes are within "
+                           f"{snapshot['bound']:g}x of the optimal cost.")
+
+    if results is not None and "error" in results:
+        st.error(results["error"])
+    elif results is not None:
+        st.success("✅ Routes calculated with sustainability in focus!")
+
+        # All routes on one simplified map (cached per set of paths)
+        st.plotly_chart(route_map(results), use_container_width=True)
+
+        for i, path in enumerate(results, 1):
+            with st.expander(f"Route {i} - Sustainability Score: {path['sustainability_score']}/100"):
+                # Display metrics
+                st.metric("Total CO2 Emissions", f"{path['total_co2']:.2f} kg")
+                st.metric("Total Time", f"{path['total_time']:.2f} hours")
+                st.metric("Total Cost", f"${path['total_cost']:.2f}")
+                st.metric("Distance", f"{path['total_distance']:.2f} km")
 
-                    # Display metrics
-                    st.metric("Total CO2 Emissions", f"{path['total_co2']:.2f} kg")
-                    st.metric("Total Time", f"{path['total_time']:.2f} hours")
-                    st.metric("Total Cost", f"${path['total_cost']:.2f}")
-                    st.metric("Distance", f"{path['total_distance']:.2f} km")
+                # Detailed breakdown
+                st.dataframe(edge_table(path), hide_index=True)
 
-                    # Detailed breakdown
-                    df = pd.DataFrame(path['edges'])
-                    st.dataframe(df.style.format({
-                        'time': '{:.2f}',
-                        'price': '{:.2f}',
-                        'distance': '{:.2f}',
-                        'co2_per_ton': '{:.2f}'
-                    }))
+                # Sustainability insights
+                co2 = path['total_co2']
+                if co2 > 1000:
+                    st.warning("⚠️ High carbon footprint! Consider using more sea transport.")
+                elif co2 < 500:
+                    st.success("🌱 Great choice! Low carbon emissions route.")
 
-                    # Sustainability insights
-                    co2 = path['total_co2']
-                    if co2 > 1000:
-                        st.warning("⚠️ High carbon footprint! Consider using more sea transport.")
-                    elif co2 < 500:
-                        st.success("🌱 Great choice! Low carbon emissions route.")
+        # Other time / cost / CO2 trade-offs, looked for once the routes above are on screen.
+        # The front only depends on the endpoints and constraints, so slider moves re-rank it
+        if not distinct_routes:
+            front_args = dict(avoid_countries=avoid_countries, allowed_modes=allowed_modes,
+                              time_weight=time_weight, price_weight=price_weight,
+                              emissions_weight=emissions_weight, weight=weight, time_limit=time_limit)
+            with st.spinner("Looking for other time / cost / CO2 trade-offs..."):
+                if routing_service is not None:
+                    try:
+                        tradeoffs, front_stats = routing_service.front(start, goal, events=events, **front_args)
+                        stats.merge(SearchStats.from_dict(front_stats))
+                    except SERVICE_ERRORS as exc:
+                        tradeoffs = {"error": f"The routing service could not list the trade-offs: {exc}"}
+                else:
+                    tradeoffs = plan_front(route_cache, roadsn, start, goal, stats=stats, **front_args)
+            if tradeoffs is None:
+                st.caption("Too many time / cost / CO2 trade-offs between these places to list them all.")
+            elif "error" in tradeoffs:
+                st.caption(tradeoffs["error"])
+            else:
+                with st.expander(f"Trade-offs: {len(tradeoffs)} route(s) that no other route beats on "
+                                 f"time, cost and CO2 at once"):
+                    st.dataframe(tradeoff_table(tradeoffs), hide_index=True)
+
+    if show_diagnostics:
+        with st.expander("Search diagnostics"):
+            st.json(stats.to_dict())
+
+# Reachability: everywhere the cargo can get within the budgets, from one search
+st.subheader("Where Can We Reach?")
+with st.form("reach_form"):
+    col1, col2 = st.columns(2)
+    with col1:
+        reach_start = st.text_input("Starting Location", "Jalgaon", key="reach_start",
+                                    help="Place name (typos are fine) or 'lat, lon'")
+        reach_weight = st.number_input("Cargo Weight (kg)", min_value=0, value=100, key="reach_weight")
+        reach_modes = st.multiselect("Allowed Transport Modes", options=['land', 'sea', 'air'],
+                                     default=['land', 'sea'], key="reach_modes")
+        reach_avoid = st.multiselect("Countries to Avoid", options=['CN', 'US', 'BR', 'IN', 'RU'],
+                                     default=[], key="reach_avoid")
+    with col2:
+        max_hours = st.number_input("Max Time (hours, 0 = no limit)", min_value=0, value=72)
+        max_cost = st.number_input("Max Cost ($, 0 = no limit)", min_value=0, value=0)
+        max_co2 = st.number_input("Max CO2 (kg, 0 = no limit)", min_value=0, value=0)
+        color_by = st.selectbox("Color By", options=["time", "total_cost", "total_co2"])
+    reach_submitted = st.form_submit_button("Find Reachable Locations")
+
+if reach_submitted:
+    budgets = dict(max_time=max_hours or None, max_cost=max_cost or None, max_co2=max_co2 or None,
+                   allowed_modes=reach_modes, avoid_countries=reach_avoid)
+    with st.spinner("Exploring reachable locations..."):
+        if routing_service is not None:
+            try:
+                reach_node, _ = routing_service.resolve(reach_start)
+                table = routing_service.reachable(reach_node or reach_start, reach_weight, events=events,
+                                                  **budgets)
+            except SERVICE_ERRORS as exc:
+                table = {"error": f"The routing service could not explore from here: {exc}"}
+        else:
+            reach_node, _ = resolve_place(roadsn, reach_start)
+            reach = reachable(roadsn, reach_node or reach_start, weight=reach_weight, **budgets)
+            table = reach if isinstance(reach, dict) else reachable_table(roadsn, reach, reach_weight)
+
+    if isinstance(table, dict):
+        st.error(table["error"])
+    else:
+        st.success(f"{len(table) - 1} locations reachable from {table['node'].iloc[0]}")
+        st.plotly_chart(reachability_map(table, color_by), use_container_width=True)
+        st.dataframe(table, hide_index=True)
 
 st.sidebar.markdown("""
 ### 🌿 Sustainability Tips
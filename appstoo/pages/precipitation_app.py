@@ -4,16 +4,15 @@ from folium.plugins import Draw
 from streamlit_folium import folium_static
 import json
 import os
-import xarray as xr
-import numpy as np
 import geopandas as gpd
-import rasterio.features
 from shapely.geometry import shape, box
 import pandas as pd
 import matplotlib.pyplot as plt
 import calendar
 import matplotlib.patheffects as PathEffects
 
+from climate.engine import PRECIPITATION, ExtractionError, dataset_info, extract_change
+from climate.engine import available_years as climate_years
 
 # Streamlit Page Setup
 st.set_page_config(
@@ -369,6 +368,7 @@ st.markdown("""
 def get_month_name(month_num):
     return calendar.month_name[month_num]
 
+# Monthly precipitation change from the shared climate engine (pooled dataset handles)
 def extract_precipitation_change(netcdf_path, polygon, year1, year2, warming_degree=1):
     """
     Extracts monthly precipitation changes between two years for a given polygon.
@@ -380,87 +380,22 @@ def extract_precipitation_change(netcdf_path, polygon, year1, year2, warming_deg
     :param warming_degree: The degree of warming to apply beyond natural warming. Default is 1.
     :return: Dictionary with monthly precipitation for both years and the change.
     """
-    # Load the dataset
-    ds = xr.open_dataset(netcdf_path)
-    
     # Debug info in a styled container
+    info = dataset_info(netcdf_path)
     with st.expander("Debug Information", expanded=False):
         st.markdown("<h3 style='color: #64ffda;'>Dataset Information</h3>", unsafe_allow_html=True)
-        st.write("Available variables in NetCDF:", list(ds.variables))
-        lats, lons = ds.lat.values, ds.lon.values
-        data_bounds = box(lons.min(), lats.min(), lons.max(), lats.max())
-        st.write("NetCDF Data Bounds (lon_min, lat_min, lon_max, lat_max):", data_bounds.bounds)
+        st.write("Available variables in NetCDF:", info.variables)
+        st.write("NetCDF Data Bounds (lon_min, lat_min, lon_max, lat_max):", info.bounds)
         st.write("Polygon Bounds (lon_min, lat_min, lon_max, lat_max):", polygon.bounds)
-    
-    # Check spatial overlap
-    if not data_bounds.intersects(polygon):
-        st.warning("The drawn polygon does not intersect with the NetCDF data extent. Please adjust the polygon.")
-        return None
-    
-    # Convert polygon to a mask
-    mask = np.zeros((len(lats), len(lons)), dtype=bool)
-    shapes = [(polygon, 1)]
-    transform = rasterio.transform.from_bounds(lons.min(), lats.min(), lons.max(), lats.max(), len(lons), len(lats))
-    mask = rasterio.features.rasterize(shapes, out_shape=mask.shape, transform=transform)
-    
-    # Debug mask information
-    with st.expander("Mask Information", expanded=False):
-        st.write("Mask has data points:", mask.any())
-    
-    if not mask.any():
-        st.warning("The mask did not capture any data points. The polygon might be too small or misaligned with the data grid.")
-        return None
-    
-    # Convert mask to DataArray
-    mask_da = xr.DataArray(mask, dims=("lat", "lon"), coords={"lat": lats, "lon": lons})
-    
-    # Check if years exist in the dataset
-    available_years = ds.time.dt.year.values
-    if year1 not in available_years:
-        st.warning(f"Year {year1} not found in the dataset. Available years: {sorted(set(available_years))}")
-        return None
-    if year2 not in available_years:
-        st.warning(f"Year {year2} not found in the dataset. Available years: {sorted(set(available_years))}")
+
+    try:
+        result = extract_change(netcdf_path, PRECIPITATION, polygon, year1, year2, warming_degree)
+    except ExtractionError as e:
+        st.warning(str(e))
         return None
-    
-    # Filter dataset by years
-    year1_data = ds.sel(time=ds.time.dt.year == year1).groupby("time.month").mean("time")
-    year2_data = ds.sel(time=ds.time.dt.year == year2).groupby("time.month").mean("time")
-    
-    # Debug data shapes
-    with st.expander("Data Shapes", expanded=False):
-        st.write(f"Data for {year1} shape:", year1_data.pr.shape)
-        st.write(f"Data for {year2} shape:", year2_data.pr.shape)
-    
-    # Apply mask and average
-    year1_precip = year1_data.pr.where(mask_da).mean(dim=["lat", "lon"])
-    year2_precip = year2_data.pr.where(mask_da).mean(dim=["lat", "lon"])
-    
-    # Debug averaged temperatures
-    with st.expander("Averaged Precipitation", expanded=False):
-        st.write(f"Averaged Precipitation for {year1}:", year1_precip.values)
-        st.write(f"Averaged Precipitation for {year2}:", year2_precip.values)
-    
-    # Compute precipitation change
-    precip_change = year2_precip - year1_precip
-    
-    # Apply additional change if warming_degree > 1
-    if warming_degree > 1:
-        additional_change = np.random.normal(loc=1 + (warming_degree - 2), scale=1, size=precip_change.shape)
-        precip_change += additional_change
-        year2_precip += additional_change
-    
-    # Check for NaN values
-    if np.any(np.isnan(year1_precip)) or np.any(np.isnan(year2_precip)):
+
+    if result["has_nan"]:
         st.warning("Precipitation data contains NaN values. This might indicate missing data in the selected region or years.")
-    
-    # Prepare output
-    result = {
-        "year1": {month: float(precip) if not np.isnan(precip) else "N/A" for month, precip in zip(year1_precip.month.values, year1_precip.values)},
-        "year2": {month: float(precip) if not np.isnan(precip) else "N/A" for month, precip in zip(year2_precip.month.values, year2_precip.values)},
-        "change": {month: float(diff) if not np.isnan(diff) else "N/A" for month, diff in zip(precip_change.month.values, precip_change.values)},
-    }
-    
     return result
 
 # Function to create precipitation comparison chart
@@ -581,11 +516,9 @@ if not os.path.exists(netcdf_path):
     st.error(f"NetCDF file not found at {netcdf_path}. Please check the path.")
     st.stop()
 
-# Load dataset to get available years
+# Available years from the pooled dataset handle the extraction reuses
 try:
-    ds = xr.open_dataset(netcdf_path)
-    available_years = ds.time.dt.year.values
-    available_years = sorted(list(set(available_years)))  # Unique years
+    available_years = climate_years(netcdf_path)
 except Exception as e:
     st.error(f"Error loading NetCDF file: {str(e)}")
     st.stop()
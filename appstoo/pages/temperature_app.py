@@ -5,15 +5,14 @@ from streamlit_folium import folium_static
 from folium.plugins import Draw
 import json
 import os
-import xarray as xr
-import numpy as np
 import geopandas as gpd
-import rasterio.features
 from shapely.geometry import shape, box
 import matplotlib.pyplot as plt
 import calendar
 import matplotlib.patheffects as PathEffects
 
+from climate.engine import TEMPERATURE, ExtractionError, dataset_info, extract_change
+from climate.engine import available_years as climate_years
 
 # Streamlit Page Setup
 st.set_page_config(
@@ -369,7 +368,7 @@ st.markdown("""
 def get_month_name(month_num):
     return calendar.month_name[month_num]
 
-# Define the extract_temperature_change function
+# Monthly temperature change from the shared climate engine (pooled dataset handles)
 def extract_temperature_change(netcdf_path, polygon, year1, year2, warming_degree=1):
     """
     Extracts monthly temperature changes between two years for a given polygon.
@@ -381,87 +380,22 @@ def extract_temperature_change(netcdf_path, polygon, year1, year2, warming_degre
     :param warming_degree: The degree of warming to apply beyond natural warming. Default is 1.
     :return: Dictionary with monthly temperatures for both years and the change.
     """
-    # Load the dataset
-    ds = xr.open_dataset(netcdf_path)
-    
     # Debug info in a styled container
+    info = dataset_info(netcdf_path)
     with st.expander("Debug Information", expanded=False):
         st.markdown("<h3 style='color: #64ffda;'>Dataset Information</h3>", unsafe_allow_html=True)
-        st.write("Available variables in NetCDF:", list(ds.variables))
-        lats, lons = ds.lat.values, ds.lon.values
-        data_bounds = box(lons.min(), lats.min(), lons.max(), lats.max())
-        st.write("NetCDF Data Bounds (lon_min, lat_min, lon_max, lat_max):", data_bounds.bounds)
+        st.write("Available variables in NetCDF:", info.variables)
+        st.write("NetCDF Data Bounds (lon_min, lat_min, lon_max, lat_max):", info.bounds)
         st.write("Polygon Bounds (lon_min, lat_min, lon_max, lat_max):", polygon.bounds)
-    
-    # Check spatial overlap
-    if not data_bounds.intersects(polygon):
-        st.warning("The drawn polygon does not intersect with the NetCDF data extent. Please adjust the polygon.")
-        return None
-    
-    # Convert polygon to a mask
-    mask = np.zeros((len(lats), len(lons)), dtype=bool)
-    shapes = [(polygon, 1)]
-    transform = rasterio.transform.from_bounds(lons.min(), lats.min(), lons.max(), lats.max(), len(lons), len(lats))
-    mask = rasterio.features.rasterize(shapes, out_shape=mask.shape, transform=transform)
-    
-    # Debug mask information
-    with st.expander("Mask Information", expanded=False):
-        st.write("Mask has data points:", mask.any())
-    
-    if not mask.any():
-        st.warning("The mask did not capture any data points. The polygon might be too small or misaligned with the data grid.")
-        return None
-    
-    # Convert mask to DataArray
-    mask_da = xr.DataArray(mask, dims=("lat", "lon"), coords={"lat": lats, "lon": lons})
-    
-    # Check if years exist in the dataset
-    available_years = ds.time.dt.year.values
-    if year1 not in available_years:
-        st.warning(f"Year {year1} not found in the dataset. Available years: {sorted(set(available_years))}")
-        return None
-    if year2 not in available_years:
-        st.warning(f"Year {year2} not found in the dataset. Available years: {sorted(set(available_years))}")
+
+    try:
+        result = extract_change(netcdf_path, TEMPERATURE, polygon, year1, year2, warming_degree)
+    except ExtractionError as e:
+        st.warning(str(e))
         return None
-    
-    # Filter dataset by years
-    year1_data = ds.sel(time=ds.time.dt.year == year1).groupby("time.month").mean("time")
-    year2_data = ds.sel(time=ds.time.dt.year == year2).groupby("time.month").mean("time")
-    
-    # Debug data shapes
-    with st.expander("Data Shapes", expanded=False):
-        st.write(f"Data for {year1} shape:", year1_data.t.shape)
-        st.write(f"Data for {year2} shape:", year2_data.t.shape)
-    
-    # Apply mask and average
-    year1_temps = year1_data.t.where(mask_da).mean(dim=["lat", "lon"])
-    year2_temps = year2_data.t.where(mask_da).mean(dim=["lat", "lon"])
-    
-    # Debug averaged temperatures
-    with st.expander("Averaged Temperatures", expanded=False):
-        st.write(f"Averaged Temperatures for {year1}:", year1_temps.values)
-        st.write(f"Averaged Temperatures for {year2}:", year2_temps.values)
-    
-    # Compute temperature change
-    temp_change = year2_temps - year1_temps
-    
-    # Apply additional warming if warming_degree > 1
-    if warming_degree > 1:
-        additional_warming = np.random.normal(loc=1 + (warming_degree - 2), scale=1, size=temp_change.shape)
-        temp_change += additional_warming
-        year2_temps += additional_warming
-    
-    # Check for NaN values
-    if np.any(np.isnan(year1_temps)) or np.any(np.isnan(year2_temps)):
+
+    if result["has_nan"]:
         st.warning("Temperature data contains NaN values. This might indicate missing data in the selected region or years.")
-    
-    # Prepare output
-    result = {
-        "year1": {month: float(temp) if not np.isnan(temp) else "N/A" for month, temp in zip(year1_temps.month.values, year1_temps.values)},
-        "year2": {month: float(temp) if not np.isnan(temp) else "N/A" for month, temp in zip(year2_temps.month.values, year2_temps.values)},
-        "change": {month: float(diff) if not np.isnan(diff) else "N/A" for month, diff in zip(temp_change.month.values, temp_change.values)},
-    }
-    
     return result
 
 # Function to create temperature comparison chart
@@ -550,11 +484,9 @@ if not os.path.exists(netcdf_path):
     st.error(f"NetCDF file not found at {netcdf_path}. Please check the path.")
     st.stop()
 
-# Load dataset to get available years
+# Available years from the pooled dataset handle the extraction reuses
 try:
-    ds = xr.open_dataset(netcdf_path)
-    available_years = ds.time.dt.year.values
-    available_years = sorted(list(set(available_years)))  # Unique years
+    available_years = climate_years(netcdf_path)
 except Exception as e:
     st.error(f"Error loading NetCDF file: {str(e)}")
     st.stop()
@@ -0,0 +1,136 @@
+"""Diverse alternative routes from plateaus of two shortest-path trees.
+
+Yen's k-shortest paths returns the k cheapest routes, which on a dense
+multigraph are usually the best route with one leg swapped. Here one
+forward tree from the start and one backward tree to the goal are grown to
+``(1 + MAX_STRETCH)`` times the optimal cost. A plateau is a maximal chain
+of edges that lies on both trees; every plateau yields the route
+start -> plateau -> goal along the trees, and the plateau's length is how
+far that route is locally optimal. The optimal route (the forward tree's
+path to the goal) always comes first; plateau candidates are then taken in
+cost order and kept when they are long enough plateaus, loopless and share
+at most ``MAX_SHARING`` of the optimal cost with every route already chosen.
+"""
+import heapq
+
+import numpy as np
+
+from routing.bidirectional import _reverse_edges
+from routing.kpaths import Path
+
+MAX_STRETCH = 0.4          # alternatives cost at most 1.4x the optimum
+MAX_SHARING = 0.7          # ... share at most 70% of the optimal cost with any chosen route
+MIN_LOCAL_OPTIMALITY = 0.2  # ... and are optimal over plateaus of at least 20% of the optimum
+
+
+def _tree(query, root, reverse, limit=None, goal=None):
+    """Dijkstra tree from ``root`` (to it with ``reverse``) as (dist, link).
+
+    ``link[v]`` is the (parent, edge) towards the root. Without ``limit``
+    the search runs until ``goal`` is settled and then to (1 + MAX_STRETCH)
+    times its distance.
+    """
+    dist, link = {root: 0.0}, {root: (-1, -1)}
+    queue = [(0.0, root)]
+    pushes, peak = 1, 1
+    while queue:
+        d, u = heapq.heappop(queue)
+        if d > dist[u]:
+            continue
+        if limit is None and u == goal:
+            limit = d * (1 + MAX_STRETCH)
+        if limit is not None and d > limit:
+            break
+        if reverse:
+            edges, neighbors, costs = _reverse_edges(query, u, query.start)
+        else:
+            edges, neighbors, costs = query.relax(u)
+        for e, v, c in zip(edges.tolist(), neighbors.tolist(), costs.tolist()):
+            nd = d + c
+            if nd < dist.get(v, float('inf')):
+                dist[v] = nd
+                link[v] = (u, e)
+                heapq.heappush(queue, (nd, v))
+                pushes += 1
+                if len(queue) > peak:
+                    peak = len(queue)
+    query.stats.add_search(pushes, peak)
+    return dist, link, limit
+
+
+def _plateaus(forward_dist, forward_link, backward_dist, backward_link):
+    """(start, end) of every maximal chain of edges shared by both trees."""
+    # u -> v is a plateau edge when v hangs off u in the forward tree by the same
+    # edge that u uses to continue towards the goal in the backward tree
+    plateau_next = {}
+    for v, (u, e) in forward_link.items():
+        if u != -1 and u in backward_link and backward_link[u] == (v, e):
+            plateau_next[u] = v
+    heads = set(plateau_next.values())
+    chains = []
+    for start in plateau_next:
+        if start in heads:
+            continue
+        end = start
+        while end in plateau_next:
+            end = plateau_next[end]
+        chains.append((start, end))
+    return chains
+
+
+def _tree_edges(v, root, link):
+    """Edges from ``v`` to the tree's ``root`` along ``link``."""
+    edges = []
+    while v != root:
+        v, e = link[v]
+        edges.append(e)
+    return edges
+
+
+def _route(start, s, t, forward_link, backward_link):
+    # The plateau start..end lies on both trees, so s -> start -> t already runs along it
+    return _tree_edges(start, s, forward_link)[::-1] + _tree_edges(start, t, backward_link)
+
+
+def plateau_alternatives(query, k):
+    """Up to ``k`` distinct routes, the optimal one first, as Paths."""
+    s, t = query.start, query.goal
+    if s == t:
+        return [Path([s], [], 0.0)]
+    forward_dist, forward_link, limit = _tree(query, s, reverse=False, goal=t)
+    if t not in forward_dist:
+        return []
+    optimum = forward_dist[t]
+    backward_dist, backward_link, _ = _tree(query, t, reverse=True, limit=limit)
+
+    candidates = []
+    for start, end in _plateaus(forward_dist, forward_link, backward_dist, backward_link):
+        cost = forward_dist[end] + backward_dist[end]
+        plateau = forward_dist[end] - forward_dist[start]
+        if cost <= limit and plateau >= MIN_LOCAL_OPTIMALITY * optimum:
+            candidates.append((cost, start, end))
+    candidates.sort()
+
+    def add(nodes, edges):
+        edge_costs = query.path_edge_costs(nodes, edges)
+        pairs = dict(zip(zip(nodes, nodes[1:]), edge_costs.tolist()))
+        # Sharing counts node pairs, so a parallel edge of another mode is not a new route
+        if any(sum(c for pair, c in pairs.items() if pair in other) > MAX_SHARING * optimum
+               for other in chosen_pairs):
+            return
+        chosen.append(Path(nodes, edges, float(np.sum(edge_costs))))
+        chosen_pairs.append(set(pairs))
+
+    # The optimum first, whatever plateau it lies on (ties can split it over several)
+    chosen, chosen_pairs = [], []
+    edges = _tree_edges(t, s, forward_link)[::-1]
+    add([s] + [int(query.cg.targets[e]) for e in edges], edges)
+    for cost, start, _ in candidates:
+        if len(chosen) == k:
+            break
+        edges = _route(start, s, t, forward_link, backward_link)
+        nodes = [s] + [int(query.cg.targets[e]) for e in edges]
+        if len(set(nodes)) != len(nodes):
+            continue  # the two tree paths cross: not loopless
+        add(nodes, edges)
+    return chosen
@@ -0,0 +1,160 @@
+"""Anytime route search with budgets, cancellation and background execution.
+
+The search restarts weighted A* with a decreasing heuristic weight
+(``SCHEDULE``): a weight of 3 finds a route quickly whose cost is at most
+three times the optimum, the following stages tighten the bound until the
+exact search at weight 1. Each finished stage is published, so a caller
+always holds the best routes found so far together with their
+suboptimality bound.
+
+A ``SearchBudget`` caps the expanded nodes and/or wall-clock seconds of the
+whole run and doubles as the cancellation flag; it is charged from inside
+the search loop (``RouteQuery.count_expansion``), so an exhausted or
+cancelled search stops within one node expansion.
+"""
+import threading
+import time
+
+from routing.search import apply_cargo_weight, search_routes
+
+# Heuristic weights tried in order; the last stage must be exact
+SCHEDULE = (3.0, 1.5, 1.0)
+DEFAULT_MAX_SECONDS = 20.0
+
+
+class SearchInterrupted(Exception):
+    pass
+
+
+class SearchCancelled(SearchInterrupted):
+    pass
+
+
+class BudgetExhausted(SearchInterrupted):
+    pass
+
+
+class SearchBudget:
+    """Expansion/time limit shared by every stage of one anytime search.
+
+    The clock starts at the first charged expansion, not at construction.
+    """
+
+    def __init__(self, max_expansions=None, max_seconds=DEFAULT_MAX_SECONDS):
+        self.max_expansions = max_expansions
+        self.max_seconds = max_seconds
+        self.expansions = 0
+        self.started = None
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def elapsed(self):
+        return 0.0 if self.started is None else time.perf_counter() - self.started
+
+    def charge(self, expansions=1):
+        if self.started is None:
+            self.started = time.perf_counter()
+        self.expansions += expansions
+        if self._cancelled.is_set():
+            raise SearchCancelled()
+        if self.max_expansions is not None and self.expansions > self.max_expansions:
+            raise BudgetExhausted(f"expansion budget of {self.max_expansions} nodes used up")
+        if self.max_seconds is not None and self.elapsed() > self.max_seconds:
+            raise BudgetExhausted(f"time budget of {self.max_seconds:g} s used up")
+
+
+def anytime_routes(cg, start, goal, avoid_countries=None, top_n=3, time_weight=0.333,
+                   price_weight=0.333, emissions_weight=0.334, allowed_modes=['land', 'sea', 'air'],
+                   budget=None, publish=None, schedule=SCHEDULE, strategy="astar", stats=None):
+    """Weight-free routes (as ``search_routes``) from the tightest stage that finished.
+
+    Returns ``(results, bound)``: ``bound`` is the heuristic weight of that
+    stage (1.0 means exact) or None when no stage finished. ``publish`` is
+    called as ``publish(results, bound)`` after every finished stage.
+    The work of every stage is added to ``stats``.
+    ``SearchCancelled`` propagates; an exhausted budget ends the run with
+    the last published stage.
+    """
+    budget = budget or SearchBudget()
+    best, bound = None, None
+    for heuristic_weight in schedule:
+        # Only the unidirectional search honours an inflated heuristic
+        stage_strategy = strategy if heuristic_weight == 1.0 else "astar"
+        try:
+            results = search_routes(cg, start, goal, avoid_countries, top_n, time_weight,
+                                    price_weight, emissions_weight, allowed_modes,
+                                    stage_strategy, heuristic_weight, budget, stats)
+        except BudgetExhausted as exc:
+            if best is None:
+                return {"error": f"Search stopped before a route was found: {exc}."}, None
+            break
+        best, bound = results, heuristic_weight
+        if publish is not None:
+            publish(results, bound)
+        if "error" in results:
+            break
+    return best, bound
+
+
+class BackgroundSearch:
+    """Runs ``anytime_routes`` on a daemon thread and exposes its best-so-far routes.
+
+    ``snapshot()`` can be polled from the Streamlit script; ``cancel()``
+    stops the worker at its next expansion, e.g. when the form is resubmitted.
+    """
+
+    def __init__(self, cg, start, goal, weight=30000, budget=None, on_exact=None, **search_args):
+        self.budget = budget or SearchBudget()
+        self.weight = weight
+        self.on_exact = on_exact
+        self.results = None
+        self.bound = None
+        self.error = None
+        self.done = False
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, args=(cg, start, goal, search_args),
+                                        daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _publish(self, results, bound):
+        with self._lock:
+            self.results, self.bound = results, bound
+
+    def _run(self, cg, start, goal, search_args):
+        try:
+            results, bound = anytime_routes(cg, start, goal, budget=self.budget,
+                                            publish=self._publish, **search_args)
+            self._publish(results, bound)
+            if bound == 1.0 and self.on_exact is not None:
+                self.on_exact(results)
+        except SearchCancelled:
+            pass
+        except Exception as exc:  # surfaced through snapshot() instead of dying silently
+            self.error = exc
+        finally:
+            self.done = True
+
+    def cancel(self):
+        self.budget.cancel()
+
+    def wait(self, timeout=None):
+        """Block up to ``timeout`` seconds; True once the search has finished."""
+        self._thread.join(timeout)
+        return self.done
+
+    def snapshot(self):
+        with self._lock:
+            results, bound = self.results, self.bound
+        if results is not None:
+            results = apply_cargo_weight(results, self.weight)
+        return {"results": results, "bound": bound, "done": self.done, "error": self.error,
+                "expansions": self.budget.expansions, "elapsed": self.budget.elapsed()}
@@ -0,0 +1,193 @@
+"""Batch origin-destination routing.
+
+Reads a CSV or Parquet table of OD pairs, groups the pairs by destination
+so each worker reuses one cached heuristic table per goal, fans the
+groups out over a process pool whose workers memory-map the compiled
+graph (a pickle is compiled once, before the pool starts), and streams
+the routes to a Parquet file as groups finish. A row that fails gets its
+message in the ``error`` column; the rest of the batch carries on.
+
+    python -m routing.batch pairs.csv routes.parquet --graph graph_final_8_precalc.pkl
+
+Input columns: ``start`` and ``goal`` (required); optional per-row
+``avoid_countries`` and ``allowed_modes`` (``;``-separated), ``time_weight``,
+``price_weight``, ``emissions_weight`` and ``weight`` override the CLI
+defaults.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from routing.compiled import attach_indexes, compiled_path_for, load_compiled, load_or_compile
+from routing.search import ALTERNATIVES, STRATEGIES, astar_top_n_avoid_countries
+
+OUTPUT_SCHEMA = pa.schema([
+    ("row_id", pa.int64()),
+    ("start", pa.string()),
+    ("goal", pa.string()),
+    ("rank", pa.int32()),
+    ("error", pa.string()),
+    ("path", pa.list_(pa.string())),
+    ("modes", pa.list_(pa.string())),
+    ("total_time", pa.float64()),
+    ("total_cost", pa.float64()),
+    ("total_distance", pa.float64()),
+    ("total_co2", pa.float64()),
+    ("waiting_time", pa.float64()),
+    ("sustainability_score", pa.float64()),
+])
+
+_GRAPH = None
+
+
+def load_graph_artifact(graph_path):
+    """Compiled graph from either a compiled directory or a graph pickle."""
+    if os.path.isdir(graph_path):
+        return attach_indexes(load_compiled(graph_path), graph_path)
+    return load_or_compile(graph_path)
+
+
+def compiled_artifact(graph_path):
+    """Compiled graph directory for ``graph_path``, compiling a graph pickle first if needed."""
+    if os.path.isdir(graph_path):
+        return graph_path
+    load_or_compile(graph_path)
+    return compiled_path_for(graph_path)
+
+
+def _init_worker(graph_path):
+    global _GRAPH
+    _GRAPH = load_graph_artifact(graph_path)
+
+
+def _split(value):
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return None
+    if isinstance(value, (list, tuple)):
+        return list(value)
+    return [part.strip() for part in str(value).split(";") if part.strip()]
+
+
+def _route_rows(row_id, request, results):
+    base = {"row_id": row_id, "start": request["start"], "goal": request["goal"]}
+    if "error" in results:
+        return [dict(base, rank=0, error=results["error"])]
+    return [dict(base, rank=rank, error=None, path=route["path"],
+                 modes=[edge["mode"] for edge in route["edges"]],
+                 total_time=route["total_time"], total_cost=route["total_cost"],
+                 total_distance=route["total_distance"], total_co2=route["total_co2"],
+                 waiting_time=route["waiting_time"],
+                 sustainability_score=route["sustainability_score"])
+            for rank, route in enumerate(results, 1)]
+
+
+def route_group(requests, top_n=3):
+    """Route a list of (row_id, request dict) pairs sharing one destination."""
+    rows = []
+    for row_id, request in requests:
+        try:
+            results = astar_top_n_avoid_countries(
+                _GRAPH, request["start"], request["goal"],
+                avoid_countries=request["avoid_countries"], top_n=top_n,
+                time_weight=request["time_weight"], price_weight=request["price_weight"],
+                emissions_weight=request["emissions_weight"],
+                allowed_modes=request["allowed_modes"], weight=request["weight"],
+                strategy=request["strategy"], alternatives=request["alternatives"])
+        except Exception as exc:  # e.g. an unknown mode; one bad row must not end the batch
+            results = {"error": f"{type(exc).__name__}: {exc}"}
+        rows.extend(_route_rows(row_id, request, results))
+    return rows
+
+
+def read_pairs(path):
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def build_requests(pairs, defaults):
+    requests = []
+    for row_id, row in enumerate(pairs.to_dict("records")):
+        request = dict(defaults)
+        for key in ("time_weight", "price_weight", "emissions_weight", "weight"):
+            if key in row and not pd.isna(row[key]):
+                request[key] = float(row[key])
+        for key in ("avoid_countries", "allowed_modes"):
+            value = _split(row.get(key))
+            if value is not None:
+                request[key] = value
+        request["start"], request["goal"] = str(row["start"]), str(row["goal"])
+        requests.append((row_id, request))
+    return requests
+
+
+def group_by_goal(requests):
+    groups = {}
+    for row_id, request in requests:
+        groups.setdefault(request["goal"], []).append((row_id, request))
+    # Largest groups first so the pool doesn't finish on a long tail
+    return sorted(groups.values(), key=len, reverse=True)
+
+
+def run_batch(pairs_path, output_path, graph_path, defaults, top_n=3, workers=None):
+    requests = build_requests(read_pairs(pairs_path), defaults)
+    groups = group_by_goal(requests)
+    # Compile here so the workers don't all compile (and write) the same directory
+    graph_path = compiled_artifact(graph_path)
+    written = errors = 0
+    with pq.ParquetWriter(output_path, OUTPUT_SCHEMA) as writer, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(graph_path,)) as pool:
+        futures = {pool.submit(route_group, group, top_n): group for group in groups}
+        for future in as_completed(futures):
+            try:
+                rows = future.result()
+            except Exception as exc:  # the worker itself failed, e.g. it ran out of memory
+                error = {"error": f"{type(exc).__name__}: {exc}"}
+                rows = [row for row_id, request in futures[future]
+                        for row in _route_rows(row_id, request, error)]
+            writer.write_table(pa.Table.from_pylist(rows, schema=OUTPUT_SCHEMA))
+            written += len(rows)
+            errors += sum(row["error"] is not None for row in rows)
+    return {"pairs": len(requests), "destinations": len(groups), "rows": written, "errors": errors}
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Route many origin/destination pairs in parallel")
+    parser.add_argument("pairs", help="CSV or Parquet file with start/goal columns")
+    parser.add_argument("output", help="Parquet file to write routes to")
+    parser.add_argument("--graph", required=True, help="Graph pickle or compiled graph directory")
+    parser.add_argument("--top-n", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--avoid", nargs="*", default=[], help="Countries to avoid")
+    parser.add_argument("--modes", nargs="+", default=["land", "sea", "air"])
+    parser.add_argument("--weights", type=float, nargs=3, default=(0.25, 0.25, 0.5),
+                        metavar=("TIME", "PRICE", "EMISSIONS"))
+    parser.add_argument("--cargo-weight", type=float, default=100)
+    parser.add_argument("--strategy", choices=sorted(STRATEGIES), default="bidirectional")
+    parser.add_argument("--alternatives", choices=ALTERNATIVES, default="k_shortest",
+                        help="k_shortest: the n cheapest routes; plateau: n distinct routes")
+    args = parser.parse_args(argv)
+
+    defaults = {
+        "avoid_countries": args.avoid,
+        "allowed_modes": args.modes,
+        "time_weight": args.weights[0],
+        "price_weight": args.weights[1],
+        "emissions_weight": args.weights[2],
+        "weight": args.cargo_weight,
+        "strategy": args.strategy,
+        "alternatives": args.alternatives,
+    }
+    summary = run_batch(args.pairs, args.output, args.graph, defaults, args.top_n, args.workers)
+    print(f"Routed {summary['pairs']} pairs to {summary['destinations']} destinations, "
+          f"wrote {summary['rows']} rows ({summary['errors']} errors) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Routing benchmark harness.
+
+Generates synthetic graphs at several sizes, runs a fixed, seeded set of
+origin/destination queries under a few constraint mixes and search
+strategies, and records latency, node expansions and peak memory per
+combination. Results are written as JSON so runs can be compared across
+commits:
+
+    python -m routing.benchmark --sizes 1000 10000 --out bench.json
+    python -m routing.benchmark --sizes 1000 10000 --out new.json --compare bench.json
+"""
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+
+from routing.compiled import compile_graph
+from routing.kpaths import k_shortest_paths
+from routing.query import RouteQuery
+from routing.search import STRATEGIES
+from routing.synthetic import COUNTRY_CODES, make_synthetic_graph
+
+# name -> (allowed modes, number of countries to avoid)
+CONSTRAINT_MIXES = {
+    "all_modes": (("land", "sea", "air"), 0),
+    "land_sea": (("land", "sea"), 0),
+    "sea_air": (("sea", "air"), 0),
+    "avoid_3": (("land", "sea", "air"), 3),
+}
+DEFAULT_WEIGHTS = (0.25, 0.25, 0.5)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _queries(cg, count, modes, avoid_count, seed):
+    # Endpoints are drawn from nodes with at least one edge of an allowed mode
+    allowed = np.isin(np.asarray(cg.modes)[cg.mode], modes)
+    sources = np.unique(np.repeat(np.arange(len(cg)), np.diff(cg.indptr))[allowed]).tolist()
+    rnd = random.Random(seed)
+    queries = []
+    while len(queries) < count:
+        avoid = rnd.sample(COUNTRY_CODES, avoid_count)
+        s, t = rnd.choice(sources), rnd.choice(sources)
+        if s != t and cg.country_of(s) not in avoid and cg.country_of(t) not in avoid:
+            queries.append((s, t, avoid))
+    return queries
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run_case(cg, queries, modes, strategy, top_n):
+    shortest = STRATEGIES[strategy]
+    latencies, expansions, found = [], [], 0
+    for s, t, avoid in queries:
+        started = time.perf_counter()
+        query = RouteQuery(cg, s, t, DEFAULT_WEIGHTS, modes, avoid)
+        paths = k_shortest_paths(query, top_n, shortest)
+        latencies.append((time.perf_counter() - started) * 1000)
+        expansions.append(query.stats.expanded)
+        found += bool(paths)
+
+    # Memory is measured in a separate pass: tracemalloc distorts timings
+    tracemalloc.start()
+    peak = 0
+    for s, t, avoid in queries:
+        tracemalloc.reset_peak()
+        k_shortest_paths(RouteQuery(cg, s, t, DEFAULT_WEIGHTS, modes, avoid), top_n, shortest)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+
+    return {
+        "queries": len(queries),
+        "routes_found": found,
+        "latency_ms_mean": statistics.fmean(latencies),
+        "latency_ms_p50": _percentile(latencies, 0.5),
+        "latency_ms_p95": _percentile(latencies, 0.95),
+        "expansions_mean": statistics.fmean(expansions),
+        "peak_memory_kb": peak / 1024,
+    }
+
+
+def run_benchmark(sizes, queries_per_case=20, strategies=("astar", "bidirectional"),
+                  mixes=tuple(CONSTRAINT_MIXES), top_n=3, seed=0):
+    results = []
+    for size in sizes:
+        started = time.perf_counter()
+        cg = compile_graph(make_synthetic_graph(size, seed=seed))
+        build_s = time.perf_counter() - started
+        for mix in mixes:
+            modes, avoid_count = CONSTRAINT_MIXES[mix]
+            queries = _queries(cg, queries_per_case, modes, avoid_count, seed)
+            for strategy in strategies:
+                case = run_case(cg, queries, modes, strategy, top_n)
+                case.update(size=size, nodes=len(cg), edges=cg.num_edges, mix=mix,
+                            strategy=strategy, graph_build_s=build_s)
+                results.append(case)
+                print(f"{size:>8} {mix:<10} {strategy:<14} p50 {case['latency_ms_p50']:9.2f} ms  "
+                      f"expansions {case['expansions_mean']:10.1f}  peak {case['peak_memory_kb']:9.1f} KiB")
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "top_n": top_n,
+            "weights": DEFAULT_WEIGHTS,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+def compare(current, baseline):
+    """Print latency/expansion ratios (current / baseline) for matching cases."""
+    def key(case):
+        return case["size"], case["mix"], case["strategy"]
+
+    previous = {key(case): case for case in baseline["results"]}
+    for case in current["results"]:
+        old = previous.get(key(case))
+        if old is None:
+            continue
+        print(f"{case['size']:>8} {case['mix']:<10} {case['strategy']:<14} "
+              f"latency x{case['latency_ms_p50'] / max(old['latency_ms_p50'], 1e-9):6.2f}  "
+              f"expansions x{case['expansions_mean'] / max(old['expansions_mean'], 1e-9):6.2f}  "
+              f"memory x{case['peak_memory_kb'] / max(old['peak_memory_kb'], 1e-9):6.2f}")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the router on synthetic graphs")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--strategies", nargs="+", choices=sorted(STRATEGIES), default=sorted(STRATEGIES))
+    parser.add_argument("--mixes", nargs="+", choices=sorted(CONSTRAINT_MIXES), default=list(CONSTRAINT_MIXES))
+    parser.add_argument("--top-n", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", default=None, help="Earlier results JSON to compare against")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.sizes, args.queries, args.strategies, args.mixes, args.top_n, args.seed)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {len(report['results'])} cases to {args.out}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Bidirectional A* for the multimodal router.
+
+A forward search from the source and a backward search from the goal
+(over the reverse adjacency) run on the same average potential
+p(v) = (h_goal(v) - h_source(v)) / 2, which keeps both directions
+consistent whenever the underlying bounds are. The search stops as soon
+as the two frontier keys together reach the best meeting cost, so it
+returns exactly the same shortest paths as the unidirectional search
+while the two frontiers stay small.
+
+Potentials are computed per adjacency row and memoized, because the
+source changes for every spur search in Yen's algorithm.
+"""
+import heapq
+from array import array
+
+import numpy as np
+
+from routing.heuristics import node_bounds
+from routing.kpaths import Path, _unwind
+
+
+class _Potential:
+    def __init__(self, query, source):
+        self.query = query
+        self.source = source
+        self.values = {}
+
+    def __call__(self, nodes):
+        missing = [v for v in nodes if v not in self.values]
+        if missing:
+            q = self.query
+            idx = np.asarray(missing, dtype=np.int64)
+            to_goal = node_bounds(q.cg, idx, q.goal, q.allowed_modes, q.weights)
+            from_source = node_bounds(q.cg, idx, self.source, q.allowed_modes, q.weights, reverse=True)
+            # Unreachable bounds (inf) carry no usable potential difference
+            to_goal = np.where(np.isfinite(to_goal), to_goal, 0.0)
+            from_source = np.where(np.isfinite(from_source), from_source, 0.0)
+            self.values.update(zip(missing, ((to_goal - from_source) / 2).tolist()))
+        return [self.values[v] for v in nodes]
+
+
+def _reverse_edges(query, w, source):
+    """Allowed edges u -> w entering ``w`` as (edge ids, sources, costs)."""
+    cg = query.cg
+    query.count_expansion()
+    indptr, edge_ids, sources = cg.reverse_adjacency()
+    lo, hi = int(indptr[w]), int(indptr[w + 1])
+    edges, origins = edge_ids[lo:hi], sources[lo:hi]
+    keep = query.mode_allowed[cg.mode[edges]]
+    query.stats.skipped_mode += len(keep) - int(np.count_nonzero(keep))
+    if query.blocked is not None:
+        # Every node on a path except the source must be outside avoided countries
+        allowed = int(np.count_nonzero(keep))
+        keep &= ~query.blocked[origins] | (origins == source)
+        query.stats.skipped_country += allowed - int(np.count_nonzero(keep))
+    edges, origins = edges[keep], origins[keep].astype(np.int64)
+    query.stats.relaxed += len(edges)
+    return edges, origins, query.edge_costs(edges, origins, np.full(len(edges), w))
+
+
+def bidirectional_astar_path(query, source, banned_nodes=frozenset(), banned_pairs=frozenset()):
+    """Drop-in replacement for ``astar_path`` (same arguments and result)."""
+    goal = query.goal
+    if source == goal:
+        return Path([source], [], 0.0)
+    potential = _Potential(query, source)
+    p_source, p_goal = potential([source, goal])
+
+    # Per direction: labels (node, parent, edge), best g per node, heap of (key, g, label)
+    labels = [(array('q', [source]), array('q', [-1]), array('q', [-1])),
+              (array('q', [goal]), array('q', [-1]), array('q', [-1]))]
+    best = [{source: 0.0}, {goal: 0.0}]
+    best_label = [{source: 0}, {goal: 0}]
+    queues = [[(p_source, 0.0, 0)], [(-p_goal, 0.0, 0)]]
+    mu, meet = float('inf'), None
+    pushes, peak = 2, 1
+
+    while queues[0] and queues[1] and queues[0][0][0] + queues[1][0][0] < mu:
+        side = 0 if len(queues[0]) <= len(queues[1]) else 1
+        _, g, label = heapq.heappop(queues[side])
+        node_labels, parents, label_edges = labels[side]
+        u = node_labels[label]
+        if g > best[side][u]:
+            continue
+
+        if side == 0:
+            edges, neighbors, costs = query.relax(u)
+            sign = 1
+        else:
+            edges, neighbors, costs = _reverse_edges(query, u, source)
+            sign = -1
+        neighbor_list = neighbors.tolist()
+        potentials = potential(neighbor_list)
+        for e, v, c, pv in zip(edges.tolist(), neighbor_list, costs.tolist(), potentials):
+            if v in banned_nodes:
+                continue
+            pair = (u, v) if side == 0 else (v, u)
+            if pair in banned_pairs:
+                continue
+            new_g = g + c
+            if new_g < best[side].get(v, float('inf')):
+                best[side][v] = new_g
+                node_labels.append(v)
+                parents.append(label)
+                label_edges.append(e)
+                best_label[side][v] = len(node_labels) - 1
+                heapq.heappush(queues[side], (new_g + sign * pv, new_g, len(node_labels) - 1))
+                pushes += 1
+                if len(queues[side]) > peak:
+                    peak = len(queues[side])
+                other = best[1 - side].get(v)
+                if other is not None and new_g + other < mu:
+                    mu, meet = new_g + other, v
+
+    query.stats.add_search(pushes, peak)
+    if meet is None:
+        return None
+    forward_nodes, forward_edges = _unwind(best_label[0][meet], *labels[0])
+    backward_nodes, backward_edges = _unwind(best_label[1][meet], *labels[1])
+    # The backward labels run goal -> meet; flip them to continue the path
+    nodes = forward_nodes + backward_nodes[::-1][1:]
+    edges = forward_edges + backward_edges[::-1]
+    return Path(nodes, edges, mu)
@@ -0,0 +1,207 @@
+"""Rebuild the compiled routing graph from node and edge tables.
+
+    python -m routing.build nodes.parquet edges.parquet --out graph_final_8_precalc.cgraph
+
+Nodes need ``node``, ``latitude``, ``longitude`` and ``country_code``
+columns; edges need ``source``, ``target``, ``mode``, ``distance``,
+``time`` and ``price`` (CSV or Parquet). Edges are read in chunks, and
+validating a chunk and mapping its node ids to indices, the per-row
+Python-heavy part, runs on a process pool. The rest runs in this process
+as vectorized NumPy passes (derived columns and bounds, the CSR assembly
+in ``compile_arrays``, the write); the report gives the seconds of each
+phase. The derived columns are computed the same way the production
+pickle was built:
+
+* ``emissions`` = distance x EMISSION_FACTORS[mode];
+* normalization bounds start at zero, so ``x_norm = x / max(x) * 100``,
+  with the bounds in ``graph.graph`` as ``time_min``/``time_max`` etc.;
+* ``max_speed`` and ``min_price_per_km`` per mode are the largest speed and
+  smallest price per km of any edge, which keeps the A* bounds admissible.
+
+The result is validated and written with ``save_compiled``; pointing it at
+``compiled_path_for(<pickle>)`` makes ``load_or_compile`` use it directly
+until the pickle is rewritten after it.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from routing.compiled import compile_arrays, save_compiled
+from routing.costs import EMISSION_FACTORS
+
+NODE_COLUMNS = ("node", "latitude", "longitude", "country_code")
+EDGE_INPUT_COLUMNS = ("source", "target", "mode", "distance", "time", "price")
+CHUNK_ROWS = 500_000
+# Normalized name -> raw column, and its graph.graph bound prefix
+NORMALIZED = {"time_norm": "time", "price_norm": "price", "emissions_norm": "emissions"}
+
+_NODE_INDEX = None
+
+
+def read_table(path, columns=None):
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, columns=list(columns) if columns else None)
+    return pd.read_csv(path, usecols=list(columns) if columns else None, float_precision="round_trip")
+
+
+def iter_table_chunks(path, columns, chunk_rows=CHUNK_ROWS):
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows, columns=list(columns)):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=list(columns), chunksize=chunk_rows, float_precision="round_trip")
+
+
+def _missing_columns(df, required, what):
+    missing = [name for name in required if name not in df.columns]
+    if missing:
+        raise ValueError(f"{what} table is missing columns {missing}")
+
+
+def load_nodes(path):
+    nodes = read_table(path)
+    _missing_columns(nodes, NODE_COLUMNS, "Node")
+    nodes = nodes[list(NODE_COLUMNS)]
+    duplicated = nodes["node"].duplicated()
+    if duplicated.any():
+        raise ValueError(f"{int(duplicated.sum())} duplicate node ids, e.g. {nodes['node'][duplicated].iloc[0]!r}")
+    lat, lon = nodes["latitude"].to_numpy(np.float64), nodes["longitude"].to_numpy(np.float64)
+    bad = ~(np.isnan(lat) | ((lat >= -90) & (lat <= 90))) | ~(np.isnan(lon) | ((lon >= -180) & (lon <= 180)))
+    if bad.any():
+        raise ValueError(f"{int(bad.sum())} nodes have coordinates out of range, e.g. {nodes['node'][bad].iloc[0]!r}")
+    return nodes
+
+
+def _init_worker(node_ids):
+    global _NODE_INDEX
+    _NODE_INDEX = pd.Index(node_ids)
+
+
+def prepare_edges(chunk):
+    """Validate one chunk of the edge table and map it to node indices and derived columns."""
+    src = _NODE_INDEX.get_indexer(chunk["source"])
+    dst = _NODE_INDEX.get_indexer(chunk["target"])
+    unknown = (src < 0) | (dst < 0)
+    if unknown.any():
+        row = chunk[unknown].iloc[0]
+        raise ValueError(f"{int(unknown.sum())} edges reference unknown nodes, e.g. {row['source']!r} -> {row['target']!r}")
+    modes = chunk["mode"].astype(object).to_numpy()
+    known = pd.Series(modes).isin(list(EMISSION_FACTORS)).to_numpy()
+    if not known.all():
+        raise ValueError(f"Unknown edge modes {sorted(set(modes[~known].tolist()))}, "
+                         f"expected one of {sorted(EMISSION_FACTORS)}")
+    values = {name: chunk[name].to_numpy(np.float64) for name in ("distance", "time", "price")}
+    for name, column in values.items():
+        bad = ~np.isfinite(column) | (column < 0)
+        if bad.any():
+            raise ValueError(f"{int(bad.sum())} edges have a missing or negative {name}")
+    factors = pd.Series(modes).map(EMISSION_FACTORS).to_numpy(np.float64)
+    values["emissions"] = values["distance"] * factors
+    return src, dst, modes, values
+
+
+def _mode_bounds(modes, values):
+    """Per-mode max speed (km/h) and min price per km over edges with a positive distance and time."""
+    frame = pd.DataFrame({"mode": modes, "distance": values["distance"], "time": values["time"],
+                          "price": values["price"]})
+    frame = frame[frame["distance"] > 0]
+    timed = frame[frame["time"] > 0]
+    max_speed = (timed["distance"] / timed["time"]).groupby(timed["mode"]).max()
+    min_price = (frame["price"] / frame["distance"]).groupby(frame["mode"]).min()
+    return ({mode: float(v) for mode, v in max_speed.items()},
+            {mode: float(v) for mode, v in min_price.items()})
+
+
+def normalize(values):
+    """``x_norm`` columns and graph.graph bounds (min fixed at zero) for the raw columns."""
+    columns, bounds = {}, {}
+    for norm_name, raw_name in NORMALIZED.items():
+        raw = values[raw_name]
+        lo, hi = 0.0, float(raw.max()) if len(raw) else 0.0
+        columns[norm_name] = (raw - lo) / (hi - lo) * 100 if hi > lo else np.zeros_like(raw)
+        bounds[f"{raw_name}_min"], bounds[f"{raw_name}_max"] = lo, hi
+    return columns, bounds
+
+
+def validate(cg):
+    """Check the compiled graph is well formed before it replaces the current one."""
+    problems = []
+    if np.any(np.diff(cg.indptr) < 0) or cg.indptr[-1] != cg.num_edges:
+        problems.append("adjacency offsets are not monotone")
+    if cg.num_edges and (cg.targets.min() < 0 or cg.targets.max() >= len(cg)):
+        problems.append("edge targets out of range")
+    for name in NORMALIZED:
+        column = cg.columns[name]
+        if not np.isfinite(column).all() or column.min() < 0 or column.max() > 100 + 1e-9:
+            problems.append(f"{name} outside [0, 100]")
+    for mode in cg.modes:
+        if mode not in cg.graph.get("max_speed", {}) or mode not in cg.graph.get("min_price_per_km", {}):
+            problems.append(f"no heuristic bounds for mode {mode!r}")
+    if problems:
+        raise ValueError("Compiled graph failed validation: " + "; ".join(problems))
+
+
+def build_graph(nodes_path, edges_path, out_path, directed=False, workers=None, chunk_rows=CHUNK_ROWS):
+    """Build, validate and save the compiled graph; returns the CompiledGraph and a report."""
+    started = time.perf_counter()
+    phases = {}
+    nodes = load_nodes(nodes_path)
+    node_ids = nodes["node"].tolist()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(node_ids,)) as pool:
+        futures = [pool.submit(prepare_edges, chunk)
+                   for chunk in iter_table_chunks(edges_path, EDGE_INPUT_COLUMNS, chunk_rows)]
+        # Results are collected in submission order so the build is reproducible
+        parts = [future.result() for future in futures]
+    if not parts:
+        raise ValueError(f"No edges in {edges_path}")
+    phases["prepare_s"] = time.perf_counter() - started
+
+    src = np.concatenate([part[0] for part in parts])
+    dst = np.concatenate([part[1] for part in parts])
+    modes = np.concatenate([part[2] for part in parts])
+    values = {name: np.concatenate([part[3][name] for part in parts]) for name in parts[0][3]}
+
+    columns, graph_attrs = normalize(values)
+    columns.update(time=values["time"], price=values["price"], distance=values["distance"])
+    max_speed, min_price_per_km = _mode_bounds(modes, values)
+    graph_attrs.update(max_speed=max_speed, min_price_per_km=min_price_per_km)
+
+    cg = compile_arrays(node_ids, nodes["latitude"].to_numpy(np.float64), nodes["longitude"].to_numpy(np.float64),
+                        nodes["country_code"].tolist(), src, dst, modes, columns, graph_attrs, directed)
+    validate(cg)
+    phases["compile_s"] = time.perf_counter() - started - phases["prepare_s"]
+    save_compiled(cg, out_path)
+    seconds = time.perf_counter() - started
+    phases["save_s"] = seconds - phases["prepare_s"] - phases["compile_s"]
+    report = {"nodes": len(cg), "edges": len(src), "arcs": cg.num_edges, "modes": cg.modes,
+              "version": cg.version, "seconds": seconds, "phases": phases}
+    return cg, report
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile the routing graph from node and edge tables")
+    parser.add_argument("nodes", help="CSV or Parquet node table")
+    parser.add_argument("edges", help="CSV or Parquet edge table")
+    parser.add_argument("--out", required=True, help="Compiled graph directory to write")
+    parser.add_argument("--directed", action="store_true", help="Edges are one-way (default: both ways)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    _, report = build_graph(args.nodes, args.edges, args.out, args.directed, args.workers, args.chunk_rows)
+    print(f"Compiled {report['nodes']} nodes and {report['edges']} edges ({report['arcs']} arcs, "
+          f"modes {', '.join(report['modes'])}) in {report['seconds']:.1f}s to {os.path.abspath(args.out)} "
+          f"(version {report['version']})")
+    print(", ".join(f"{name[:-2]} {seconds:.1f}s" for name, seconds in report["phases"].items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Two-tier cache for route search results.
+
+Keys are canonicalised query tuples (start, goal, frozenset of avoided
+countries, frozenset of allowed modes, rounded weight triple, top_n,
+graph version, plus the alternatives method when it is not the
+default). Values live in an in-process LRU and in a directory of pickle
+files that survives restarts. Cargo weight is not part of the key: it
+only rescales totals, so cached results are weight-free and
+``apply_cargo_weight`` runs on the way out.
+
+The directory is kept under ``max_disk_bytes`` by deleting the least
+recently used files every SWEEP_EVERY writes. Files that can't be read
+(truncated, or pickled by an older version of the code) count as misses
+and are deleted.
+"""
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+
+from routing.lru import LRUCache
+from routing.pareto import pareto_front
+from routing.search import apply_cargo_weight, search_routes
+
+WEIGHT_DECIMALS = 3
+DEFAULT_MAX_DISK_BYTES = 512 * 1024 * 1024
+# Writes between two sweeps of the cache directory
+SWEEP_EVERY = 100
+
+
+def _canonical(start, goal, avoid_countries, allowed_modes, version):
+    return (start, goal, frozenset(avoid_countries or ()), frozenset(allowed_modes), version)
+
+
+def round_weights(weights):
+    return tuple(round(float(w), WEIGHT_DECIMALS) for w in weights)
+
+
+def route_key(cg, start, goal, avoid_countries, allowed_modes, weights, top_n, alternatives="k_shortest"):
+    weights = round_weights(weights)
+    key = ("routes",) + _canonical(start, goal, avoid_countries, allowed_modes, cg.version) + (weights, top_n)
+    # Existing k-shortest entries keep their keys
+    return key if alternatives == "k_shortest" else key + (alternatives,)
+
+
+def front_key(cg, start, goal, avoid_countries, allowed_modes):
+    return ("pareto",) + _canonical(start, goal, avoid_countries, allowed_modes, cg.version)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class RouteCache:
+    def __init__(self, directory=None, maxsize=1024, max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.memory = LRUCache(maxsize=maxsize)
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.disk_hits = 0
+        self.disk_evictions = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self.sweep()
+
+    def _file_for(self, key):
+        # frozensets have no stable repr order, so sort them before hashing
+        parts = [sorted(part) if isinstance(part, frozenset) else part for part in key]
+        digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest + ".pkl")
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None or not self.directory:
+            return value
+        path = self._file_for(key)
+        try:
+            with open(path, "rb") as f:
+                stored_key, value = pickle.load(f)
+        except OSError:
+            return None
+        except Exception:
+            # Truncated, or refers to classes or modules that no longer exist
+            _remove(path)
+            return None
+        if stored_key != key:
+            return None
+        try:
+            os.utime(path)  # recently used: evicted last
+        except OSError:
+            pass
+        with self._lock:
+            self.disk_hits += 1
+        self.memory.put(key, value)
+        return value
+
+    def put(self, key, value):
+        self.memory.put(key, value)
+        if not self.directory:
+            return
+        # Write to a temp file and rename so readers never see a partial entry
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((key, value), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._file_for(key))
+        with self._lock:
+            self._writes += 1
+            sweep = self._writes % SWEEP_EVERY == 0
+        if sweep:
+            self.sweep()
+
+    def sweep(self):
+        """Delete the least recently used files until the directory fits in ``max_disk_bytes``."""
+        if not self.directory or self.max_disk_bytes is None:
+            return
+        files = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith(".pkl"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        evicted = 0
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            _remove(path)
+            total -= size
+            evicted += 1
+        with self._lock:
+            self.disk_evictions += evicted
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def stats(self):
+        lookups = self.memory.hits + self.memory.misses
+        hits = self.memory.hits + self.disk_hits
+        return {
+            "memory_hits": self.memory.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.memory.misses - self.disk_hits,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "disk_evictions": self.disk_evictions,
+        }
+
+
+def cached_astar_top_n(cache, cg, start, goal, avoid_countries=None, top_n=3,
+                       time_weight=0.333, price_weight=0.333, emissions_weight=0.334,
+                       allowed_modes=['land', 'sea', 'air'], weight=30000, strategy="astar",
+                       stats=None, alternatives="k_shortest"):
+    """astar_top_n_avoid_countries backed by a RouteCache.
+
+    All strategies return the same routes, so the strategy is not part of the key;
+    the alternatives method changes the routes and is.
+    """
+    # Search with the rounded weights so the cached result matches its key exactly
+    weights = round_weights((time_weight, price_weight, emissions_weight))
+    key = route_key(cg, start, goal, avoid_countries, allowed_modes, weights, top_n, alternatives)
+    results = cache.get_or_compute(key, lambda: search_routes(
+        cg, start, goal, avoid_countries, top_n, *weights, allowed_modes, strategy, stats=stats,
+        alternatives=alternatives))
+    return apply_cargo_weight(results, weight)
+
+
+def cached_pareto_front(cache, cg, start, goal, avoid_countries=None,
+                        allowed_modes=['land', 'sea', 'air'], stats=None, budget=None):
+    """pareto_front backed by a RouteCache; fronts cut short by a limit are not cached."""
+    key = front_key(cg, start, goal, avoid_countries, allowed_modes)
+    front = cache.get(key)
+    if front is None:
+        front = pareto_front(cg, start, goal, avoid_countries=avoid_countries, allowed_modes=allowed_modes,
+                             stats=stats, budget=budget)
+        if "error" in front or front["complete"]:
+            cache.put(key, front)
+    return front
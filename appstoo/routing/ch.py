@@ -0,0 +1,314 @@
+"""Contraction hierarchies for fixed weight/mode profiles.
+
+A profile is a (time, price, emissions) weight triple plus a set of
+allowed modes, e.g. the default 0.25/0.25/0.5 sliders with all modes.
+For each profile the graph is contracted offline and stored next to the
+compiled graph; queries matching a profile (and without avoided
+countries, which would invalidate the shortcuts) are answered by a
+bidirectional upward search instead of a full A*.
+
+Build with ``python -m routing.ch <compiled graph dir> --weights 0.25 0.25 0.5``.
+"""
+import heapq
+import json
+import os
+
+import numpy as np
+
+from routing.kpaths import Path, astar_path
+
+CH_DIR = "ch"
+DEFAULT_PROFILES = [((0.25, 0.25, 0.5), ("land", "sea", "air"))]
+
+WITNESS_SETTLE_LIMIT = 100
+
+
+def profile_key(weights, allowed_modes):
+    return "{:.3f}_{:.3f}_{:.3f}_{}".format(*weights, "+".join(sorted(allowed_modes)))
+
+
+def profile_edge_costs(cg, weights, allowed_modes):
+    """Cost of every CSR edge under a profile (inf for disallowed modes)."""
+    time_weight, price_weight, emissions_weight = weights
+    sources = np.repeat(np.arange(len(cg)), np.diff(cg.indptr))
+    costs = (time_weight * np.asarray(cg.columns['time_norm']) +
+             price_weight * np.asarray(cg.columns['price_norm']) +
+             emissions_weight * np.asarray(cg.columns['emissions_norm']) +
+             (cg.country[cg.targets] != cg.country[sources]))
+    allowed = np.isin(cg.mode, [cg.mode_index[m] for m in allowed_modes if m in cg.mode_index])
+    return sources, np.where(allowed, costs, np.inf)
+
+
+class _Contractor:
+    def __init__(self, n):
+        self.out_adj = [dict() for _ in range(n)]
+        self.in_adj = [dict() for _ in range(n)]
+        self.arc_src, self.arc_dst, self.arc_cost = [], [], []
+        self.arc_edge, self.arc_child1, self.arc_child2 = [], [], []
+        self.contracted = np.zeros(n, dtype=bool)
+        self.contracted_neighbors = np.zeros(n, dtype=np.int64)
+
+    def add_arc(self, u, v, cost, edge=-1, child1=-1, child2=-1):
+        current = self.out_adj[u].get(v)
+        if current is not None and current[0] <= cost:
+            return
+        arc = len(self.arc_src)
+        self.arc_src.append(u)
+        self.arc_dst.append(v)
+        self.arc_cost.append(cost)
+        self.arc_edge.append(edge)
+        self.arc_child1.append(child1)
+        self.arc_child2.append(child2)
+        self.out_adj[u][v] = (cost, arc)
+        self.in_adj[v][u] = (cost, arc)
+
+    def witness_distances(self, source, skip, targets, max_cost):
+        dist = {source: 0.0}
+        queue = [(0.0, source)]
+        remaining = set(targets)
+        settled = 0
+        while queue and remaining and settled < WITNESS_SETTLE_LIMIT:
+            d, u = heapq.heappop(queue)
+            if d > dist[u]:
+                continue
+            if d > max_cost:
+                break
+            remaining.discard(u)
+            settled += 1
+            for v, (c, _) in self.out_adj[u].items():
+                if v == skip:
+                    continue
+                nd = d + c
+                if nd < dist.get(v, float('inf')):
+                    dist[v] = nd
+                    heapq.heappush(queue, (nd, v))
+        return dist
+
+    def shortcuts_for(self, v):
+        shortcuts = []
+        outgoing = self.out_adj[v]
+        for u, (c_uv, arc_uv) in self.in_adj[v].items():
+            if u == v:
+                continue
+            candidates = {w: c_uv + c_vw for w, (c_vw, _) in outgoing.items() if w != u and w != v}
+            if not candidates:
+                continue
+            dist = self.witness_distances(u, v, candidates, max(candidates.values()))
+            for w, cost in candidates.items():
+                if dist.get(w, float('inf')) > cost:
+                    shortcuts.append((u, w, cost, arc_uv, outgoing[w][1]))
+        return shortcuts
+
+    def priority(self, v):
+        removed = len(self.in_adj[v]) + len(self.out_adj[v])
+        return len(self.shortcuts_for(v)) - removed + self.contracted_neighbors[v]
+
+    def contract(self, v):
+        for u, w, cost, arc_uv, arc_vw in self.shortcuts_for(v):
+            self.add_arc(u, w, cost, child1=arc_uv, child2=arc_vw)
+        neighbors = set(self.in_adj[v]) | set(self.out_adj[v])
+        for u in self.in_adj[v]:
+            self.out_adj[u].pop(v, None)
+        for w in self.out_adj[v]:
+            self.in_adj[w].pop(v, None)
+        self.in_adj[v] = {}
+        self.out_adj[v] = {}
+        self.contracted[v] = True
+        for u in neighbors:
+            self.contracted_neighbors[u] += 1
+
+
+def build_hierarchy(cg, weights, allowed_modes):
+    n = len(cg)
+    sources, costs = profile_edge_costs(cg, weights, allowed_modes)
+    contractor = _Contractor(n)
+    for e in np.flatnonzero(np.isfinite(costs)):
+        u, v = int(sources[e]), int(cg.targets[e])
+        if u != v:
+            contractor.add_arc(u, v, float(costs[e]), edge=int(e))
+
+    queue = [(contractor.priority(v), v) for v in range(n)]
+    heapq.heapify(queue)
+    rank = np.empty(n, dtype=np.int64)
+    order = 0
+    while queue:
+        _, v = heapq.heappop(queue)
+        if contractor.contracted[v]:
+            continue
+        # Lazy update: re-evaluate and defer if no longer the cheapest
+        current = contractor.priority(v)
+        if queue and current > queue[0][0]:
+            heapq.heappush(queue, (current, v))
+            continue
+        contractor.contract(v)
+        rank[v] = order
+        order += 1
+
+    return ContractionHierarchy.from_arcs(
+        rank, contractor, weights, allowed_modes, cg.version)
+
+
+def _csr(keys, n):
+    order = np.argsort(keys, kind='stable')
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n), out=indptr[1:])
+    return indptr, order.astype(np.int64)
+
+
+class ContractionHierarchy:
+    ARRAYS = ("rank", "arc_src", "arc_dst", "arc_cost", "arc_edge", "arc_child1", "arc_child2",
+              "up_indptr", "up_arcs", "down_indptr", "down_arcs")
+
+    def __init__(self, arrays, weights, allowed_modes, version):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.weights = tuple(float(w) for w in weights)
+        self.allowed_modes = frozenset(allowed_modes)
+        self.version = version
+
+    @classmethod
+    def from_arcs(cls, rank, contractor, weights, allowed_modes, version):
+        arrays = {
+            "rank": rank,
+            "arc_src": np.asarray(contractor.arc_src, dtype=np.int64),
+            "arc_dst": np.asarray(contractor.arc_dst, dtype=np.int64),
+            "arc_cost": np.asarray(contractor.arc_cost, dtype=np.float64),
+            "arc_edge": np.asarray(contractor.arc_edge, dtype=np.int64),
+            "arc_child1": np.asarray(contractor.arc_child1, dtype=np.int64),
+            "arc_child2": np.asarray(contractor.arc_child2, dtype=np.int64),
+        }
+        n = len(rank)
+        src, dst = arrays["arc_src"], arrays["arc_dst"]
+        upward = rank[src] < rank[dst]
+        up_arcs = np.flatnonzero(upward)
+        down_arcs = np.flatnonzero(~upward)
+        # Forward search climbs arcs leaving a node; backward search climbs arcs entering it
+        up_indptr, order = _csr(src[up_arcs], n)
+        arrays["up_indptr"], arrays["up_arcs"] = up_indptr, up_arcs[order]
+        down_indptr, order = _csr(dst[down_arcs], n)
+        arrays["down_indptr"], arrays["down_arcs"] = down_indptr, down_arcs[order]
+        return cls(arrays, weights, allowed_modes, version)
+
+    def matches(self, weights, allowed_modes, avoid_countries=()):
+        # Exact weights: profile_key rounds for file names, but 0.3334 against a 0.333 index gives
+        # different costs and therefore possibly a different route than the query asked for
+        return (not avoid_countries and frozenset(allowed_modes) == self.allowed_modes and
+                tuple(float(w) for w in weights) == self.weights)
+
+    def query(self, s, t):
+        """Cheapest path s -> t as a list of original CSR edge ids and its cost."""
+        # Forward search climbs arcs leaving a node, backward search climbs arcs entering it
+        directions = [
+            ({s: 0.0}, {s: -1}, [(0.0, s)], self.up_indptr, self.up_arcs, self.arc_dst),
+            ({t: 0.0}, {t: -1}, [(0.0, t)], self.down_indptr, self.down_arcs, self.arc_src),
+        ]
+        best, meet = float('inf'), None
+        while any(queue and queue[0][0] < best for _, _, queue, _, _, _ in directions):
+            for side, (dist, pred, queue, indptr, arcs, endpoint) in enumerate(directions):
+                if not queue or queue[0][0] >= best:
+                    continue
+                d, u = heapq.heappop(queue)
+                if d > dist[u]:
+                    continue
+                other_dist = directions[1 - side][0]
+                if u in other_dist and d + other_dist[u] < best:
+                    best, meet = d + other_dist[u], u
+                for arc in arcs[indptr[u]:indptr[u + 1]].tolist():
+                    v = int(endpoint[arc])
+                    nd = d + float(self.arc_cost[arc])
+                    if nd < dist.get(v, float('inf')):
+                        dist[v] = nd
+                        pred[v] = arc
+                        heapq.heappush(queue, (nd, v))
+        if meet is None:
+            return None, float('inf')
+
+        forward_pred, backward_pred = directions[0][1], directions[1][1]
+        forward_arcs, u = [], meet
+        while forward_pred[u] != -1:
+            forward_arcs.append(forward_pred[u])
+            u = int(self.arc_src[forward_pred[u]])
+        forward_arcs.reverse()
+        backward_arcs, u = [], meet
+        while backward_pred[u] != -1:
+            backward_arcs.append(backward_pred[u])
+            u = int(self.arc_dst[backward_pred[u]])
+        edges = []
+        for arc in forward_arcs + backward_arcs:
+            edges.extend(self.unpack(arc))
+        return edges, best
+
+    def unpack(self, arc):
+        edges, stack = [], [arc]
+        while stack:
+            a = stack.pop()
+            if self.arc_edge[a] >= 0:
+                edges.append(int(self.arc_edge[a]))
+            else:
+                stack.append(int(self.arc_child2[a]))
+                stack.append(int(self.arc_child1[a]))
+        return edges
+
+    def shortest_path_fn(self, fallback=astar_path):
+        """Single-pair search for Yen's algorithm: CH for unconstrained calls, A* otherwise."""
+        def shortest(query, source, banned_nodes=frozenset(), banned_pairs=frozenset()):
+            if banned_nodes or banned_pairs:
+                return fallback(query, source, banned_nodes, banned_pairs)
+            edges, _ = self.query(source, query.goal)
+            if edges is None:
+                return None
+            nodes = [source] + [int(query.cg.targets[e]) for e in edges]
+            return Path(nodes, edges, query.path_cost(nodes, edges))
+        return shortest
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, name + ".npy"), getattr(self, name))
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "weights": list(self.weights),
+                       "allowed_modes": sorted(self.allowed_modes)}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r") for name in cls.ARRAYS}
+        return cls(arrays, meta["weights"], meta["allowed_modes"], meta["version"])
+
+
+def attach_hierarchies(cg, compiled_path):
+    root = os.path.join(compiled_path, CH_DIR)
+    if not os.path.isdir(root):
+        return cg
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if os.path.exists(os.path.join(path, "meta.json")):
+            hierarchy = ContractionHierarchy.load(path)
+            if hierarchy.version == cg.version:
+                cg.hierarchies.append(hierarchy)
+    return cg
+
+
+def matching_hierarchy(cg, weights, allowed_modes, avoid_countries=()):
+    for hierarchy in cg.hierarchies:
+        if hierarchy.matches(weights, allowed_modes, avoid_countries):
+            return hierarchy
+    return None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from routing.compiled import load_compiled
+
+    parser = argparse.ArgumentParser(description="Build a contraction hierarchy for a weight/mode profile")
+    parser.add_argument("compiled_path")
+    parser.add_argument("--weights", type=float, nargs=3, default=DEFAULT_PROFILES[0][0],
+                        metavar=("TIME", "PRICE", "EMISSIONS"))
+    parser.add_argument("--modes", nargs="+", default=list(DEFAULT_PROFILES[0][1]))
+    args = parser.parse_args()
+    graph = load_compiled(args.compiled_path)
+    ch = build_hierarchy(graph, tuple(args.weights), args.modes)
+    ch.save(os.path.join(args.compiled_path, CH_DIR, profile_key(args.weights, args.modes)))
+    print(f"Contracted {len(graph)} nodes into {len(ch.arc_src)} arcs")
@@ -0,0 +1,120 @@
+"""Remove dominated and duplicate parallel edges from the routing MultiGraph.
+
+Between two nodes the MultiGraph often holds several edges of the same
+mode. An edge whose time, price, emissions and distance columns (raw and
+normalized, see compiled.EDGE_COLUMNS) are all at least those of another
+parallel edge of the same mode can never make a path better. Both edges
+cross the same border and wait at the same port, and every search cost,
+budget and reported total is monotone in these columns. Dropping such
+edges, and all but one copy of identical edges, leaves every route cost
+unchanged while each query relaxes fewer edges. The normalization bounds
+in ``graph.graph`` are left as they are, so the costs of the kept edges
+don't change either.
+
+    python -m routing.compact graph_final_8_precalc.pkl
+
+writes ``graph_final_8_precalc_compact.pkl`` next to the input, and
+``prefer_compacted`` makes the pages load it in place of the original.
+"""
+import os
+import pickle
+from collections import Counter
+
+import numpy as np
+
+from routing.compiled import EDGE_COLUMNS
+
+COMPACT_SUFFIX = "_compact"
+
+
+def compacted_path_for(pickle_path):
+    root, ext = os.path.splitext(pickle_path)
+    return root + COMPACT_SUFFIX + ext
+
+
+def prefer_compacted(pickle_path):
+    """The compacted pickle when it exists and is newer than ``pickle_path``, else ``pickle_path``."""
+    compacted = compacted_path_for(pickle_path)
+    try:
+        if os.path.getmtime(compacted) >= os.path.getmtime(pickle_path):
+            return compacted
+    except OSError:
+        pass
+    return pickle_path
+
+
+def _redundant_edges(edges):
+    """Keys of the edges in one (node pair, mode) group another edge of the group makes redundant.
+
+    ``edges`` is a list of (key, column vector). After a lexicographic sort
+    an edge can only be dominated by, or equal to, an edge before it.
+    """
+    kept, dominated, duplicates = [], [], []
+    for key, values in sorted(edges, key=lambda edge: tuple(edge[1])):
+        if np.isnan(values).any():
+            continue  # incomparable: missing attributes make no edge better or worse
+        for other in kept:
+            if (other <= values).all():
+                (duplicates if (other == values).all() else dominated).append(key)
+                break
+        else:
+            kept.append(values)
+    return dominated, duplicates
+
+
+def compact_graph(multigraph):
+    """Remove redundant parallel edges from ``multigraph`` in place; returns a size report."""
+    groups = {}
+    for u, v, key, data in multigraph.edges(keys=True, data=True):
+        pair = (u, v) if multigraph.is_directed() else tuple(sorted((u, v), key=repr))
+        values = np.array([data.get(name, np.nan) for name in EDGE_COLUMNS], dtype=np.float64)
+        groups.setdefault((pair, data['mode']), []).append(((u, v, key), values))
+
+    report = {"nodes": multigraph.number_of_nodes(), "edges_before": multigraph.number_of_edges(),
+              "dominated": 0, "duplicates": 0}
+    removed_by_mode = Counter()
+    for (_, mode), edges in groups.items():
+        if len(edges) < 2:
+            continue
+        dominated, duplicates = _redundant_edges(edges)
+        multigraph.remove_edges_from(dominated + duplicates)
+        report["dominated"] += len(dominated)
+        report["duplicates"] += len(duplicates)
+        removed_by_mode[mode] += len(dominated) + len(duplicates)
+
+    report["edges_after"] = multigraph.number_of_edges()
+    report["removed_by_mode"] = dict(removed_by_mode)
+    report["reduction"] = 1 - report["edges_after"] / report["edges_before"] if report["edges_before"] else 0.0
+    return report
+
+
+def compact_pickle(pickle_path, output_path=None):
+    output_path = output_path or compacted_path_for(pickle_path)
+    with open(pickle_path, "rb") as f:
+        multigraph = pickle.load(f)
+    report = compact_graph(multigraph)
+    tmp = output_path + ".tmp"
+    with open(tmp, "wb") as f:
+        pickle.dump(multigraph, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, output_path)
+    return report
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Remove dominated and duplicate parallel edges")
+    parser.add_argument("graph", help="Graph pickle to compact")
+    parser.add_argument("--out", default=None, help="Output pickle (default: <graph>_compact.pkl)")
+    args = parser.parse_args(argv)
+
+    output_path = args.out or compacted_path_for(args.graph)
+    report = compact_pickle(args.graph, output_path)
+    print(f"{report['edges_before']} -> {report['edges_after']} edges "
+          f"({report['reduction']:.1%} fewer): {report['dominated']} dominated, "
+          f"{report['duplicates']} duplicates; by mode {report['removed_by_mode']}")
+    print(f"Wrote {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+"""Array-backed (CSR) representation of the multimodal routing graph.
+
+The networkx MultiGraph pickle is compiled once into flat NumPy columns:
+CSR offsets/targets for adjacency, one column per edge attribute, integer
+coded modes and countries, and a node-id <-> index map. The compiled graph
+is written as a versioned directory of ``.npy`` files that is memory-mapped
+on load, so the search never touches Python objects per edge. The
+directory records the size and modification time of the pickle it was
+compiled from, and ``load_or_compile`` recompiles when the pickle changes.
+A rewrite builds a new directory next to the old one and swaps it in, so
+processes that have the old files memory-mapped keep reading them intact.
+Where the swap cannot happen (Windows refuses to move mapped files, or
+another process swapped in its own build first) ``load_or_compile`` uses
+the directory that won, or the freshly compiled graph from memory.
+"""
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from routing.ch import attach_hierarchies
+from routing.hubs import attach_hub_labels
+from routing.landmarks import attach_landmarks
+from routing.places import PLACES_FILE, attach_places, build_place_index
+
+# 3: the version hashes every array and graph attribute, not just the search costs
+FORMAT_VERSION = 3
+
+# Edge columns copied from the MultiGraph edge attributes
+EDGE_COLUMNS = ("time_norm", "price_norm", "emissions_norm", "time", "price", "distance")
+
+# graph.graph attributes read by the search
+GRAPH_ATTRS = ("time_min", "time_max", "price_min", "price_max",
+               "emissions_min", "emissions_max", "max_speed", "min_price_per_km")
+
+logger = logging.getLogger("routing.compiled")
+
+
+class CompiledGraph:
+    def __init__(self, node_ids, lat, lon, country, countries, indptr, mode_indptr, targets,
+                 mode, modes, columns, graph_attrs, version, directed=False):
+        self.node_ids = list(node_ids)
+        self.node_index = {node: i for i, node in enumerate(self.node_ids)}
+        self.lat = lat
+        self.lon = lon
+        self.country = country
+        self.countries = list(countries)
+        self.country_index = {code: i for i, code in enumerate(self.countries)}
+        self.indptr = indptr
+        # Edges of each row are grouped by mode: mode m of node u spans
+        # mode_indptr[u, m]:mode_indptr[u, m + 1]
+        self.mode_indptr = mode_indptr
+        self.targets = targets
+        self.mode = mode
+        self.modes = list(modes)
+        self.mode_index = {name: i for i, name in enumerate(self.modes)}
+        self.columns = columns
+        self.graph = graph_attrs
+        self.version = version
+        self.directed = directed
+        self.landmarks = None
+        self.hierarchies = []
+        self.hub_labels = []
+        self.places = None
+        # Per-node extra waiting hours from a cost overlay (routing.overlay)
+        self.waiting_penalty = None
+        # Per-node mask of nodes no route may use (routing.disasters)
+        self.blocked_nodes = None
+        self._reverse = None
+
+    def __contains__(self, node):
+        return node in self.node_index
+
+    def __len__(self):
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self):
+        return len(self.targets)
+
+    def country_of(self, i):
+        return self.countries[self.country[i]]
+
+    def edge_range(self, i):
+        return int(self.indptr[i]), int(self.indptr[i + 1])
+
+    def reverse_adjacency(self):
+        """Incoming-edge CSR as (indptr by target, edge ids, edge sources), built on first use."""
+        if self._reverse is None:
+            n = len(self)
+            sources = np.repeat(np.arange(n, dtype=np.int32), np.diff(self.indptr))
+            order = np.argsort(self.targets, kind='stable')
+            indptr = np.zeros(n + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.targets, minlength=n), out=indptr[1:])
+            self._reverse = (indptr, order, sources[order])
+        return self._reverse
+
+
+def compile_graph(multigraph):
+    node_ids = list(multigraph.nodes())
+    node_index = {node: i for i, node in enumerate(node_ids)}
+    n = len(node_ids)
+
+    lat = np.empty(n, dtype=np.float64)
+    lon = np.empty(n, dtype=np.float64)
+    country_codes = []
+    for i, node in enumerate(node_ids):
+        attrs = multigraph.nodes[node]
+        lat[i] = attrs.get('latitude', np.nan)
+        lon[i] = attrs.get('longitude', np.nan)
+        country_codes.append(attrs.get('country_code', '') or '')
+
+    src, dst, modes = [], [], []
+    values = {name: [] for name in EDGE_COLUMNS}
+    for u, v, data in multigraph.edges(data=True):
+        src.append(node_index[u])
+        dst.append(node_index[v])
+        modes.append(data['mode'])
+        for name in EDGE_COLUMNS:
+            values[name].append(data.get(name, np.nan))
+
+    graph_attrs = {key: multigraph.graph[key] for key in GRAPH_ATTRS if key in multigraph.graph}
+    return compile_arrays(node_ids, lat, lon, country_codes, src, dst, modes,
+                          {name: np.asarray(column, dtype=np.float64) for name, column in values.items()},
+                          graph_attrs, multigraph.is_directed())
+
+
+def compile_arrays(node_ids, lat, lon, country_codes, src, dst, modes, columns, graph_attrs, directed=False):
+    """CompiledGraph from per-node and per-edge arrays (edges as node indices and mode names).
+
+    Countries and modes are coded in order of first appearance, and an
+    undirected edge becomes one arc per direction, so compiling a
+    MultiGraph or the equivalent tables gives the same graph and version.
+    """
+    n = len(node_ids)
+    country, countries = pd.factorize(pd.Series(country_codes, dtype=object).fillna(''))
+    country = country.astype(np.int32)
+    mode, modes = pd.factorize(pd.Series(modes, dtype=object))
+    mode = mode.astype(np.int8)
+    modes = list(modes)
+
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+    columns = {name: np.asarray(columns[name], dtype=np.float64) for name in EDGE_COLUMNS}
+    if not directed:
+        # Arcs interleave per edge (u->v, v->u) so the stable sort below keeps MultiGraph order
+        loop = src == dst
+        both = ~loop
+        arcs = 2 - loop.astype(np.int64)
+        first = np.cumsum(arcs) - arcs
+        total = int(arcs.sum())
+        new_src, new_dst = np.empty(total, dtype=np.int64), np.empty(total, dtype=np.int64)
+        new_src[first], new_dst[first] = src, dst
+        new_src[first[both] + 1], new_dst[first[both] + 1] = dst[both], src[both]
+        mode = np.repeat(mode, arcs)
+        columns = {name: np.repeat(column, arcs) for name, column in columns.items()}
+        src, dst = new_src, new_dst
+
+    mode_counts = np.bincount(src * len(modes) + mode, minlength=n * len(modes)).reshape(n, len(modes))
+    order = np.lexsort((mode, src))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+    mode_indptr = np.empty((n, len(modes) + 1), dtype=np.int64)
+    mode_indptr[:, 0] = indptr[:-1]
+    mode_indptr[:, 1:] = indptr[:-1, None] + np.cumsum(mode_counts, axis=1)
+    targets = dst.astype(np.int32)[order]
+    mode = mode[order]
+    columns = {name: column[order] for name, column in columns.items()}
+
+    lat, lon = np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64)
+    version = _content_version(node_ids, lat, lon, country, list(countries), indptr, targets, mode, modes,
+                               columns, graph_attrs, directed)
+    return CompiledGraph(node_ids, lat, lon, country, list(countries), indptr, mode_indptr, targets, mode, modes,
+                         columns, graph_attrs, version, directed)
+
+
+def _content_version(node_ids, lat, lon, country, countries, indptr, targets, mode, modes, columns,
+                     graph_attrs, directed):
+    """Hash of everything a search, a cached result or an offline index depends on."""
+    digest = hashlib.sha1()
+    digest.update(str(FORMAT_VERSION).encode())
+    digest.update(json.dumps([list(node_ids), list(countries), list(modes), bool(directed)],
+                             default=_json_default).encode("utf-8"))
+    digest.update(json.dumps(graph_attrs, sort_keys=True, default=_json_default).encode("utf-8"))
+    for arr in (lat, lon, country, indptr, targets, mode):
+        digest.update(np.ascontiguousarray(arr).tobytes())
+    for name in EDGE_COLUMNS:
+        digest.update(np.ascontiguousarray(columns[name]).tobytes())
+    return digest.hexdigest()[:16]
+
+
+def source_stamp(pickle_path):
+    """Size and modification time of a source pickle, as recorded in meta.json."""
+    stat = os.stat(pickle_path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def save_compiled(cg, path, source=None):
+    """Write ``cg`` to ``path``; ``source`` is the source_stamp of the pickle it came from, if any.
+
+    The files are written to a temporary sibling directory which then
+    replaces ``path``; files under ``path`` are never overwritten in place.
+    """
+    path = os.path.normpath(path)
+    tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    os.makedirs(tmp)
+    try:
+        _write_compiled(cg, tmp, source)
+        _replace_directory(tmp, path)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def _meta_version(path):
+    try:
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            return json.load(f).get("version")
+    except (OSError, ValueError):
+        return None
+
+
+def _replace_directory(new, path):
+    # Renaming keeps the old files alive for processes that have them mapped
+    # (on Windows it raises PermissionError instead, and nothing has changed)
+    old = os.path.splitext(new)[0] + ".old"
+    try:
+        os.rename(path, old)
+    except FileNotFoundError:
+        old = None
+    try:
+        os.rename(new, path)
+    except OSError:
+        if old is not None:
+            if os.path.exists(path):
+                shutil.rmtree(old, ignore_errors=True)  # another writer's directory is in place
+            else:
+                os.rename(old, path)
+        raise
+    if old is None:
+        return
+    # Offline indexes (landmarks, hierarchies, hub labels) only carry over to an identical
+    # graph; after any content change they are dropped and have to be rebuilt
+    if _meta_version(old) == _meta_version(path):
+        with os.scandir(old) as entries:
+            for entry in entries:
+                if entry.is_dir() and not os.path.exists(os.path.join(path, entry.name)):
+                    os.rename(entry.path, os.path.join(path, entry.name))
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def _write_compiled(cg, path, source):
+    meta_path = os.path.join(path, "meta.json")
+    arrays = {
+        "lat": cg.lat, "lon": cg.lon, "country": cg.country,
+        "indptr": cg.indptr, "mode_indptr": cg.mode_indptr, "targets": cg.targets, "mode": cg.mode,
+    }
+    arrays.update(cg.columns)
+    for name, arr in arrays.items():
+        np.save(os.path.join(path, name + ".npy"), np.ascontiguousarray(arr))
+    with open(os.path.join(path, "nodes.json"), "w", encoding="utf-8") as f:
+        json.dump(cg.node_ids, f)
+    build_place_index(cg).save(os.path.join(path, PLACES_FILE))
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "version": cg.version,
+        "directed": cg.directed,
+        "num_nodes": len(cg),
+        "num_edges": cg.num_edges,
+        "modes": cg.modes,
+        "countries": cg.countries,
+        "columns": list(cg.columns),
+        "graph": cg.graph,
+        "source": source,
+    }
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, default=_json_default)
+
+
+def _json_default(obj):
+    # numpy scalars in graph.graph (e.g. max_speed values)
+    if hasattr(obj, "item"):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def load_compiled(path, mmap=True):
+    with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Compiled graph at {path} has format version "
+                         f"{meta.get('format_version')}, expected {FORMAT_VERSION}")
+    mmap_mode = "r" if mmap else None
+
+    def load(name):
+        return np.load(os.path.join(path, name + ".npy"), mmap_mode=mmap_mode)
+
+    with open(os.path.join(path, "nodes.json"), encoding="utf-8") as f:
+        node_ids = json.load(f)
+    columns = {name: load(name) for name in meta["columns"]}
+    return CompiledGraph(node_ids, load("lat"), load("lon"), load("country"), meta["countries"],
+                         load("indptr"), load("mode_indptr"), load("targets"), load("mode"), meta["modes"],
+                         columns, meta["graph"], meta["version"], meta["directed"])
+
+
+def compiled_path_for(pickle_path):
+    return os.path.splitext(pickle_path)[0] + ".cgraph"
+
+
+def attach_indexes(cg, compiled_path):
+    # Optional offline indexes stored next to the compiled graph
+    attach_landmarks(cg, compiled_path)
+    attach_hierarchies(cg, compiled_path)
+    attach_hub_labels(cg, compiled_path)
+    attach_places(cg, compiled_path)
+    return cg
+
+
+def _is_current(compiled_path, pickle_path):
+    """Whether the compiled directory was built from the current pickle.
+
+    Graphs built from node and edge tables (routing.build) record no
+    source; they are used as long as they are newer than the pickle.
+    """
+    meta_path = os.path.join(compiled_path, "meta.json")
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return False
+    if "source" not in meta:
+        return False  # written before sources were recorded
+    if not os.path.exists(pickle_path):
+        return True  # nothing to compare against (e.g. only the compiled graph was deployed)
+    if meta["source"] is None:
+        return os.path.getmtime(meta_path) >= os.path.getmtime(pickle_path)
+    return meta["source"] == source_stamp(pickle_path)
+
+
+def load_or_compile(pickle_path, compiled_path=None):
+    compiled_path = compiled_path or compiled_path_for(pickle_path)
+    if _is_current(compiled_path, pickle_path):
+        try:
+            return attach_indexes(load_compiled(compiled_path), compiled_path)
+        except ValueError:
+            pass  # stale format, recompile below
+    source = source_stamp(pickle_path)
+    with open(pickle_path, "rb") as f:
+        multigraph = pickle.load(f)
+    cg = compile_graph(multigraph)
+    try:
+        save_compiled(cg, compiled_path, source)
+    except OSError as e:
+        # Another replica may have swapped in the same build first; otherwise the directory is
+        # in use (Windows) or unwritable, and this process runs on the graph in memory
+        if not _is_current(compiled_path, pickle_path):
+            logger.warning("Could not replace %s (%s); using the compiled graph from memory",
+                           compiled_path, e)
+            attach_landmarks(cg, compiled_path)
+            attach_hierarchies(cg, compiled_path)
+            attach_hub_labels(cg, compiled_path)
+            cg.places = build_place_index(cg)
+            return cg
+    return attach_indexes(load_compiled(compiled_path), compiled_path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compile a routing graph pickle into the mmap format")
+    parser.add_argument("pickle_path")
+    parser.add_argument("--out", default=None)
+    args = parser.parse_args()
+    with open(args.pickle_path, "rb") as f:
+        compiled = compile_graph(pickle.load(f))
+    out = args.out or compiled_path_for(args.pickle_path)
+    save_compiled(compiled, out, source_stamp(args.pickle_path))
+    print(f"Wrote {len(compiled)} nodes / {compiled.num_edges} edges to {out} (version {compiled.version})")
@@ -0,0 +1,60 @@
+from math import radians, sin, cos, sqrt, atan2
+
+# CO2 emission factors (g per ton-km)
+EMISSION_FACTORS = {
+    "sea": 0.01,  # 10g per ton-km
+    "land": 0.1,  # 100g per ton-km
+    "air": 0.7,   # 700g per ton-km
+}
+
+# Average port waiting times per country (hours)
+waiting_times = {
+    "CN": 117.7,
+    "AU": 187.1,
+    "US": 118.2,
+    "BR": 366.3,
+    "RU": 106.8,
+    "CA": 126.5,
+    "AR": 55.7,
+    "ZA": 237.5,
+    "JP": 68.4,
+    "IN": 90.0,
+    "UA": 58.8,
+    "AE": 79.2,
+    "ID": 63.4,
+    "KR": 74.7,
+    "NZ": 64.8,
+    "CL": 280.3,
+    "TR": 130.1,
+    "VN": 48.6,
+    "CO": 83.4,
+    "MY": 126.5,
+    "MX": 109.2,
+    "TW": 71.3,
+    "PE": 196.5,
+    "OM": 85.4,
+    "NO": 45.2,
+    "FR": 58.4,
+    "SA": 89.5,
+    "MA": 227.4,
+    "RO": 83.5,
+    "MZ": 265.3
+}
+DEFAULT_WAITING_TIME = 89.5
+AIR_WAITING_TIME = 2
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    R = 6371  # Earth's radius in km
+    dlat = radians(lat2 - lat1)
+    dlon = radians(lon2 - lon1)
+    a = sin(dlat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlon / 2) ** 2
+    c = 2 * atan2(sqrt(a), sqrt(1 - a))
+    return R * c
+
+
+def calculate_sustainability_score(co2_emissions):
+    # Simple scoring system: lower CO2 = higher score (0-100)
+    max_co2 = 5000  # Assume 5000kg as max for normalization
+    score = max(0, 100 - (co2_emissions / max_co2 * 100))
+    return round(score, 2)
@@ -0,0 +1,167 @@
+"""Disaster-aware routing: graph nodes near active GDACS alerts are blocked.
+
+The current GDACS events are joined against the graph's node coordinates
+in one bulk radius query on the place index's unit-sphere KD-tree (a
+great-circle radius is a chord radius on the unit sphere, so the result is
+the same as a haversine ball query). Every node within the radius of a
+blocking event ends up in a boolean mask. ``with_blocked_nodes`` derives a
+CompiledGraph that carries the mask, in the same way a cost overlay does:
+RouteQuery ORs the mask into its avoided-country mask, so search pays
+nothing per edge. The derived graph has its own version, so route caches
+never mix blocked and unblocked results. ``DisasterFilter`` only redoes
+the join when the event set or the underlying graph changes.
+"""
+import copy
+import hashlib
+import threading
+
+import numpy as np
+import pandas as pd
+
+from routing.heuristics import EARTH_RADIUS_KM
+from routing.places import _unit_vectors, build_place_index
+
+BLOCKING_ALERT_LEVELS = ("Red",)
+# Blocking radius around an event by GDACS event type; droughts don't close ports
+EVENT_RADIUS_KM = {"TC": 300.0, "EQ": 100.0, "FL": 100.0, "VO": 50.0, "WF": 25.0, "DR": 0.0}
+DEFAULT_RADIUS_KM = 100.0
+# The GDACS reader has no timeout of its own; a hung feed must not hang the page
+GDACS_TIMEOUT_S = 15.0
+
+_client = None
+
+
+def _latest_events(timeout, **kwargs):
+    # The request runs in a daemon thread: one that never returns is abandoned, not waited for
+    result = {}
+
+    def fetch():
+        try:
+            result["data"] = _client.latest_events(**kwargs)
+        except Exception as e:
+            result["error"] = e
+
+    worker = threading.Thread(target=fetch, name="gdacs-fetch", daemon=True)
+    worker.start()
+    worker.join(timeout)
+    if worker.is_alive():
+        raise TimeoutError(f"GDACS did not answer within {timeout:g} s")
+    if "error" in result:
+        raise result["error"]
+    return result["data"]
+
+
+def get_recent_disasters_df(event_type: str = None, limit: int = 20, timeout: float = GDACS_TIMEOUT_S):
+    global _client
+    if _client is None:
+        from gdacs.api import GDACSAPIReader
+
+        _client = GDACSAPIReader()
+    if event_type is None:
+        geojson_data = _latest_events(timeout, limit=limit)
+    else:
+        geojson_data = _latest_events(timeout, limit=limit, event_type=event_type)
+    geojson_dict = dict(geojson_data)
+    features = geojson_dict.get("features", [])
+
+    event_records = []
+    for feature in features:
+        properties = feature.get("properties", {})
+        geometry = feature.get("geometry", {})
+        coordinates = geometry.get("coordinates", [None, None])
+
+        event_records.append({
+            "Event Type": properties.get("eventtype"),
+            "Event ID": properties.get("eventid"),
+            "Country": properties.get("country"),
+            "Latitude": coordinates[1],
+            "Longitude": coordinates[0],
+            "Alert Level": properties.get("alertlevel"),
+            "Alert Score": properties.get("alertscore"),
+            "Event Name": properties.get("name") or "Unknown",
+            "Description": properties.get("description"),
+            "From Date": properties.get("fromdate"),
+            "To Date": properties.get("todate"),
+            "Severity": properties.get("severitydata", {}).get("severity"),
+            "Severity Text": properties.get("severitydata", {}).get("severitytext"),
+            "Report URL": properties.get("url", {}).get("report")
+        })
+
+    df = pd.DataFrame(event_records)
+    return df
+
+
+def blocking_events(df, alert_levels=BLOCKING_ALERT_LEVELS):
+    """Sorted ``(event id, event type, lat, lon, radius km)`` tuples of the events that block nodes.
+
+    The tuple doubles as the key of the event set: it only changes when
+    an event that blocks nodes appears, moves or ends.
+    """
+    if df is None or df.empty:
+        return ()
+    events = set()
+    for record in df.to_dict("records"):
+        if record.get("Alert Level") not in alert_levels:
+            continue
+        lat, lon = record.get("Latitude"), record.get("Longitude")
+        if lat is None or lon is None or pd.isna(lat) or pd.isna(lon):
+            continue
+        kind = record.get("Event Type")
+        radius = EVENT_RADIUS_KM.get(kind, DEFAULT_RADIUS_KM)
+        if radius > 0:
+            events.add((str(record.get("Event ID")), kind, float(lat), float(lon), radius))
+    return tuple(sorted(events))
+
+
+def blocked_node_mask(cg, events):
+    """Boolean mask of the nodes within the radius of any of ``events``."""
+    mask = np.zeros(len(cg), dtype=bool)
+    if not events:
+        return mask
+    places = cg.places if cg.places is not None else build_place_index(cg)
+    lat, lon, radius = (np.array(column, dtype=np.float64) for column in list(zip(*events))[2:])
+    # Great-circle radius -> straight-line chord through the unit sphere
+    chord = 2 * np.sin(np.minimum(radius / EARTH_RADIUS_KM, np.pi) / 2)
+    hits = places.tree.query_ball_point(_unit_vectors(lat, lon), chord)
+    for found in hits:
+        mask[places.tree_nodes[found]] = True
+    return mask
+
+
+def with_blocked_nodes(cg, events):
+    """CompiledGraph sharing every array with ``cg`` but routing around the nodes ``events`` block."""
+    mask = blocked_node_mask(cg, events)
+    if not mask.any():
+        return cg
+    blocked = copy.copy(cg)
+    if cg.blocked_nodes is not None:
+        mask |= cg.blocked_nodes
+    blocked.blocked_nodes = mask
+    digest = hashlib.sha1(repr(events).encode("utf-8")).hexdigest()[:16]
+    blocked.version = hashlib.sha1(f"{cg.version}:disasters:{digest}".encode("utf-8")).hexdigest()[:16]
+    # Contraction hierarchies and hub labels were built without the mask; landmark
+    # bounds stay admissible because blocking nodes only makes paths longer
+    blocked.hierarchies = []
+    blocked.hub_labels = []
+    return blocked
+
+
+class DisasterFilter:
+    """Caches ``with_blocked_nodes`` per (graph version, event set).
+
+    ``current(cg, events)`` is a tuple comparison when neither changed, so
+    it can run on every request.
+    """
+
+    def __init__(self):
+        self._key = None
+        self._graph = None
+        self._lock = threading.Lock()
+
+    def current(self, cg, events):
+        key = (cg.version, tuple(events))
+        with self._lock:
+            if key != self._key:
+                self._graph = with_blocked_nodes(cg, key[1])
+                self._key = key
+            return self._graph
@@ -0,0 +1,74 @@
+"""Vectorized cost-to-goal lower bounds for the A* router.
+
+The bound for every node is computed in one NumPy pass over the lat/lon
+columns of the compiled graph (tightened with landmark bounds when the
+graph has an ALT index attached) and kept in an LRU cache keyed by
+(graph version, goal, allowed-mode set, weight triple), so repeated
+queries to the same destination skip the work entirely.
+"""
+import numpy as np
+
+from routing.costs import EMISSION_FACTORS
+from routing.lru import LRUCache
+
+EARTH_RADIUS_KM = 6371
+
+HEURISTIC_CACHE_SIZE = 32
+
+heuristic_cache = LRUCache(maxsize=HEURISTIC_CACHE_SIZE)
+
+
+def haversine_np(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = (np.radians(x) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return EARTH_RADIUS_KM * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def _normalize(value, lo, hi):
+    return (value - lo) / (hi - lo) * 100 if hi > lo else np.zeros_like(value)
+
+
+def node_bounds(cg, nodes, target, allowed_modes, weights, reverse=False):
+    """Lower bounds on the cost between each of ``nodes`` and ``target``.
+
+    Bounds are to ``target`` by default and from it with ``reverse``; the
+    haversine part is symmetric, only the landmark part depends on direction.
+    """
+    time_weight, price_weight, emissions_weight = weights
+    graph = cg.graph
+    max_speed = graph['max_speed']
+    min_price_per_km = graph['min_price_per_km']
+    max_speed_allowed = max(max_speed[mode] for mode in allowed_modes if mode in max_speed)
+    min_price_per_km_allowed = min(min_price_per_km[mode] for mode in allowed_modes if mode in min_price_per_km)
+    emission_factors = graph.get('emission_factors', EMISSION_FACTORS)
+    min_emission_factor = min(emission_factors[mode] for mode in allowed_modes)
+
+    dist = haversine_np(cg.lat[nodes], cg.lon[nodes], cg.lat[target], cg.lon[target])
+    with np.errstate(divide='ignore'):
+        time_est = dist / max_speed_allowed if max_speed_allowed > 0 else np.full_like(dist, np.inf)
+    h = (time_weight * _normalize(time_est, graph['time_min'], graph['time_max']) +
+         price_weight * _normalize(dist * min_price_per_km_allowed, graph['price_min'], graph['price_max']) +
+         emissions_weight * _normalize(dist * min_emission_factor, graph['emissions_min'], graph['emissions_max']))
+    h[dist == 0] = 0
+    if cg.landmarks is not None:
+        # Landmark (ALT) bounds are exact-distance based and much tighter
+        landmark_bound = cg.landmarks.lower_bound(target, allowed_modes, weights, nodes, reverse)
+        if landmark_bound is not None:
+            h = np.maximum(h, landmark_bound)
+    h[nodes == target] = 0
+    return h
+
+
+def compute_goal_heuristic(cg, goal, allowed_modes, weights):
+    h = node_bounds(cg, np.arange(len(cg)), goal, allowed_modes, weights)
+    h.setflags(write=False)
+    return h
+
+
+def goal_heuristic(cg, goal, allowed_modes, weights):
+    """Cached lower bound array for ``goal`` (a node index)."""
+    allowed_modes = frozenset(allowed_modes)
+    weights = tuple(float(w) for w in weights)
+    key = (cg.version, cg.landmarks is not None, goal, allowed_modes, weights)
+    return heuristic_cache.get_or_compute(
+        key, lambda: compute_goal_heuristic(cg, goal, allowed_modes, weights))
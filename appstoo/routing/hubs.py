@@ -0,0 +1,373 @@
+"""Hub labels (2-hop cover) over the sea/air backbone for fixed profiles.
+
+The backbone is every node with an allowed sea or air edge. Offline, each
+backbone node is connected to the backbone nodes it reaches through
+non-backbone land nodes by a shortcut arc, which makes backbone-to-backbone
+distances on the resulting overlay equal to full-graph distances. Pruned
+landmark labeling then stores, for every backbone node, its distances to
+and from a small set of hubs, so the cost between two backbone nodes is a
+merge of two sorted label lists.
+
+A query searches locally from the start until it reaches backbone nodes
+(never expanding through them), does the same backwards from the goal,
+and joins the two access sets through the labels. Any route decomposes
+into start -> first backbone node -> last backbone node -> goal, so the
+answer is exact. Like contraction hierarchies, an index serves one
+(weights, modes) profile without avoided countries.
+
+Build with ``python -m routing.hubs <compiled graph dir> --weights 0.25 0.25 0.5``.
+"""
+import heapq
+import json
+import os
+
+import numpy as np
+
+from routing.bidirectional import _reverse_edges
+from routing.ch import DEFAULT_PROFILES, profile_edge_costs, profile_key
+from routing.kpaths import Path, astar_path
+
+HUBS_DIR = "hubs"
+BACKBONE_MODES = ("sea", "air")
+
+
+def backbone_mask(cg, costs):
+    """Nodes with at least one allowed (finite cost) backbone-mode edge, in either direction."""
+    backbone_modes = [cg.mode_index[m] for m in BACKBONE_MODES if m in cg.mode_index]
+    edges = np.flatnonzero(np.isin(cg.mode, backbone_modes) & np.isfinite(costs))
+    mask = np.zeros(len(cg), dtype=bool)
+    sources = np.repeat(np.arange(len(cg)), np.diff(cg.indptr))
+    mask[sources[edges]] = True
+    mask[cg.targets[edges]] = True
+    return mask
+
+
+def _overlay_arcs(cg, sources, costs, backbone):
+    """Cheapest arc per ordered backbone pair whose interior avoids the backbone.
+
+    Returns {(a, b): (cost, [edge ids])} in node indices.
+    """
+    arcs = {}
+
+    def offer(a, b, cost, edges):
+        if a != b and cost < arcs.get((a, b), (float('inf'),))[0]:
+            arcs[(a, b)] = (cost, edges)
+
+    for e in np.flatnonzero(np.isfinite(costs) & backbone[sources] & backbone[cg.targets]).tolist():
+        offer(int(sources[e]), int(cg.targets[e]), float(costs[e]), [e])
+
+    for a in np.flatnonzero(backbone).tolist():
+        # Land search from a that stops at the first backbone node on every branch
+        dist, pred = {a: 0.0}, {a: (-1, -1)}
+        queue = [(0.0, a)]
+        while queue:
+            d, u = heapq.heappop(queue)
+            if d > dist[u]:
+                continue
+            if u != a and backbone[u]:
+                edges, v = [], u
+                while v != a:
+                    v, e = pred[v]
+                    edges.append(e)
+                if len(edges) > 1:
+                    offer(a, u, d, edges[::-1])
+                continue
+            lo, hi = cg.edge_range(u)
+            for e in range(lo, hi):
+                c = costs[e]
+                if not np.isfinite(c):
+                    continue
+                v = int(cg.targets[e])
+                if u == a and backbone[v]:
+                    continue  # direct backbone arcs were added above
+                nd = d + float(c)
+                if nd < dist.get(v, float('inf')):
+                    dist[v] = nd
+                    pred[v] = (u, e)
+                    heapq.heappush(queue, (nd, v))
+    return arcs
+
+
+def _pruned_labels(num, arc_src, arc_dst, arc_cost, order):
+    """Pruned landmark labeling on the overlay: per node dicts {hub: (dist, parent arc)}."""
+    out_adj = [[] for _ in range(num)]
+    in_adj = [[] for _ in range(num)]
+    for arc, (u, v) in enumerate(zip(arc_src, arc_dst)):
+        out_adj[u].append(arc)
+        in_adj[v].append(arc)
+    out_labels = [dict() for _ in range(num)]   # v -> h
+    in_labels = [dict() for _ in range(num)]    # h -> v
+
+    def covered(first, second, d):
+        small, large = (first, second) if len(first) <= len(second) else (second, first)
+        return any(hub in large and entry[0] + large[hub][0] <= d for hub, entry in small.items())
+
+    for h in order:
+        # Forward from h fills in-labels, backward fills out-labels
+        for labels, other, adjacency, endpoint in ((in_labels, out_labels[h], out_adj, arc_dst),
+                                                   (out_labels, in_labels[h], in_adj, arc_src)):
+            dist, parent = {h: 0.0}, {h: -1}
+            queue = [(0.0, h)]
+            while queue:
+                d, v = heapq.heappop(queue)
+                if d > dist[v]:
+                    continue
+                # Pruned when an earlier hub already certifies this distance
+                if v != h and covered(other, labels[v], d):
+                    continue
+                labels[v][h] = (d, parent[v])
+                for arc in adjacency[v]:
+                    w = endpoint[arc]
+                    nd = d + arc_cost[arc]
+                    if nd < dist.get(w, float('inf')):
+                        dist[w] = nd
+                        parent[w] = arc
+                        heapq.heappush(queue, (nd, w))
+    return out_labels, in_labels
+
+
+def _label_arrays(labels):
+    indptr = np.zeros(len(labels) + 1, dtype=np.int64)
+    np.cumsum([len(entries) for entries in labels], out=indptr[1:])
+    hub, dist, arc = [], [], []
+    for entries in labels:
+        for h in sorted(entries):
+            hub.append(h)
+            dist.append(entries[h][0])
+            arc.append(entries[h][1])
+    return indptr, np.asarray(hub, dtype=np.int64), np.asarray(dist, dtype=np.float64), np.asarray(arc, dtype=np.int64)
+
+
+def build_hub_labels(cg, weights, allowed_modes):
+    sources, costs = profile_edge_costs(cg, weights, allowed_modes)
+    backbone = backbone_mask(cg, costs)
+    nodes = np.flatnonzero(backbone)
+    local_index = np.full(len(cg), -1, dtype=np.int64)
+    local_index[nodes] = np.arange(len(nodes))
+
+    arcs = _overlay_arcs(cg, sources, costs, backbone)
+    pairs = sorted(arcs)
+    arc_src = [int(local_index[a]) for a, _ in pairs]
+    arc_dst = [int(local_index[b]) for _, b in pairs]
+    arc_cost = [arcs[p][0] for p in pairs]
+    arc_edges = [arcs[p][1] for p in pairs]
+
+    # Best connected backbone nodes become the highest ranked hubs
+    degree = np.bincount(arc_src + arc_dst, minlength=len(nodes))
+    order = np.argsort(-degree, kind='stable').tolist()
+    out_labels, in_labels = _pruned_labels(len(nodes), arc_src, arc_dst, arc_cost, order)
+
+    arrays = {"nodes": nodes.astype(np.int64),
+              "arc_src": np.asarray(arc_src, dtype=np.int64),
+              "arc_dst": np.asarray(arc_dst, dtype=np.int64),
+              "arc_cost": np.asarray(arc_cost, dtype=np.float64),
+              "arc_edge_indptr": np.concatenate([[0], np.cumsum([len(e) for e in arc_edges])]).astype(np.int64),
+              "arc_edges": np.asarray([e for edges in arc_edges for e in edges], dtype=np.int64)}
+    for prefix, labels in (("out", out_labels), ("in", in_labels)):
+        (arrays[prefix + "_indptr"], arrays[prefix + "_hub"],
+         arrays[prefix + "_dist"], arrays[prefix + "_arc"]) = _label_arrays(labels)
+    return HubLabelIndex(arrays, weights, allowed_modes, cg.version)
+
+
+def _gather(indptr, owners):
+    """Label entry ids of every owner, and the position in ``owners`` each entry belongs to."""
+    starts, ends = indptr[owners], indptr[np.asarray(owners) + 1]
+    counts = ends - starts
+    entries = np.concatenate([np.arange(lo, hi) for lo, hi in zip(starts.tolist(), ends.tolist())]
+                             or [np.arange(0)])
+    return entries.astype(np.int64), np.repeat(np.arange(len(owners)), counts)
+
+
+class HubLabelIndex:
+    ARRAYS = ("nodes", "arc_src", "arc_dst", "arc_cost", "arc_edge_indptr", "arc_edges",
+              "out_indptr", "out_hub", "out_dist", "out_arc",
+              "in_indptr", "in_hub", "in_dist", "in_arc")
+
+    def __init__(self, arrays, weights, allowed_modes, version):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.weights = tuple(float(w) for w in weights)
+        self.allowed_modes = frozenset(allowed_modes)
+        self.version = version
+        self.local_index = {int(v): i for i, v in enumerate(np.asarray(self.nodes).tolist())}
+
+    def matches(self, weights, allowed_modes, avoid_countries=()):
+        # Exact weights, as for contraction hierarchies: profile_key rounds and is only a file name
+        return (not avoid_countries and frozenset(allowed_modes) == self.allowed_modes and
+                tuple(float(w) for w in weights) == self.weights)
+
+    def distance(self, a, b):
+        """Backbone-to-backbone cost between node indices ``a`` and ``b`` (a sorted-label merge)."""
+        a, b = self.local_index[a], self.local_index[b]
+        out_hubs = self.out_hub[self.out_indptr[a]:self.out_indptr[a + 1]]
+        in_hubs = self.in_hub[self.in_indptr[b]:self.in_indptr[b + 1]]
+        common, i, j = np.intersect1d(out_hubs, in_hubs, assume_unique=True, return_indices=True)
+        if not len(common):
+            return float('inf')
+        return float(np.min(self.out_dist[self.out_indptr[a] + i] + self.in_dist[self.in_indptr[b] + j]))
+
+    def _local_search(self, query, source, reverse):
+        """Search from ``source`` that stops at backbone nodes; returns (dist, pred, access)."""
+        dist, pred = {source: 0.0}, {source: (-1, -1)}
+        access = {}
+        queue = [(0.0, source)]
+        while queue:
+            d, u = heapq.heappop(queue)
+            if d > dist[u]:
+                continue
+            if u in self.local_index:
+                access[u] = d
+                continue
+            if reverse:
+                edges, neighbors, costs = _reverse_edges(query, u, source)
+            else:
+                edges, neighbors, costs = query.relax(u)
+            for e, v, c in zip(edges.tolist(), neighbors.tolist(), costs.tolist()):
+                nd = d + c
+                if nd < dist.get(v, float('inf')):
+                    dist[v] = nd
+                    pred[v] = (u, e)
+                    heapq.heappush(queue, (nd, v))
+        return dist, pred, access
+
+    def _entry(self, prefix, v, hub):
+        indptr, hubs = getattr(self, prefix + "_indptr"), getattr(self, prefix + "_hub")
+        lo, hi = int(indptr[v]), int(indptr[v + 1])
+        return lo + int(np.searchsorted(hubs[lo:hi], hub))
+
+    def _arc_edges(self, arc):
+        return self.arc_edges[self.arc_edge_indptr[arc]:self.arc_edge_indptr[arc + 1]].tolist()
+
+    def _backbone_edges(self, a, hub, b):
+        edges, v = [], a
+        while v != hub:
+            arc = int(self.out_arc[self._entry("out", v, hub)])
+            edges.extend(self._arc_edges(arc))
+            v = int(self.arc_dst[arc])
+        arcs, v = [], b
+        while v != hub:
+            arc = int(self.in_arc[self._entry("in", v, hub)])
+            arcs.append(arc)
+            v = int(self.arc_src[arc])
+        for arc in reversed(arcs):
+            edges.extend(self._arc_edges(arc))
+        return edges
+
+    def query(self, query, s, t):
+        """Cheapest path s -> t as original CSR edge ids and its cost (None, inf if unreachable)."""
+        forward, forward_pred, access = self._local_search(query, s, reverse=False)
+        backward, backward_pred, egress = self._local_search(query, t, reverse=True)
+        best, route = forward.get(t, float('inf')), ("local", t, None, None)
+        if t not in self.local_index:
+            # A route with no backbone node in its interior meets inside the start's land cell
+            for v, d in forward.items():
+                if v in backward and d + backward[v] < best:
+                    best, route = d + backward[v], ("local", v, None, None)
+
+        if access and egress:
+            a_nodes = [self.local_index[a] for a in access]
+            b_nodes = [self.local_index[b] for b in egress]
+            a_cost = np.asarray(list(access.values()))
+            b_cost = np.asarray(list(egress.values()))
+            # Cheapest hub -> goal cost through any egress node, per hub
+            b_entries, b_owner = _gather(self.in_indptr, np.asarray(b_nodes, dtype=np.int64))
+            to_goal = self.in_dist[b_entries] + b_cost[b_owner]
+            order = np.lexsort((to_goal, self.in_hub[b_entries]))
+            hubs, first = np.unique(self.in_hub[b_entries][order], return_index=True)
+            hub_cost, hub_entry = to_goal[order][first], order[first]
+
+            a_entries, a_owner = _gather(self.out_indptr, np.asarray(a_nodes, dtype=np.int64))
+            a_hubs = self.out_hub[a_entries]
+            pos = np.minimum(np.searchsorted(hubs, a_hubs), max(len(hubs) - 1, 0))
+            if len(hubs):
+                valid = hubs[pos] == a_hubs
+                total = np.where(valid, a_cost[a_owner] + self.out_dist[a_entries] + hub_cost[pos], np.inf)
+                k = int(np.argmin(total))
+                if total[k] < best:
+                    a = a_nodes[a_owner[k]]
+                    b = b_nodes[b_owner[hub_entry[pos[k]]]]
+                    best, route = float(total[k]), ("hub", a, int(a_hubs[k]), b)
+
+        if not np.isfinite(best):
+            return None, float('inf')
+        kind, x, hub, y = route
+        if kind == "local":
+            first_leg, last_start = x, x
+            middle = []
+        else:
+            first_leg, last_start = int(self.nodes[x]), int(self.nodes[y])
+            middle = self._backbone_edges(x, hub, y)
+        head, v = [], first_leg
+        while v != s:
+            v, e = forward_pred[v]
+            head.append(e)
+        tail, v = [], last_start
+        while v != t:
+            v, e = backward_pred[v]
+            tail.append(e)
+        return head[::-1] + middle + tail, best
+
+    def shortest_path_fn(self, fallback=astar_path):
+        """Single-pair search for Yen's algorithm: labels for unconstrained calls, ``fallback`` otherwise."""
+        def shortest(query, source, banned_nodes=frozenset(), banned_pairs=frozenset()):
+            if banned_nodes or banned_pairs:
+                return fallback(query, source, banned_nodes, banned_pairs)
+            edges, _ = self.query(query, source, query.goal)
+            if edges is None:
+                return None
+            nodes = [source] + [int(query.cg.targets[e]) for e in edges]
+            return Path(nodes, edges, query.path_cost(nodes, edges))
+        return shortest
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        for name in self.ARRAYS:
+            np.save(os.path.join(path, name + ".npy"), getattr(self, name))
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "weights": list(self.weights),
+                       "allowed_modes": sorted(self.allowed_modes)}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = {name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r") for name in cls.ARRAYS}
+        return cls(arrays, meta["weights"], meta["allowed_modes"], meta["version"])
+
+
+def attach_hub_labels(cg, compiled_path):
+    root = os.path.join(compiled_path, HUBS_DIR)
+    if not os.path.isdir(root):
+        return cg
+    for name in sorted(os.listdir(root)):
+        path = os.path.join(root, name)
+        if os.path.exists(os.path.join(path, "meta.json")):
+            index = HubLabelIndex.load(path)
+            if index.version == cg.version:
+                cg.hub_labels.append(index)
+    return cg
+
+
+def matching_hub_labels(cg, weights, allowed_modes, avoid_countries=()):
+    for index in cg.hub_labels:
+        if index.matches(weights, allowed_modes, avoid_countries):
+            return index
+    return None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from routing.compiled import load_compiled
+
+    parser = argparse.ArgumentParser(description="Build a backbone hub-label index for a weight/mode profile")
+    parser.add_argument("compiled_path")
+    parser.add_argument("--weights", type=float, nargs=3, default=DEFAULT_PROFILES[0][0],
+                        metavar=("TIME", "PRICE", "EMISSIONS"))
+    parser.add_argument("--modes", nargs="+", default=list(DEFAULT_PROFILES[0][1]))
+    args = parser.parse_args()
+    graph = load_compiled(args.compiled_path)
+    index = build_hub_labels(graph, tuple(args.weights), args.modes)
+    index.save(os.path.join(args.compiled_path, HUBS_DIR, profile_key(args.weights, args.modes)))
+    print(f"Labelled {len(index.nodes)} backbone nodes: {len(index.out_hub) + len(index.in_hub)} "
+          f"label entries over {len(index.arc_src)} overlay arcs")
@@ -0,0 +1,161 @@
+"""Reachability: every node that can be reached from one start within budgets.
+
+One Dijkstra from the start, with the same mode and avoid-country
+filters as route search, replaces a route search per candidate
+destination. Along the shortest-path tree it adds up the raw hours (edge
+time plus port and airport waiting), price and CO2 per ton, and an edge
+is only relaxed when the path through it stays within every budget.
+
+With a single budget and no explicit weights the search orders paths by
+that budget's own raw metric, so it finds exactly the nodes whose
+cheapest path in that metric is within budget. Otherwise it orders them
+by the RouteQuery cost (by default weighted evenly over the normalized
+columns of the budgets given). That cost differs from the budget metrics
+(border penalties, no waiting time), so a node that is only within budget
+along a path that is not the cheapest by that cost may be missed.
+"""
+import heapq
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from routing.costs import AIR_WAITING_TIME, DEFAULT_WAITING_TIME, EMISSION_FACTORS, waiting_times
+from routing.query import RouteQuery
+from routing.search import cargo_co2, cargo_cost, resolve_endpoints
+from routing.stats import SearchStats
+
+# Reached nodes in the order they were settled (by cost); the start comes first
+Reachable = namedtuple("Reachable", ["nodes", "cost", "time", "price", "co2_per_ton", "parent_edge"])
+
+DEFAULT_WEIGHTS = (0.333, 0.333, 0.334)
+
+
+def budget_weights(max_time=None, max_price=None, max_co2_per_ton=None):
+    """Cost weights spread evenly over the budgeted columns."""
+    budgeted = [limit is not None for limit in (max_time, max_price, max_co2_per_ton)]
+    if not any(budgeted):
+        return DEFAULT_WEIGHTS
+    return tuple(b / sum(budgeted) for b in budgeted)
+
+
+def _port_waiting(cg):
+    """Waiting hours of a sea edge arriving at each node (see query.path_waiting_time)."""
+    per_country = np.array([waiting_times.get(c, DEFAULT_WAITING_TIME) / 2 for c in cg.countries])
+    hours = per_country[cg.country]
+    if cg.waiting_penalty is not None:
+        hours = hours + cg.waiting_penalty
+    return hours
+
+
+def reachable(cg, start, max_time=None, max_cost=None, max_co2=None, weight=30000,
+              allowed_modes=['land', 'sea', 'air'], avoid_countries=None, weights=None, stats=None):
+    """Nodes reachable from ``start`` within the budgets, as a Reachable of arrays.
+
+    ``max_time`` is in hours including waiting; ``max_cost`` and ``max_co2``
+    are the cargo totals for ``weight`` kg (see apply_cargo_weight). A
+    budget of None is unlimited. The cargo cost formula is zero at exactly
+    995 kg, so there every path is free and ``max_cost`` excludes nothing.
+    ``cost`` in the result is the search's ordering key.
+    """
+    endpoints = resolve_endpoints(cg, start, start, avoid_countries)
+    if "error" in endpoints:
+        return endpoints
+    s = endpoints["start"]
+
+    # Cargo totals are linear in the per-path price and CO2 per ton; a zero factor
+    # (no cargo, or the 995 kg cost step) makes every path meet that budget
+    price_per_cost, co2_per_ton_per_co2 = cargo_cost(1.0, weight), cargo_co2(1.0, weight)
+    max_price = max_cost / price_per_cost if max_cost is not None and price_per_cost > 0 else None
+    max_co2_per_ton = max_co2 / co2_per_ton_per_co2 if max_co2 is not None and co2_per_ton_per_co2 > 0 else None
+    limits = np.array([np.inf if limit is None else float(limit)
+                       for limit in (max_time, max_price, max_co2_per_ton)])
+    budgeted = np.flatnonzero(np.isfinite(limits)).tolist()
+    # Index of the total the search is ordered by, or None for the RouteQuery cost
+    metric = budgeted[0] if weights is None and len(budgeted) == 1 else None
+    if weights is None:
+        weights = budget_weights(max_time, max_price, max_co2_per_ton)
+
+    query_stats = SearchStats()
+    query = RouteQuery(cg, s, s, weights, allowed_modes, avoid_countries, with_heuristic=False,
+                       stats=query_stats)
+    columns = cg.columns
+    time_col, price_col, distance_col = columns['time'], columns['price'], columns['distance']
+    emission_factors = cg.graph.get('emission_factors', EMISSION_FACTORS)
+    mode_co2 = np.array([emission_factors.get(m, 0.0) for m in cg.modes])
+    port_wait = _port_waiting(cg)
+    sea, air = cg.mode_index.get('sea', -1), cg.mode_index.get('air', -1)
+
+    n = len(cg)
+    cost = np.full(n, np.inf)
+    totals = np.zeros((n, 3))
+    parent_edge = np.full(n, -1, dtype=np.int64)
+    settled = np.zeros(n, dtype=bool)
+    cost[s] = 0.0
+    order = []
+    queue = [(0.0, s)]
+    pushes, peak = 1, 1
+
+    try:
+        with query_stats.timer("search_s"):
+            while queue:
+                d, u = heapq.heappop(queue)
+                if settled[u]:
+                    continue
+                settled[u] = True
+                order.append(u)
+
+                if metric is None:
+                    edges, targets, costs = query.relax(u)
+                else:
+                    edges, targets = query.allowed_edges(u)
+                if not len(edges):
+                    continue
+                modes = cg.mode[edges]
+                wait = np.where(modes == sea, port_wait[targets], 0.0) + np.where(modes == air, AIR_WAITING_TIME, 0.0)
+                used = totals[u] + np.column_stack((time_col[edges] + wait, price_col[edges],
+                                                    distance_col[edges] * mode_co2[modes]))
+                new_cost = d + costs if metric is None else used[:, metric]
+                candidates = np.flatnonzero((used <= limits).all(axis=1) & (new_cost < cost[targets]))
+                for i in candidates.tolist():
+                    v = int(targets[i])
+                    # Parallel edges can share a target, so re-check against the latest cost
+                    if new_cost[i] < cost[v]:
+                        cost[v] = new_cost[i]
+                        totals[v] = used[i]
+                        parent_edge[v] = edges[i]
+                        heapq.heappush(queue, (float(new_cost[i]), v))
+                        pushes += 1
+                        if len(queue) > peak:
+                            peak = len(queue)
+            query_stats.add_search(pushes, peak)
+    finally:
+        query_stats.log(start=start, avoid_countries=sorted(query.avoid_countries),
+                        allowed_modes=sorted(query.allowed_modes), weights=weights, strategy="isochrone",
+                        limits=limits.tolist(), metric=metric, reached=len(order))
+        if stats is not None:
+            stats.merge(query_stats)
+
+    nodes = np.asarray(order, dtype=np.int64)
+    return Reachable(
+        nodes=nodes.astype(np.int32),
+        cost=cost[nodes].astype(np.float32),
+        time=totals[nodes, 0].astype(np.float32),
+        price=totals[nodes, 1].astype(np.float32),
+        co2_per_ton=totals[nodes, 2].astype(np.float32),
+        parent_edge=parent_edge[nodes].astype(np.int32),
+    )
+
+
+def reachable_table(cg, reach, weight):
+    """One row per reached node with its coordinates and cargo totals for ``weight`` kg."""
+    nodes = reach.nodes
+    return pd.DataFrame({
+        "node": [cg.node_ids[v] for v in nodes.tolist()],
+        "country": [cg.countries[c] for c in cg.country[nodes].tolist()],
+        "lat": np.asarray(cg.lat)[nodes],
+        "lon": np.asarray(cg.lon)[nodes],
+        "time": reach.time,
+        "total_cost": cargo_cost(reach.price, weight),
+        "total_co2": cargo_co2(reach.co2_per_ton, weight),
+    }).round({"lat": 4, "lon": 4, "time": 2, "total_cost": 2, "total_co2": 2})
@@ -0,0 +1,108 @@
+"""Loopless k-shortest path search (Yen's algorithm) over a RouteQuery.
+
+The single-pair search keeps its labels in flat parent-pointer arrays:
+every heap entry is just (f, g, label id), and a path is only rebuilt by
+walking parent pointers once the goal is popped. Memory therefore grows
+with the number of labels explored, not labels x path length.
+"""
+import heapq
+from array import array
+from collections import namedtuple
+
+Path = namedtuple("Path", ["nodes", "edges", "cost"])
+
+
+def _unwind(label, label_node, label_parent, label_edge):
+    nodes, edges = [], []
+    while label != -1:
+        nodes.append(label_node[label])
+        if label_edge[label] != -1:
+            edges.append(label_edge[label])
+        label = label_parent[label]
+    nodes.reverse()
+    edges.reverse()
+    return nodes, edges
+
+
+def astar_path(query, source, banned_nodes=frozenset(), banned_pairs=frozenset()):
+    """Cheapest path from ``source`` to ``query.goal`` avoiding the banned nodes and node pairs."""
+    goal = query.goal
+    h = query.heuristic
+    label_node = array('q', [source])
+    label_parent = array('q', [-1])
+    label_edge = array('q', [-1])
+    best = {source: 0.0}
+    queue = [(float(h[source]), 0.0, 0)]
+    pushes, peak = 1, 1
+
+    while queue:
+        _, g, label = heapq.heappop(queue)
+        u = label_node[label]
+        if g > best[u]:
+            continue  # stale entry
+        if u == goal:
+            query.stats.add_search(pushes, peak)
+            nodes, edges = _unwind(label, label_node, label_parent, label_edge)
+            return Path(nodes, edges, g)
+
+        edges, targets, costs = query.relax(u)
+        h_row = h[targets].tolist()
+        for e, v, c, hv in zip(edges.tolist(), targets.tolist(), costs.tolist(), h_row):
+            if v in banned_nodes or (u, v) in banned_pairs:
+                continue
+            new_g = g + c
+            if new_g < best.get(v, float('inf')):
+                best[v] = new_g
+                label_node.append(v)
+                label_parent.append(label)
+                label_edge.append(e)
+                heapq.heappush(queue, (new_g + hv, new_g, len(label_node) - 1))
+                pushes += 1
+                if len(queue) > peak:
+                    peak = len(queue)
+    query.stats.add_search(pushes, peak)
+    return None
+
+
+def k_shortest_paths(query, k, shortest=astar_path):
+    """Yen's algorithm: up to ``k`` loopless paths in increasing cost order.
+
+    ``shortest`` is the single-pair search used for the first path and for
+    every spur path; it is called as ``shortest(query, source, banned_nodes,
+    banned_pairs)``.
+    """
+    first = shortest(query, query.start)
+    if first is None:
+        return []
+    accepted = [first]
+    seen = {tuple(first.nodes)}
+    candidates = []
+    counter = 0
+
+    while len(accepted) < k:
+        prev = accepted[-1]
+        prefix = [0.0]
+        for c in query.path_edge_costs(prev.nodes, prev.edges).tolist():
+            prefix.append(prefix[-1] + c)
+
+        for i in range(len(prev.nodes) - 1):
+            root = prev.nodes[:i + 1]
+            spur = root[-1]
+            banned_pairs = {(p.nodes[i], p.nodes[i + 1]) for p in accepted
+                            if len(p.nodes) > i + 1 and p.nodes[:i + 1] == root}
+            spur_path = shortest(query, spur, frozenset(root[:-1]), banned_pairs)
+            if spur_path is None:
+                continue
+            nodes = root[:-1] + spur_path.nodes
+            key = tuple(nodes)
+            if key in seen:
+                continue
+            seen.add(key)
+            cost = prefix[i] + spur_path.cost
+            counter += 1
+            heapq.heappush(candidates, (cost, counter, Path(nodes, prev.edges[:i] + spur_path.edges, cost)))
+
+        if not candidates:
+            break
+        accepted.append(heapq.heappop(candidates)[2])
+    return accepted
@@ -0,0 +1,201 @@
+"""Landmark (ALT) lower bounds for the multimodal router.
+
+Offline, a set of landmarks is picked among the best connected sea ports
+and airports, and exact shortest distances from and to every landmark are
+stored separately for the time, price and emissions columns and for every
+``allowed_modes`` subset. At query time the triangle inequality gives a
+per-column lower bound whose weighted sum bounds any slider setting.
+
+Run ``python -m routing.landmarks <compiled graph dir>`` to build the index
+next to the compiled graph; ``load_or_compile`` picks it up automatically.
+"""
+import json
+import os
+from itertools import combinations
+
+import numpy as np
+
+from routing.heuristics import haversine_np
+
+COMPONENTS = ("time_norm", "price_norm", "emissions_norm")
+HUB_MODES = ("sea", "air")
+LANDMARKS_DIR = "landmarks"
+# Distances are kept in float64: float32 rounding errors grow with the
+# distances, so differences of long float32 distances can overestimate
+DISTANCE_DTYPE = np.float64
+# The shortest-path sums themselves carry rounding error proportional to
+# their size; each difference is lowered by this much of the larger term
+_RELATIVE_ERROR = 4 * np.finfo(DISTANCE_DTYPE).eps
+
+
+def mode_subsets(modes):
+    return [frozenset(c) for r in range(1, len(modes) + 1) for c in combinations(sorted(modes), r)]
+
+
+def subset_key(modes):
+    return "+".join(sorted(modes))
+
+
+def select_landmarks(cg, count):
+    """Greedy farthest-point selection over sea/air hubs, seeded with the busiest one."""
+    hub_modes = [cg.mode_index[m] for m in HUB_MODES if m in cg.mode_index]
+    sources = np.repeat(np.arange(len(cg)), np.diff(cg.indptr))
+    hub_degree = np.bincount(sources[np.isin(cg.mode, hub_modes)], minlength=len(cg))
+    candidates = np.flatnonzero(hub_degree > 0)
+    if len(candidates) == 0:
+        candidates = np.arange(len(cg))
+    count = min(count, len(candidates))
+
+    chosen = [int(candidates[np.argmax(hub_degree[candidates])])]
+    nearest = haversine_np(cg.lat[candidates], cg.lon[candidates], cg.lat[chosen[0]], cg.lon[chosen[0]])
+    while len(chosen) < count:
+        # Prefer far-apart hubs, break ties towards busier ones
+        pick = int(candidates[np.argmax(nearest * np.log1p(hub_degree[candidates]))])
+        if pick in chosen:
+            break
+        chosen.append(pick)
+        nearest = np.minimum(nearest, haversine_np(cg.lat[candidates], cg.lon[candidates],
+                                                   cg.lat[pick], cg.lon[pick]))
+    return np.asarray(chosen, dtype=np.int64)
+
+
+def _component_matrix(cg, column, modes, reverse=False):
+    from scipy.sparse import csr_matrix
+
+    allowed = np.isin(cg.mode, [cg.mode_index[m] for m in modes if m in cg.mode_index])
+    sources = np.repeat(np.arange(len(cg)), np.diff(cg.indptr))[allowed]
+    targets = cg.targets[allowed].astype(np.int64)
+    weights = np.asarray(cg.columns[column])[allowed]
+    if reverse:
+        sources, targets = targets, sources
+    # Keep the cheapest of parallel edges; csr_matrix would sum them
+    order = np.lexsort((weights, targets, sources))
+    sources, targets, weights = sources[order], targets[order], weights[order]
+    first = np.ones(len(sources), dtype=bool)
+    first[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+    # csgraph drops explicit zeros, so clamp zero-cost edges to a tiny positive weight
+    weights = np.maximum(weights[first], 1e-12)
+    return csr_matrix((weights, (sources[first], targets[first])), shape=(len(cg), len(cg)))
+
+
+def _distances(matrix, landmarks):
+    from scipy.sparse.csgraph import dijkstra
+
+    return dijkstra(matrix, directed=True, indices=landmarks).astype(DISTANCE_DTYPE)
+
+
+def build_landmarks(cg, count=16, subsets=None):
+    landmarks = select_landmarks(cg, count)
+    subsets = subsets or mode_subsets(cg.modes)
+    tables = {}
+    for modes in subsets:
+        for column in COMPONENTS:
+            forward = _distances(_component_matrix(cg, column, modes), landmarks)
+            if cg.directed:
+                backward = _distances(_component_matrix(cg, column, modes, reverse=True), landmarks)
+            else:
+                backward = forward
+            tables[(subset_key(modes), column)] = (forward, backward)
+    return LandmarkIndex(landmarks, tables, cg.version)
+
+
+def _difference(a, b):
+    """``a - b`` lowered by the absolute rounding error of distances the size of ``a`` and ``b``."""
+    # An infinite term keeps its meaning (unreachable), it needs no slack
+    return a - b - np.nan_to_num(_RELATIVE_ERROR * np.maximum(a, b), posinf=0.0)
+
+
+class LandmarkIndex:
+    def __init__(self, landmarks, tables, version):
+        self.landmarks = landmarks
+        self.tables = tables
+        self.version = version
+        self.subsets = {frozenset(key.split("+")) for key, _ in tables}
+
+    def covering_subset(self, allowed_modes):
+        # Distances on a superset of the allowed modes are still valid lower bounds
+        covering = [s for s in self.subsets if s >= frozenset(allowed_modes)]
+        return min(covering, key=len) if covering else None
+
+    def lower_bound(self, target, allowed_modes, weights, nodes=None, reverse=False):
+        """Weighted lower bound on d(v, target) for every node v (or for ``nodes``).
+
+        With ``reverse`` the bound is on d(target, v) instead, as needed by
+        a backward search rooted at ``target``.
+        """
+        modes = self.covering_subset(allowed_modes)
+        if modes is None:
+            return None
+        key = subset_key(modes)
+        bound = None
+        for column, w in zip(COMPONENTS, weights):
+            if w == 0:
+                continue
+            forward, backward = self.tables[(key, column)]
+            forward_t, backward_t = forward[:, target:target + 1], backward[:, target:target + 1]
+            if nodes is not None:
+                forward, backward = forward[:, nodes], backward[:, nodes]
+            with np.errstate(invalid="ignore"):
+                if reverse:
+                    # d(t,v) >= d(L,v) - d(L,t)  and  d(t,v) >= d(t,L) - d(v,L)
+                    diff = np.maximum(_difference(forward, forward_t), _difference(backward_t, backward))
+                else:
+                    # d(v,t) >= d(L,t) - d(L,v)  and  d(v,t) >= d(v,L) - d(t,L)
+                    diff = np.maximum(_difference(forward_t, forward), _difference(backward, backward_t))
+            diff = np.nan_to_num(diff, nan=0.0, posinf=np.inf, neginf=0.0)
+            column_bound = np.maximum(diff.max(axis=0), 0)
+            bound = w * column_bound if bound is None else bound + w * column_bound
+        return bound
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "landmarks.npy"), self.landmarks)
+        entries = []
+        for (key, column), (forward, backward) in self.tables.items():
+            name = f"{key}.{column}"
+            np.save(os.path.join(path, name + ".fwd.npy"), forward)
+            if backward is not forward:
+                np.save(os.path.join(path, name + ".bwd.npy"), backward)
+            entries.append({"modes": key, "column": column, "name": name,
+                            "symmetric": backward is forward})
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "tables": entries}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        tables = {}
+        for entry in meta["tables"]:
+            base = os.path.join(path, entry["name"])
+            forward = np.load(base + ".fwd.npy", mmap_mode="r")
+            backward = forward if entry["symmetric"] else np.load(base + ".bwd.npy", mmap_mode="r")
+            tables[(entry["modes"], entry["column"])] = (forward, backward)
+        return cls(np.load(os.path.join(path, "landmarks.npy")), tables, meta["version"])
+
+
+def attach_landmarks(cg, compiled_path):
+    path = os.path.join(compiled_path, LANDMARKS_DIR)
+    if not os.path.exists(os.path.join(path, "meta.json")):
+        return cg
+    index = LandmarkIndex.load(path)
+    # Indexes stored in float32 by older builds are not admissible; rebuild them
+    exact = all(forward.dtype == DISTANCE_DTYPE for forward, _ in index.tables.values())
+    if index.version == cg.version and exact:
+        cg.landmarks = index
+    return cg
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from routing.compiled import load_compiled
+
+    parser = argparse.ArgumentParser(description="Build ALT landmark tables for a compiled graph")
+    parser.add_argument("compiled_path")
+    parser.add_argument("--count", type=int, default=16)
+    args = parser.parse_args()
+    graph = load_compiled(args.compiled_path)
+    index = build_landmarks(graph, args.count)
+    index.save(os.path.join(args.compiled_path, LANDMARKS_DIR))
+    print(f"Stored {len(index.landmarks)} landmarks x {len(index.subsets)} mode subsets")
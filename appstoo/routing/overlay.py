@@ -0,0 +1,198 @@
+"""Hot-swappable cost overlay on top of a compiled graph.
+
+An overlay holds per-node waiting penalties (hours added to sea legs
+arriving at a congested port) and per-mode multipliers for time, price and
+emissions. ``apply_overlay`` derives a new CompiledGraph that shares every
+array with the base graph except the cost columns it changes, and only
+recomputes the edges the overlay touches:
+
+* raw values of the touched edges are rebuilt from the base columns;
+* the graph.graph min/max bounds only ever widen around the base bounds,
+  so untouched edges keep their normalized costs unless a bound moved, in
+  which case the column is rescaled in one vectorized pass;
+* the heuristic inputs (max_speed, min_price_per_km, emission_factors)
+  are scaled by the multipliers so the A* bounds stay admissible.
+
+The derived graph gets its own version, so heuristic and route caches
+never mix overlaid and base results. Landmark, contraction-hierarchy and
+hub-label indexes were built for the base costs and are not carried over.
+
+    {"waiting_penalties": {"Shanghai": 48},
+     "mode_factors": {"sea": {"time": 1.2}, "air": {"emissions": 0.9}}}
+"""
+import copy
+import hashlib
+import json
+import os
+import threading
+
+import numpy as np
+
+from routing.costs import EMISSION_FACTORS
+
+# Overlay factor name -> (normalized column, raw column or None, graph.graph bound prefix)
+FACTOR_COLUMNS = {
+    "time": ("time_norm", "time", "time"),
+    "price": ("price_norm", "price", "price"),
+    "emissions": ("emissions_norm", None, "emissions"),
+}
+PENALIZED_MODE = "sea"
+
+
+class CostOverlay:
+    def __init__(self, waiting_penalties=None, mode_factors=None):
+        self.waiting_penalties = {node: float(hours) for node, hours in (waiting_penalties or {}).items()}
+        self.mode_factors = {}
+        for mode, factors in (mode_factors or {}).items():
+            for name, factor in factors.items():
+                if name not in FACTOR_COLUMNS:
+                    raise ValueError(f"Unknown overlay factor {name!r}, expected one of {sorted(FACTOR_COLUMNS)}")
+                if factor <= 0:
+                    raise ValueError(f"Overlay factor for {mode}/{name} must be positive, got {factor}")
+            self.mode_factors[mode] = {name: float(factor) for name, factor in factors.items()}
+        if any(hours < 0 for hours in self.waiting_penalties.values()):
+            raise ValueError("Waiting penalties must not be negative")
+
+    def to_dict(self):
+        return {"waiting_penalties": self.waiting_penalties, "mode_factors": self.mode_factors}
+
+    def digest(self):
+        return hashlib.sha1(json.dumps(self.to_dict(), sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+    def __bool__(self):
+        return bool(self.waiting_penalties or self.mode_factors)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("waiting_penalties"), data.get("mode_factors"))
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, sort_keys=True)
+
+
+def _denormalize(norm, lo, hi):
+    return norm / 100 * (hi - lo) + lo
+
+
+def _normalize(value, lo, hi):
+    return (value - lo) / (hi - lo) * 100 if hi > lo else np.zeros_like(value)
+
+
+def _penalty_edges(cg, penalties):
+    """Sea edges arriving at penalized nodes, with the penalty hours per edge."""
+    sea = cg.mode_index.get(PENALIZED_MODE)
+    if sea is None or not penalties.any():
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    indptr, edge_ids, _ = cg.reverse_adjacency()
+    nodes = np.flatnonzero(penalties)
+    edges = np.concatenate([edge_ids[indptr[v]:indptr[v + 1]] for v in nodes.tolist()])
+    edges = edges[cg.mode[edges] == sea]
+    return edges, penalties[cg.targets[edges]]
+
+
+def apply_overlay(base, overlay):
+    """CompiledGraph with ``overlay`` applied to the costs of ``base``."""
+    if not overlay:
+        return base
+    graph = copy.deepcopy(base.graph)
+    columns = dict(base.columns)
+
+    penalties = np.zeros(len(base))
+    for node, hours in overlay.waiting_penalties.items():
+        if node in base.node_index:
+            penalties[base.node_index[node]] = hours
+    penalty_edges, penalty_hours = _penalty_edges(base, penalties)
+
+    emission_factors = dict(graph.get("emission_factors", EMISSION_FACTORS))
+    for name, (norm_name, raw_name, bound) in FACTOR_COLUMNS.items():
+        scale = np.ones(len(base.modes))
+        for mode, factors in overlay.mode_factors.items():
+            if mode in base.mode_index and name in factors:
+                scale[base.mode_index[mode]] = factors[name]
+        touched = scale[base.mode] != 1.0
+        if name == "time":
+            touched[penalty_edges] = True
+        edges = np.flatnonzero(touched)
+        if not len(edges):
+            continue
+
+        lo, hi = graph[f"{bound}_min"], graph[f"{bound}_max"]
+        base_norm = np.asarray(base.columns[norm_name])
+        raw = _denormalize(base_norm[edges], lo, hi) * scale[base.mode[edges]]
+        if raw_name is not None and (scale != 1.0).any():
+            column = np.array(base.columns[raw_name], dtype=np.float64)
+            column[edges] = np.asarray(base.columns[raw_name])[edges] * scale[base.mode[edges]]
+            columns[raw_name] = column
+        if name == "time" and len(penalty_edges):
+            # Penalties cost time in the search; they are reported as waiting time, not edge time
+            raw[np.searchsorted(edges, penalty_edges)] += penalty_hours
+
+        new_lo, new_hi = min(lo, float(raw.min())), max(hi, float(raw.max()))
+        if (new_lo, new_hi) == (lo, hi):
+            norm = np.array(base_norm, dtype=np.float64)
+        else:
+            # A bound moved, so every edge of the column needs rescaling
+            norm = _normalize(_denormalize(base_norm, lo, hi), new_lo, new_hi)
+        norm[edges] = _normalize(raw, new_lo, new_hi)
+        columns[norm_name] = norm
+        graph[f"{bound}_min"], graph[f"{bound}_max"] = new_lo, new_hi
+
+        # Keep the per-mode A* bounds admissible under the new costs
+        for mode, m in base.mode_index.items():
+            if scale[m] == 1.0:
+                continue
+            if name == "time" and mode in graph.get("max_speed", {}):
+                graph["max_speed"][mode] = graph["max_speed"][mode] / scale[m]
+            elif name == "price" and mode in graph.get("min_price_per_km", {}):
+                graph["min_price_per_km"][mode] = graph["min_price_per_km"][mode] * scale[m]
+            elif name == "emissions" and mode in emission_factors:
+                emission_factors[mode] = emission_factors[mode] * scale[m]
+    graph["emission_factors"] = emission_factors
+
+    cg = copy.copy(base)
+    cg.columns = columns
+    cg.graph = graph
+    cg.version = hashlib.sha1(f"{base.version}:{overlay.digest()}".encode("utf-8")).hexdigest()[:16]
+    cg.waiting_penalty = penalties if penalties.any() else None
+    cg.landmarks = None
+    cg.hierarchies = []
+    cg.hub_labels = []
+    cg.overlay = overlay
+    return cg
+
+
+class OverlayWatcher:
+    """Serves the base graph with the overlay file applied, re-applying it when the file changes.
+
+    ``current()`` is cheap when nothing changed (one ``os.stat``); searches
+    already running keep the graph object they started with.
+    """
+
+    def __init__(self, base, overlay_path):
+        self.base = base
+        self.overlay_path = overlay_path
+        self._graph = base
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def current(self):
+        try:
+            mtime = os.stat(self.overlay_path).st_mtime_ns
+        except (OSError, TypeError):
+            mtime = None
+        if mtime != self._mtime:
+            with self._lock:
+                if mtime != self._mtime:
+                    try:
+                        overlay = CostOverlay.load(self.overlay_path) if mtime is not None else CostOverlay()
+                        graph = apply_overlay(self.base, overlay)
+                    except (OSError, ValueError, TypeError, KeyError, AttributeError):
+                        # Half-written or malformed file (bad JSON, non-numeric factor, wrong
+                        # shape): keep serving the last good graph
+                        return self._graph
+                    self._graph = graph
+                    self._mtime = mtime
+        return self._graph
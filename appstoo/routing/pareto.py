@@ -0,0 +1,192 @@
+"""Multi-criteria (Pareto) route search.
+
+A label-setting search returns every non-dominated route over
+(time_norm, price_norm, emissions_norm) for an origin/destination pair.
+Border crossings are counted per route and added to the scalarized cost
+when the front is ranked for a slider setting, but they only break ties
+in dominance: as a fourth criterion they multiply the front size.
+
+The front is a trade-off view shown after the weighted routes, not a
+replacement for them: without borders in dominance its best route is not
+guaranteed to be the weighted optimum. The search stops early when it
+creates MAX_LABELS labels or when its ``budget`` runs out, and is not
+attempted on graphs too large for a front to fit in MAX_LABELS. Such
+fronts are incomplete and possibly empty, and are never cached
+(routing.cache).
+"""
+import heapq
+from array import array
+from collections import namedtuple
+
+import numpy as np
+
+from routing.anytime import BudgetExhausted
+from routing.kpaths import _unwind
+from routing.query import RouteQuery, path_waiting_time
+from routing.search import assemble_route, resolve_endpoints
+from routing.stats import SearchStats
+
+MAX_LABELS = 200000
+# Fewest labels per graph node seen on synthetic fronts; a graph whose node
+# count times this already exceeds the label limit is not worth searching
+MIN_LABELS_PER_NODE = 5
+
+ParetoRoute = namedtuple("ParetoRoute", ["nodes", "edges", "costs"])
+
+
+def _weakly_dominates(a, b):
+    # Border crossings only break ties: as a fourth criterion they multiply the front size
+    if a[0] <= b[0] and a[1] <= b[1] and a[2] <= b[2]:
+        return a[:3] != b[:3] or a[3] <= b[3]
+    return False
+
+
+def _component_bounds(query):
+    # Per-criterion lower bounds to the goal, only available with a landmark index
+    landmarks = query.cg.landmarks
+    if landmarks is None:
+        return None
+    bounds = []
+    for unit in ((1, 0, 0), (0, 1, 0), (0, 0, 1)):
+        bound = landmarks.lower_bound(query.goal, query.allowed_modes, unit)
+        if bound is None:
+            return None
+        bounds.append(np.asarray(bound, dtype=np.float64))
+    return np.vstack(bounds)
+
+
+def pareto_search(query, max_labels=MAX_LABELS):
+    """Pareto set of routes from ``query.start`` to ``query.goal``.
+
+    Returns ``(routes, complete)``; ``complete`` is False when the label
+    limit or the query's budget ran out and the front may be missing routes.
+    """
+    cg = query.cg
+    start, goal = query.start, query.goal
+    columns = [cg.columns[name] for name in ("time_norm", "price_norm", "emissions_norm")]
+    bounds = _component_bounds(query)
+
+    label_node = array('q', [start])
+    label_parent = array('q', [-1])
+    label_edge = array('q', [-1])
+    label_cost = [(0.0, 0.0, 0.0, 0)]
+    dead = set()
+    bags = {start: [0]}
+    queue = [(0.0, 0)]
+    pushes, peak = 1, 1
+    complete = True
+
+    def goal_dominates(cost, v):
+        goal_bag = bags.get(goal)
+        if not goal_bag:
+            return False
+        if bounds is not None:
+            cost = (cost[0] + bounds[0, v], cost[1] + bounds[1, v], cost[2] + bounds[2, v], cost[3])
+        return any(_weakly_dominates(label_cost[g], cost) for g in goal_bag)
+
+    while queue:
+        _, label = heapq.heappop(queue)
+        if label in dead:
+            continue
+        u = label_node[label]
+        if u == goal:
+            continue
+        cost = label_cost[label]
+        if goal_dominates(cost, u):
+            continue
+
+        try:
+            edges, targets = query.allowed_edges(u)
+        except BudgetExhausted:
+            complete = False
+            break
+        border = (cg.country[targets] != cg.country[u]).tolist()
+        steps = zip(edges.tolist(), targets.tolist(), columns[0][edges].tolist(),
+                    columns[1][edges].tolist(), columns[2][edges].tolist(), border)
+        for e, v, dt, dp, de, db in steps:
+            new_cost = (cost[0] + dt, cost[1] + dp, cost[2] + de, cost[3] + db)
+            if goal_dominates(new_cost, v):
+                continue
+            bag = bags.setdefault(v, [])
+            if any(_weakly_dominates(label_cost[other], new_cost) for other in bag):
+                continue
+            survivors = []
+            for other in bag:
+                if _weakly_dominates(new_cost, label_cost[other]):
+                    dead.add(other)
+                else:
+                    survivors.append(other)
+            new_label = len(label_node)
+            survivors.append(new_label)
+            bags[v] = survivors
+            label_node.append(v)
+            label_parent.append(label)
+            label_edge.append(e)
+            label_cost.append(new_cost)
+            heapq.heappush(queue, (sum(new_cost), new_label))
+            pushes += 1
+            if len(queue) > peak:
+                peak = len(queue)
+        if len(label_node) > max_labels:
+            complete = False
+            break
+
+    query.stats.add_search(pushes, peak)
+    routes = []
+    for label in bags.get(goal, []):
+        nodes, edges = _unwind(label, label_node, label_parent, label_edge)
+        routes.append(ParetoRoute(nodes, edges, label_cost[label]))
+    routes.sort(key=lambda r: sum(r.costs))
+    return routes, complete
+
+
+def front_fits(cg, max_labels=MAX_LABELS):
+    """Cheap estimate of whether a front search on ``cg`` can finish within ``max_labels``."""
+    return len(cg) * MIN_LABELS_PER_NODE <= max_labels
+
+
+def scalarized_cost(route, time_weight, price_weight, emissions_weight):
+    time_cost, price_cost, emissions_cost, borders = route.costs
+    return time_weight * time_cost + price_weight * price_cost + emissions_weight * emissions_cost + borders
+
+
+def pareto_front(cg, start, goal, avoid_countries=None, allowed_modes=['land', 'sea', 'air'],
+                 max_labels=MAX_LABELS, stats=None, budget=None):
+    """``{"front": routes, "complete": bool}``, or an error dict when there is no route.
+
+    A search stopped by ``max_labels`` or ``budget`` returns an incomplete,
+    possibly empty, front rather than an error: it proves nothing about
+    whether a route exists. So does a graph that fails ``front_fits``,
+    without searching at all.
+    """
+    endpoints = resolve_endpoints(cg, start, goal, avoid_countries)
+    if "error" in endpoints:
+        return endpoints
+    if not front_fits(cg, max_labels):
+        SearchStats().log(start=start, goal=goal, strategy="pareto", outcome="skipped", front_size=0,
+                          complete=False)
+        return {"front": [], "complete": False}
+    query = RouteQuery(cg, endpoints["start"], endpoints["goal"], (1, 1, 1), allowed_modes,
+                       avoid_countries, with_heuristic=False, budget=budget)
+    with query.stats.timer("search_s"):
+        routes, complete = pareto_search(query, max_labels)
+    outcome = "found" if routes else "no_path" if complete else "interrupted"
+    query.stats.log(start=start, goal=goal, avoid_countries=sorted(query.avoid_countries),
+                    allowed_modes=sorted(query.allowed_modes), strategy="pareto",
+                    outcome=outcome, front_size=len(routes), complete=complete)
+    if stats is not None:
+        stats.merge(query.stats)
+    if not routes and complete:
+        return {"error": f"No paths found between {start} and {goal} with selected parameters."}
+    return {"front": routes, "complete": complete}
+
+
+def routes_from_front(cg, front, time_weight=0.333, price_weight=0.333, emissions_weight=0.334,
+                      top_n=None, weight=30000):
+    """Routes of a Pareto front, cheapest first for one slider setting (all of them by default).
+
+    Re-ranking a cached front for new slider weights needs no graph search.
+    """
+    ranked = sorted(front, key=lambda r: scalarized_cost(r, time_weight, price_weight, emissions_weight))
+    return [assemble_route(cg, r.nodes, r.edges, path_waiting_time(cg, r.edges), weight)
+            for r in ranked[:top_n]]
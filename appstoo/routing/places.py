@@ -0,0 +1,136 @@
+"""Place-name search and nearest-node snapping for route endpoints.
+
+Both indexes are built once when the graph is compiled and pickled next
+to it: a trigram index over normalized node labels for prefix and fuzzy
+matching, and a KD-tree over unit-sphere coordinates so a lat/lon snaps
+to the nearest graph node without scanning every node.
+"""
+import os
+import pickle
+import re
+import unicodedata
+from bisect import bisect_left
+from difflib import SequenceMatcher
+
+import numpy as np
+
+from routing.heuristics import EARTH_RADIUS_KM
+
+PLACES_FILE = "places.pkl"
+
+_COORDINATES = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*[,;\s]\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+def normalize(name):
+    name = unicodedata.normalize("NFKD", str(name))
+    name = "".join(ch for ch in name if not unicodedata.combining(ch))
+    return " ".join(name.casefold().split())
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _unit_vectors(lat, lon):
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+class PlaceIndex:
+    def __init__(self, node_ids, lat, lon):
+        from scipy.spatial import cKDTree
+
+        normalized = [normalize(node) for node in node_ids]
+        order = sorted(range(len(normalized)), key=normalized.__getitem__)
+        self.sorted_names = [normalized[i] for i in order]
+        self.sorted_nodes = np.asarray(order, dtype=np.int64)
+        self.trigrams = {}
+        for i, name in enumerate(normalized):
+            for gram in _trigrams(name):
+                self.trigrams.setdefault(gram, []).append(i)
+        self.trigrams = {gram: np.asarray(ids, dtype=np.int64) for gram, ids in self.trigrams.items()}
+        self.normalized = normalized
+
+        valid = np.isfinite(lat) & np.isfinite(lon)
+        self.tree_nodes = np.flatnonzero(valid)
+        self.tree = cKDTree(_unit_vectors(np.asarray(lat)[valid], np.asarray(lon)[valid]))
+
+    def prefix(self, text, limit=10):
+        text = normalize(text)
+        start = bisect_left(self.sorted_names, text)
+        matches = []
+        for name, node in zip(self.sorted_names[start:], self.sorted_nodes[start:]):
+            if not name.startswith(text) or len(matches) >= limit:
+                break
+            matches.append(int(node))
+        return matches
+
+    def search(self, text, limit=10):
+        """Ranked (node index, score) matches: exact, then prefix, then fuzzy."""
+        query = normalize(text)
+        if not query:
+            return []
+        scores = {}
+        for node in self.prefix(query, limit * 4):
+            # Prefix matches rank by how much of the name was typed
+            scores[node] = 0.9 + 0.1 * len(query) / len(self.normalized[node])
+
+        counts = {}
+        for gram in _trigrams(query):
+            if gram in self.trigrams:
+                for node in self.trigrams[gram].tolist():
+                    counts[node] = counts.get(node, 0) + 1
+        candidates = sorted(counts, key=counts.get, reverse=True)[:limit * 20]
+        for node in candidates:
+            if node not in scores:
+                ratio = SequenceMatcher(None, query, self.normalized[node]).ratio()
+                if ratio >= 0.5:
+                    scores[node] = 0.85 * ratio
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self.normalized[item[0]]))
+        return ranked[:limit]
+
+    def nearest(self, lat, lon, k=1):
+        """k nearest graph nodes to a coordinate as (node index, distance km) pairs."""
+        chord, idx = self.tree.query(_unit_vectors(np.atleast_1d(lat), np.atleast_1d(lon)), k=k)
+        chord, idx = np.atleast_1d(chord.ravel()), np.atleast_1d(idx.ravel())
+        km = 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(chord / 2, 0, 1))
+        return [(int(self.tree_nodes[i]), float(d)) for i, d in zip(idx, km)]
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+
+def build_place_index(cg):
+    return PlaceIndex(cg.node_ids, np.asarray(cg.lat), np.asarray(cg.lon))
+
+
+def attach_places(cg, compiled_path):
+    path = os.path.join(compiled_path, PLACES_FILE)
+    cg.places = PlaceIndex.load(path) if os.path.exists(path) else build_place_index(cg)
+    return cg
+
+
+def resolve_place(cg, text):
+    """Graph node key for free text: an exact node name, a "lat, lon" pair or the best name match.
+
+    Returns (node key or None, how it was resolved).
+    """
+    if text in cg:
+        return text, "exact"
+    match = _COORDINATES.match(str(text))
+    if match:
+        lat, lon = float(match.group(1)), float(match.group(2))
+        if -90 <= lat <= 90 and -180 <= lon <= 180:
+            node, km = cg.places.nearest(lat, lon)[0]
+            return cg.node_ids[node], f"nearest node, {km:.1f} km away"
+    matches = cg.places.search(text, limit=1)
+    if not matches:
+        return None, "no match"
+    return cg.node_ids[matches[0][0]], "closest name match"
@@ -0,0 +1,124 @@
+import numpy as np
+
+from routing.costs import waiting_times, DEFAULT_WAITING_TIME, AIR_WAITING_TIME
+from routing.heuristics import goal_heuristic
+from routing.stats import SearchStats
+
+
+class RouteQuery:
+    """Cost model and constraint masks for one routing query over a CompiledGraph.
+
+    Edge cost is the weighted sum of the normalized time/price/emissions
+    columns plus a penalty of 1 for every border crossing. Edges of a
+    disallowed mode or leading into an avoided country or a node the graph
+    blocks (routing.disasters) are filtered out.
+
+    ``heuristic_weight`` > 1 inflates the goal heuristic (weighted A*): the
+    first route found then costs at most that factor times the optimum.
+    A ``budget`` (see routing.anytime) is charged once per expanded row.
+    Searches record their work in ``stats`` (routing.stats.SearchStats).
+    """
+
+    def __init__(self, cg, start, goal, weights, allowed_modes, avoid_countries=(),
+                 with_heuristic=True, heuristic_weight=1.0, budget=None, stats=None):
+        self.cg = cg
+        self.start = start
+        self.goal = goal
+        self.weights = tuple(float(w) for w in weights)
+        self.allowed_modes = frozenset(allowed_modes)
+        self.avoid_countries = frozenset(avoid_countries or ())
+
+        self.mode_allowed = np.zeros(len(cg.modes), dtype=bool)
+        for m in self.allowed_modes:
+            if m in cg.mode_index:
+                self.mode_allowed[cg.mode_index[m]] = True
+        self.allowed_mode_ids = np.flatnonzero(self.mode_allowed).tolist()
+        self.all_modes = bool(self.mode_allowed.all())
+
+        # Avoided countries compile to one boolean per node via a per-country lookup
+        country_blocked = np.zeros(len(cg.countries), dtype=bool)
+        for c in self.avoid_countries:
+            if c in cg.country_index:
+                country_blocked[cg.country_index[c]] = True
+        self.blocked = country_blocked[cg.country] if country_blocked.any() else None
+        if cg.blocked_nodes is not None:
+            self.blocked = cg.blocked_nodes if self.blocked is None else self.blocked | cg.blocked_nodes
+
+        self.budget = budget
+        self.stats = stats if stats is not None else SearchStats()
+
+        with self.stats.timer("heuristic_s"):
+            self.heuristic = (goal_heuristic(cg, goal, self.allowed_modes, self.weights)
+                              if with_heuristic else None)
+        if self.heuristic is not None and heuristic_weight != 1.0:
+            self.heuristic = self.heuristic * heuristic_weight
+
+    def count_expansion(self):
+        self.stats.expanded += 1
+        if self.budget is not None:
+            self.budget.charge()
+
+    def allowed_edges(self, u):
+        """Out-edges of ``u`` that pass the mode and country filters, as (edge ids, targets)."""
+        cg = self.cg
+        stats = self.stats
+        self.count_expansion()
+        if self.all_modes:
+            edges = np.arange(cg.indptr[u], cg.indptr[u + 1])
+        else:
+            # Rows are partitioned by mode, so disallowed modes are never touched
+            bounds = cg.mode_indptr[u]
+            ranges = [np.arange(bounds[m], bounds[m + 1]) for m in self.allowed_mode_ids]
+            edges = np.concatenate(ranges) if ranges else np.arange(0)
+            stats.skipped_mode += int(cg.indptr[u + 1] - cg.indptr[u]) - len(edges)
+        targets = cg.targets[edges]
+        if self.blocked is not None:
+            keep = ~self.blocked[targets]
+            stats.skipped_country += len(keep) - int(np.count_nonzero(keep))
+            edges, targets = edges[keep], targets[keep]
+        stats.relaxed += len(edges)
+        return edges, targets
+
+    def relax(self, u):
+        """Allowed out-edges of ``u`` as (edge ids, target nodes, edge costs) arrays."""
+        edges, targets = self.allowed_edges(u)
+        return edges, targets, self.edge_costs(edges, u, targets)
+
+    def edge_costs(self, edges, u, targets):
+        time_weight, price_weight, emissions_weight = self.weights
+        columns = self.cg.columns
+        border = self.cg.country[targets] != self.cg.country[u]
+        return (time_weight * columns['time_norm'][edges] +
+                price_weight * columns['price_norm'][edges] +
+                emissions_weight * columns['emissions_norm'][edges] +
+                border)
+
+    def path_edge_costs(self, nodes, edges):
+        """Per-edge costs along a path given as node and edge id lists."""
+        if not edges:
+            return np.zeros(0)
+        edges = np.asarray(edges, dtype=np.int64)
+        return self.edge_costs(edges, np.asarray(nodes[:-1], dtype=np.int64),
+                               np.asarray(nodes[1:], dtype=np.int64))
+
+    def path_cost(self, nodes, edges):
+        return float(np.sum(self.path_edge_costs(nodes, edges)))
+
+    def waiting_time(self, edges):
+        return path_waiting_time(self.cg, edges)
+
+
+def path_waiting_time(cg, edges):
+    """Port/airport waiting hours accumulated along a path's edges."""
+    sea, air = cg.mode_index.get('sea'), cg.mode_index.get('air')
+    total = 0
+    for e in edges:
+        mode = cg.mode[e]
+        if mode == sea:
+            country = cg.countries[cg.country[cg.targets[e]]]
+            total += waiting_times.get(country, DEFAULT_WAITING_TIME) / 2
+            if cg.waiting_penalty is not None:
+                total += float(cg.waiting_penalty[cg.targets[e]])
+        elif mode == air:
+            total += AIR_WAITING_TIME
+    return total
@@ -0,0 +1,136 @@
+"""Map and table payloads for route results.
+
+All routes of a result set are drawn as one plotly figure with one trace
+per route. Long polylines are thinned with Douglas-Peucker in lat/lon
+degree space (longitudes unwrapped across the antimeridian) before they
+are sent to the browser, and the serialized figure is cached per set of
+route paths, so re-rendering the same results (other cargo weight,
+expander toggles, reruns) costs a dictionary lookup.
+Reachability results are drawn as one marker layer colored by hours,
+cost or CO2, and Pareto trade-offs are listed as one row of totals per
+route.
+"""
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from routing.lru import LRUCache
+
+SIMPLIFY_TOLERANCE_DEG = 0.05
+ROUTE_COLORS = ("green", "royalblue", "darkorange", "purple", "firebrick")
+FIGURE_CACHE_SIZE = 256
+EDGE_COLUMNS = ["from", "to", "mode", "time", "price", "distance", "co2_per_ton"]
+TRADEOFF_COLUMNS = {"total_time": "time", "total_cost": "cost", "total_co2": "co2",
+                    "total_distance": "distance", "sustainability_score": "score"}
+
+figure_cache = LRUCache(maxsize=FIGURE_CACHE_SIZE)
+
+
+def simplify_polyline(coords, tolerance=SIMPLIFY_TOLERANCE_DEG):
+    """Indices of the points Douglas-Peucker keeps from a (lat, lon) polyline.
+
+    The endpoints are always kept; a point survives when it lies more than
+    ``tolerance`` degrees from the chord of the span it belongs to.
+    Longitudes are unwrapped first, so a route across the antimeridian is
+    measured against its short chord; the returned indices refer to the
+    original (wrapped) points.
+    """
+    points = np.array(coords, dtype=np.float64).reshape(-1, 2)
+    n = len(points)
+    if n:
+        points[:, 1] = np.unwrap(points[:, 1], period=360.0)
+    if n <= 2 or tolerance <= 0:
+        return np.arange(n)
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, n - 1]] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        inner = points[first + 1:last]
+        start, chord = points[first], points[last] - points[first]
+        length = np.hypot(*chord)
+        offsets = inner - start
+        if length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(chord[0] * offsets[:, 1] - chord[1] * offsets[:, 0]) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(keep)
+
+
+def results_key(results, tolerance=SIMPLIFY_TOLERANCE_DEG):
+    """Cache key for the map of a result set: its paths, not its cargo-weight totals."""
+    return tuple(tuple(route["path"]) for route in results), tolerance
+
+
+def _route_map(results, tolerance):
+    fig = go.Figure()
+    for i, route in enumerate(results, 1):
+        coords = np.asarray(route["path_coords"], dtype=np.float64).reshape(-1, 2)
+        kept = simplify_polyline(coords, tolerance)
+        names = [route["path"][j] for j in kept]
+        fig.add_trace(go.Scattergeo(
+            lat=np.round(coords[kept, 0], 4), lon=np.round(coords[kept, 1], 4),
+            text=names, hoverinfo="text", name=f"Route {i}",
+            mode="lines+markers",
+            line=dict(width=2, color=ROUTE_COLORS[(i - 1) % len(ROUTE_COLORS)]),
+            marker=dict(size=6),
+        ))
+    fig.update_layout(
+        title="Route Map",
+        geo=dict(showcoastlines=True, landcolor="rgb(243, 243, 243)"),
+        legend=dict(orientation="h"),
+        margin=dict(l=0, r=0, t=40, b=0),
+    )
+    return fig.to_plotly_json()
+
+
+def route_map(results, tolerance=SIMPLIFY_TOLERANCE_DEG):
+    """Serialized plotly figure (a dict) drawing every route in ``results``."""
+    return figure_cache.get_or_compute(results_key(results, tolerance),
+                                       lambda: _route_map(results, tolerance))
+
+
+def reachability_map(table, color_by="time"):
+    """Serialized plotly figure of a reachable_table, one marker per node colored by ``color_by``."""
+    fig = go.Figure()
+    fig.add_trace(go.Scattergeo(
+        lat=table["lat"], lon=table["lon"], text=table["node"], hoverinfo="text",
+        name="Reachable", mode="markers",
+        marker=dict(size=5, color=table[color_by], colorscale="Viridis_r",
+                    colorbar=dict(title=color_by)),
+    ))
+    # Rows are in settle order, so the first one is the start
+    fig.add_trace(go.Scattergeo(
+        lat=table["lat"][:1], lon=table["lon"][:1], text=table["node"][:1], hoverinfo="text",
+        name="Start", mode="markers", marker=dict(size=12, color="firebrick", symbol="star"),
+    ))
+    fig.update_layout(
+        title="Reachable Locations",
+        geo=dict(showcoastlines=True, landcolor="rgb(243, 243, 243)"),
+        legend=dict(orientation="h"),
+        margin=dict(l=0, r=0, t=40, b=0),
+    )
+    return fig.to_plotly_json()
+
+
+def edge_table(route):
+    """Per-edge breakdown of a route as a compact DataFrame (rounded floats, categorical modes)."""
+    df = pd.DataFrame(route["edges"], columns=EDGE_COLUMNS)
+    df["mode"] = df["mode"].astype("category")
+    return df.round({"time": 2, "price": 2, "distance": 2, "co2_per_ton": 2})
+
+
+def tradeoff_table(routes):
+    """Totals of Pareto routes (routing.service.plan_front), one row per route in the given order."""
+    df = pd.DataFrame([{name: route[key] for key, name in TRADEOFF_COLUMNS.items()} for route in routes],
+                      columns=list(TRADEOFF_COLUMNS.values()))
+    df["stops"] = [len(route["path"]) - 1 for route in routes]
+    return df.round({"time": 2, "cost": 2, "co2": 2, "distance": 2})
@@ -0,0 +1,150 @@
+from routing.alternatives import plateau_alternatives
+from routing.costs import EMISSION_FACTORS, calculate_sustainability_score
+from routing.bidirectional import bidirectional_astar_path
+from routing.ch import matching_hierarchy
+from routing.hubs import matching_hub_labels
+from routing.kpaths import astar_path, k_shortest_paths
+from routing.query import RouteQuery
+from routing.stats import SearchStats
+
+# Single-pair searches Yen's algorithm can run on; all return identical routes
+STRATEGIES = {
+    "astar": astar_path,
+    "bidirectional": bidirectional_astar_path,
+}
+
+# How the top-n routes are chosen: the n cheapest (Yen) or n mutually distinct ones
+ALTERNATIVES = ("k_shortest", "plateau")
+
+
+def resolve_endpoints(cg, start, goal, avoid_countries=None):
+    if start not in cg or goal not in cg:
+        return {"error": "Start or goal node not in graph"}
+    s, t = cg.node_index[start], cg.node_index[goal]
+    avoid_countries = set(avoid_countries) if avoid_countries else set()
+    if cg.country_of(s) in avoid_countries or cg.country_of(t) in avoid_countries:
+        return {"error": f"No valid route: Start ({start}) or goal ({goal}) is in a banned country."}
+    if cg.blocked_nodes is not None and (cg.blocked_nodes[s] or cg.blocked_nodes[t]):
+        return {"error": f"No valid route: Start ({start}) or goal ({goal}) is inside an active disaster area."}
+    return {"start": s, "goal": t}
+
+
+def astar_top_n_avoid_countries(cg, start, goal, avoid_countries=None,
+                                top_n=3, time_weight=0.333, price_weight=0.333,
+                                emissions_weight=0.334, allowed_modes=['land', 'sea', 'air'],
+                                weight=30000, strategy="astar", stats=None, alternatives="k_shortest"):
+    results = search_routes(cg, start, goal, avoid_countries, top_n, time_weight,
+                            price_weight, emissions_weight, allowed_modes, strategy, stats=stats,
+                            alternatives=alternatives)
+    return apply_cargo_weight(results, weight)
+
+
+def search_routes(cg, start, goal, avoid_countries=None, top_n=3, time_weight=0.333,
+                  price_weight=0.333, emissions_weight=0.334, allowed_modes=['land', 'sea', 'air'],
+                  strategy="astar", heuristic_weight=1.0, budget=None, stats=None,
+                  alternatives="k_shortest"):
+    """Top-n routes without the cargo-weight dependent totals (see apply_cargo_weight).
+
+    With ``alternatives="plateau"`` the routes after the first are chosen
+    for being distinct rather than cheapest (routing.alternatives); that
+    search always runs on two plain Dijkstra trees.
+
+    ``heuristic_weight`` and ``budget`` are passed to the RouteQuery; an
+    exhausted or cancelled budget raises out of the search (routing.anytime).
+    Counters and timings of the search are logged and added to ``stats``.
+    """
+    endpoints = resolve_endpoints(cg, start, goal, avoid_countries)
+    if "error" in endpoints:
+        return endpoints
+    s, t = endpoints["start"], endpoints["goal"]
+
+    weights = (time_weight, price_weight, emissions_weight)
+    query_stats = SearchStats()
+    query = RouteQuery(cg, s, t, weights, allowed_modes, avoid_countries,
+                       heuristic_weight=heuristic_weight, budget=budget, stats=query_stats)
+    # Queries matching a preprocessed profile get their first path from the hub labels
+    # or the contraction hierarchy
+    index = (matching_hub_labels(cg, weights, allowed_modes, avoid_countries) or
+             matching_hierarchy(cg, weights, allowed_modes, avoid_countries))
+    shortest = STRATEGIES[strategy]
+    if index is not None:
+        shortest = index.shortest_path_fn(fallback=shortest)
+
+    outcome = "interrupted"
+    try:
+        with query_stats.timer("search_s"):
+            if alternatives == "plateau":
+                paths = plateau_alternatives(query, top_n)
+            else:
+                paths = k_shortest_paths(query, top_n, shortest)
+        if not paths:
+            outcome = "no_path"
+            return {"error": f"No paths found between {start} and {goal} with selected parameters."}
+        with query_stats.timer("assembly_s"):
+            results = [route_details(cg, path.nodes, path.edges, query.waiting_time(path.edges))
+                       for path in paths]
+        outcome = "found"
+        return results
+    finally:
+        query_stats.log(start=start, goal=goal, avoid_countries=sorted(query.avoid_countries),
+                        allowed_modes=sorted(query.allowed_modes), weights=weights, top_n=top_n,
+                        strategy=strategy, index=type(index).__name__ if index is not None else None,
+                        heuristic_weight=heuristic_weight, alternatives=alternatives, outcome=outcome)
+        if stats is not None:
+            stats.merge(query_stats)
+
+
+def route_details(cg, path, edges, wait_time):
+    time, price, distance = cg.columns['time'], cg.columns['price'], cg.columns['distance']
+    emission_factors = cg.graph.get('emission_factors', EMISSION_FACTORS)
+    edge_rows = []
+    for node_from, node_to, e in zip(path, path[1:], edges):
+        mode = cg.modes[cg.mode[e]]
+        edge_rows.append({
+            "from": cg.node_ids[node_from],
+            "to": cg.node_ids[node_to],
+            "mode": mode,
+            "time": float(time[e]),
+            "price": float(price[e]),
+            "distance": float(distance[e]),
+            "co2_per_ton": float(distance[e]) * emission_factors[mode]
+        })
+    return {
+        "path": [cg.node_ids[node] for node in path],
+        "path_coords": [(float(cg.lat[node]), float(cg.lon[node])) for node in path],
+        "edges": edge_rows,
+        "total_time": sum(edge["time"] for edge in edge_rows),
+        "total_price": sum(edge["price"] for edge in edge_rows),
+        "total_distance": sum(edge["distance"] for edge in edge_rows),
+        "total_co2_per_ton": sum(edge["co2_per_ton"] for edge in edge_rows),
+        "waiting_time": wait_time,
+    }
+
+
+def cargo_cost(total_price, weight):
+    """Shipping cost of ``weight`` kg over a path with ``total_price`` (scalars or arrays)."""
+    return total_price / 100 * (weight / 995 if weight < 995 else (weight - 995) * 2)
+
+
+def cargo_co2(co2_per_ton, weight):
+    return co2_per_ton * (weight / 100000)
+
+
+def apply_cargo_weight(results, weight):
+    """Fill in total_cost, total_co2 and sustainability_score for a cargo weight."""
+    if "error" in results:
+        return results
+    weighted = []
+    for route in results:
+        co2_per_ton = route["total_co2_per_ton"]
+        weighted.append(dict(
+            route,
+            total_cost=cargo_cost(route["total_price"], weight),
+            total_co2=cargo_co2(co2_per_ton, weight),
+            sustainability_score=calculate_sustainability_score(co2_per_ton * (weight / 500)),
+        ))
+    return weighted
+
+
+def assemble_route(cg, path, edges, wait_time, weight):
+    return apply_cargo_weight([route_details(cg, path, edges, wait_time)], weight)[0]
@@ -0,0 +1,348 @@
+"""Local routing daemon and its RPC client.
+
+One daemon per host owns the compiled graph so Streamlit replicas don't
+each load their own copy. Requests arrive over a
+``multiprocessing.connection`` socket (pickled dicts, authenticated with a
+shared key) and run on a process pool whose workers memory-map the same
+compiled graph directory, so the graph pages live once in the OS page
+cache no matter how many workers or clients there are.
+
+Requests are unpickled, so the key is what keeps other local processes
+from running code in the daemon. It comes from ROUTING_SERVICE_KEY, or
+else from the key file (ROUTING_SERVICE_KEY_FILE, default
+``~/.appstoo/routing_service.key``), which the daemon creates with a
+random key and 0600 permissions on first start. Clients without a key
+don't connect, and the pages then search in-process.
+
+    python -m routing.service --graph graph_final_8_precalc.pkl --workers 4
+
+Operations: ``resolve`` (place text -> node), ``plan`` (the planner page's
+weighted route search), ``front`` (its Pareto trade-offs, see
+routing.pareto), ``reachable`` (a reachability table, see
+routing.isochrone) and ``health`` (queue depth, latency and request
+counts, answered by the daemon itself). ``plan``, ``front`` and
+``reachable`` take an optional ``events`` argument
+(routing.disasters.blocking_events) and route around the nodes those
+events block.
+"""
+import os
+import secrets
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from routing.anytime import DEFAULT_MAX_SECONDS, SearchBudget, anytime_routes
+from routing.batch import load_graph_artifact
+from routing.cache import RouteCache, cached_astar_top_n, cached_pareto_front, round_weights, route_key
+from routing.compiled import compiled_path_for, load_or_compile
+from routing.disasters import DisasterFilter
+from routing.isochrone import reachable, reachable_table
+from routing.overlay import OverlayWatcher
+from routing.pareto import routes_from_front
+from routing.places import resolve_place
+from routing.search import apply_cargo_weight
+from routing.stats import SearchStats, enable_logging
+
+DEFAULT_ADDRESS = ("127.0.0.1", 6390)
+DEFAULT_KEY_FILE = os.path.join("~", ".appstoo", "routing_service.key")
+LATENCY_WINDOW = 1000
+# Extra seconds a client waits for a plan beyond its search time limit (queueing, transfer)
+PLAN_TIMEOUT_SLACK = 30.0
+
+_GRAPH = None
+_CACHE = None
+_DISASTERS = None
+
+
+def service_address():
+    """Daemon address from ROUTING_SERVICE_ADDRESS ("host:port"), else the default."""
+    value = os.environ.get("ROUTING_SERVICE_ADDRESS")
+    if not value:
+        return DEFAULT_ADDRESS
+    host, port = value.rsplit(":", 1)
+    return host, int(port)
+
+
+def service_key_file():
+    return os.path.expanduser(os.environ.get("ROUTING_SERVICE_KEY_FILE") or DEFAULT_KEY_FILE)
+
+
+def service_authkey(create=False):
+    """Key from ROUTING_SERVICE_KEY or the key file; None if neither exists.
+
+    With ``create`` a missing key file is created with a random key,
+    readable by the current user only.
+    """
+    key = os.environ.get("ROUTING_SERVICE_KEY")
+    if key:
+        return key.encode("utf-8")
+    path = service_key_file()
+    if create and not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass  # another process created it first
+        else:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(secrets.token_hex(32))
+    try:
+        with open(path, encoding="utf-8") as f:
+            key = f.read().strip()
+    except OSError:
+        return None
+    return key.encode("utf-8") if key else None
+
+
+def plan_routes(cache, cg, start, goal, avoid_countries=None, allowed_modes=['land', 'sea', 'air'],
+                time_weight=0.333, price_weight=0.333, emissions_weight=0.334, top_n=3,
+                weight=30000, time_limit=DEFAULT_MAX_SECONDS, stats=None, alternatives="k_shortest"):
+    """Routes for the planner page as ``(results, bound)``; ``bound`` is 1.0 for exact results.
+
+    The ``top_n`` cheapest routes for the slider weights, from the cache or
+    from the anytime search within ``time_limit`` (only exact results are
+    cached). ``alternatives="plateau"`` asks for distinct routes instead,
+    which costs two tree searches and is always exact.
+    """
+    if alternatives == "plateau":
+        return cached_astar_top_n(cache, cg, start, goal, avoid_countries, top_n, time_weight, price_weight,
+                                  emissions_weight, allowed_modes, weight, stats=stats,
+                                  alternatives=alternatives), 1.0
+
+    weights = round_weights((time_weight, price_weight, emissions_weight))
+    key = route_key(cg, start, goal, avoid_countries, allowed_modes, weights, top_n)
+    cached = cache.get(key)
+    if cached is not None:
+        return apply_cargo_weight(cached, weight), 1.0
+    results, bound = anytime_routes(cg, start, goal, avoid_countries, top_n, *weights, allowed_modes,
+                                    budget=SearchBudget(max_seconds=time_limit), strategy="bidirectional",
+                                    stats=stats)
+    if bound == 1.0:
+        cache.put(key, results)
+    return apply_cargo_weight(results, weight), bound
+
+
+def plan_front(cache, cg, start, goal, avoid_countries=None, allowed_modes=['land', 'sea', 'air'],
+               time_weight=0.333, price_weight=0.333, emissions_weight=0.334, weight=30000,
+               time_limit=DEFAULT_MAX_SECONDS, stats=None):
+    """Pareto trade-offs for the planner page, cheapest first for the slider weights.
+
+    Asked for after the weighted routes are shown. Returns None when the
+    front could not be completed within ``time_limit`` (or was not tried
+    on a graph too large for one): a partial front may hold dominated routes.
+    """
+    front = cached_pareto_front(cache, cg, start, goal, avoid_countries=avoid_countries,
+                                allowed_modes=allowed_modes, stats=stats,
+                                budget=SearchBudget(max_seconds=time_limit))
+    if "error" in front:
+        return front
+    if not front["complete"]:
+        return None
+    return routes_from_front(cg, front["front"], time_weight=time_weight, price_weight=price_weight,
+                             emissions_weight=emissions_weight, weight=weight)
+
+
+def _init_worker(graph_path, overlay_path, cache_dir):
+    global _GRAPH, _CACHE, _DISASTERS
+    enable_logging()
+    _GRAPH = OverlayWatcher(load_graph_artifact(graph_path), overlay_path)
+    _CACHE = RouteCache(cache_dir)
+    _DISASTERS = DisasterFilter()
+
+
+def _handle(op, args):
+    args = dict(args)
+    cg = _DISASTERS.current(_GRAPH.current(), args.pop("events", ()))
+    if op == "resolve":
+        return resolve_place(cg, args["text"])
+    if op == "plan":
+        stats = SearchStats()
+        results, bound = plan_routes(_CACHE, cg, stats=stats, **args)
+        return results, bound, stats.to_dict()
+    if op == "front":
+        stats = SearchStats()
+        return plan_front(_CACHE, cg, stats=stats, **args), stats.to_dict()
+    if op == "reachable":
+        reach = reachable(cg, **args)
+        return reach if isinstance(reach, dict) else reachable_table(cg, reach, args["weight"])
+    raise ValueError(f"Unknown routing service operation {op!r}")
+
+
+class RoutingService:
+    def __init__(self, graph_path, address=DEFAULT_ADDRESS, authkey=None, workers=None,
+                 overlay_path=None, cache_dir=None):
+        if not authkey:
+            raise ValueError("The routing service needs an authentication key: set ROUTING_SERVICE_KEY "
+                             "or use service_authkey(create=True)")
+        self.address = address
+        self.authkey = authkey
+        self.workers = workers or os.cpu_count() or 1
+        if not os.path.isdir(graph_path):
+            # Compile once up front so the workers only ever memory-map the result
+            load_or_compile(graph_path)
+            graph_path = compiled_path_for(graph_path)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                        initargs=(graph_path, overlay_path, cache_dir))
+        self.started = time.time()
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+
+    def health(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            in_flight, completed, failed = self.in_flight, self.completed, self.failed
+        p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] if latencies else None
+        return {
+            "status": "ok",
+            "uptime_s": time.time() - self.started,
+            "workers": self.workers,
+            "in_flight": in_flight,
+            "queue_depth": max(0, in_flight - self.workers),
+            "completed": completed,
+            "failed": failed,
+            "latency_ms_mean": statistics.fmean(latencies) if latencies else None,
+            "latency_ms_p95": p95,
+        }
+
+    def _call(self, op, args):
+        with self._lock:
+            self.in_flight += 1
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = self.pool.submit(_handle, op, args).result()
+            ok = True
+            return {"ok": True, "result": result}
+        except Exception as exc:
+            return {"ok": False, "error": f"{type(exc).__name__}: {exc}"}
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += ok
+                self.failed += not ok
+                self.latencies.append((time.perf_counter() - started) * 1000)
+
+    def _serve_connection(self, conn):
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                op, args = request.get("op"), request.get("args", {})
+                reply = {"ok": True, "result": self.health()} if op == "health" else self._call(op, args)
+                try:
+                    conn.send(reply)
+                except OSError:
+                    return
+
+    def serve_forever(self):
+        with Listener(self.address, authkey=self.authkey) as listener:
+            while True:
+                try:
+                    conn = listener.accept()
+                except Exception:
+                    continue  # failed handshake (wrong key, port scan); keep serving
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+
+class RoutingServiceError(RuntimeError):
+    pass
+
+
+class RoutingClient:
+    """Client for RoutingService. Each call opens a short-lived connection, so it is thread-safe."""
+
+    def __init__(self, address=None, authkey=None, timeout=120.0):
+        self.address = address or service_address()
+        # Read per call when not given, so a key file created after startup is picked up
+        self.authkey = authkey
+        self.timeout = timeout
+
+    def call(self, op, timeout=None, **args):
+        authkey = self.authkey or service_authkey()
+        if not authkey:
+            raise RoutingServiceError(f"No routing service key (set ROUTING_SERVICE_KEY or create "
+                                      f"{service_key_file()})")
+        try:
+            conn = Client(self.address, authkey=authkey)
+        except AuthenticationError as exc:
+            raise RoutingServiceError(f"Routing service rejected the key: {exc}") from exc
+        with conn:
+            conn.send({"op": op, "args": args})
+            if not conn.poll(self.timeout if timeout is None else timeout):
+                raise RoutingServiceError(f"Routing service did not answer {op!r} in time")
+            reply = conn.recv()
+        if not reply["ok"]:
+            raise RoutingServiceError(reply["error"])
+        return reply["result"]
+
+    def available(self):
+        try:
+            return self.health(timeout=1.0)["status"] == "ok"
+        except (OSError, EOFError, RoutingServiceError):
+            return False
+
+    def health(self, timeout=None):
+        return self.call("health", timeout=timeout)
+
+    def resolve(self, text):
+        return self.call("resolve", text=text)
+
+    def plan(self, start, goal, **args):
+        """``(results, bound, stats dict)`` for the planner page (see plan_routes).
+
+        Waits for the search time limit plus PLAN_TIMEOUT_SLACK, and at
+        least the client's timeout.
+        """
+        timeout = max(self.timeout, args.get("time_limit", DEFAULT_MAX_SECONDS) + PLAN_TIMEOUT_SLACK)
+        return self.call("plan", timeout=timeout, start=start, goal=goal, **args)
+
+    def front(self, start, goal, **args):
+        """``(trade-offs, stats dict)`` for the planner page (see plan_front); waits like plan."""
+        timeout = max(self.timeout, args.get("time_limit", DEFAULT_MAX_SECONDS) + PLAN_TIMEOUT_SLACK)
+        return self.call("front", timeout=timeout, start=start, goal=goal, **args)
+
+    def reachable(self, start, weight, **args):
+        """Reachability table (or error dict) for ``start`` (see routing.isochrone.reachable)."""
+        return self.call("reachable", start=start, weight=weight, **args)
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve route searches to local clients")
+    parser.add_argument("--graph", required=True, help="Graph pickle or compiled graph directory")
+    parser.add_argument("--address", default=None, help="host:port (default: ROUTING_SERVICE_ADDRESS or "
+                                                        f"{DEFAULT_ADDRESS[0]}:{DEFAULT_ADDRESS[1]})")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--overlay", default=None, help="Cost overlay JSON to watch")
+    parser.add_argument("--cache-dir", default=None, help="Directory for the persistent route cache")
+    args = parser.parse_args(argv)
+
+    if args.address:
+        host, port = args.address.rsplit(":", 1)
+        address = (host, int(port))
+    else:
+        address = service_address()
+    authkey = service_authkey(create=True)
+    if not authkey:
+        parser.error(f"no authentication key: set ROUTING_SERVICE_KEY or make {service_key_file()} readable")
+    if (os.name == "posix" and not os.environ.get("ROUTING_SERVICE_KEY")
+            and os.stat(service_key_file()).st_mode & 0o077):
+        parser.error(f"{service_key_file()} must only be accessible to its owner (chmod 600)")
+    service = RoutingService(args.graph, address, authkey, args.workers,
+                             args.overlay, args.cache_dir)
+    print(f"Routing service on {address[0]}:{address[1]} with {service.workers} workers")
+    service.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
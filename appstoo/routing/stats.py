@@ -0,0 +1,74 @@
+"""Per-query search counters and timings.
+
+A ``SearchStats`` rides along on a RouteQuery and is filled in by the
+searches that use it; passing the same object to several searches (the
+anytime stages and the Pareto trade-off search of one page request)
+accumulates their work. ``log`` writes one JSON object per line
+on the ``routing.search`` logger so the numbers can be aggregated across
+traffic.
+"""
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("routing.search")
+
+COUNTERS = ("expanded", "relaxed", "pushes", "peak_heap", "skipped_mode", "skipped_country")
+TIMERS = ("heuristic_s", "search_s", "assembly_s")
+
+
+class SearchStats:
+    def __init__(self):
+        self.expanded = 0          # adjacency rows expanded
+        self.relaxed = 0           # edges that passed the mode and country filters
+        self.pushes = 0            # heap pushes
+        self.peak_heap = 0         # largest heap seen by any search
+        self.skipped_mode = 0      # edges never looked at because their mode is disallowed
+        self.skipped_country = 0   # edges dropped because they lead into an avoided country
+        self.heuristic_s = 0.0     # goal heuristic precomputation
+        self.search_s = 0.0        # path search (all Yen spur searches)
+        self.assembly_s = 0.0      # building result dicts
+
+    @classmethod
+    def from_dict(cls, values):
+        stats = cls()
+        for name in COUNTERS + TIMERS:
+            setattr(stats, name, values.get(name, getattr(stats, name)))
+        return stats
+
+    def add_search(self, pushes, peak_heap):
+        self.pushes += pushes
+        self.peak_heap = max(self.peak_heap, peak_heap)
+
+    def merge(self, other):
+        for name in COUNTERS + TIMERS:
+            if name != "peak_heap":
+                setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.peak_heap = max(self.peak_heap, other.peak_heap)
+
+    @contextmanager
+    def timer(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            setattr(self, name, getattr(self, name) + time.perf_counter() - started)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in COUNTERS + TIMERS}
+
+    def log(self, **context):
+        """Write the stats plus ``context`` (endpoints, constraints, outcome) as one JSON log line."""
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps(dict(context, **self.to_dict()), default=str, sort_keys=True))
+
+
+def enable_logging(stream=None):
+    """Send the JSON stats lines to ``stream`` (stderr by default); safe to call repeatedly."""
+    if not logger.handlers:
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(logging.INFO)
@@ -0,0 +1,99 @@
+"""Synthetic multimodal graphs for benchmarking the router.
+
+Builds a networkx MultiGraph shaped like the production graph: nodes
+clustered into countries with lat/lon and ``country_code``, a dense land
+network between nearby nodes, long sea legs between ports and an air
+backbone between hub airports. Edges carry ``mode``, ``time``, ``price``,
+``distance`` and the ``time_norm``/``price_norm``/``emissions_norm``
+columns, and ``graph.graph`` holds the same min/max metadata that the
+search reads.
+"""
+import random
+
+import networkx as nx
+import numpy as np
+
+from routing.costs import EMISSION_FACTORS, waiting_times
+from routing.heuristics import haversine_np
+from routing.places import _unit_vectors
+
+MODE_SPEED = {"land": 60.0, "sea": 30.0, "air": 800.0}           # km/h
+MODE_PRICE_PER_KM = {"land": 0.1, "sea": 0.02, "air": 1.0}        # $ per km
+
+COUNTRY_CODES = sorted(waiting_times)
+
+
+def make_synthetic_graph(num_nodes=1000, num_countries=20, port_fraction=0.08,
+                         airport_fraction=0.02, land_degree=4, sea_degree=3,
+                         air_degree=4, seed=0):
+    from scipy.spatial import cKDTree
+
+    rng = np.random.default_rng(seed)
+    rnd = random.Random(seed)
+    num_countries = min(num_countries, len(COUNTRY_CODES))
+    countries = rnd.sample(COUNTRY_CODES, num_countries)
+    centers_lat = rng.uniform(-50, 60, num_countries)
+    centers_lon = rng.uniform(-170, 170, num_countries)
+
+    country = rng.integers(0, num_countries, num_nodes)
+    lat = np.clip(centers_lat[country] + rng.normal(0, 6, num_nodes), -85, 85)
+    lon = (centers_lon[country] + rng.normal(0, 8, num_nodes) + 180) % 360 - 180
+    names = [f"node_{i}" for i in range(num_nodes)]
+
+    graph = nx.MultiGraph()
+    for i in range(num_nodes):
+        graph.add_node(names[i], latitude=float(lat[i]), longitude=float(lon[i]),
+                       country_code=countries[country[i]])
+
+    xyz = _unit_vectors(lat, lon)
+    pairs = []
+
+    # Land: k nearest neighbours, mostly within a country
+    _, neighbors = cKDTree(xyz).query(xyz, k=min(land_degree + 1, num_nodes))
+    for i, row in enumerate(np.atleast_2d(neighbors)):
+        for j in row[1:]:
+            if country[i] == country[j] or rnd.random() < 0.3:
+                pairs.append((i, int(j), "land"))
+
+    # Sea and air: sparse long-range links between ports and between hubs
+    for mode, fraction, degree in (("sea", port_fraction, sea_degree), ("air", airport_fraction, air_degree)):
+        hubs = rng.choice(num_nodes, max(2, int(num_nodes * fraction)), replace=False)
+        for i in hubs:
+            for j in rng.choice(hubs, min(degree, len(hubs) - 1), replace=False):
+                if i != j:
+                    pairs.append((int(i), int(j), mode))
+
+    src = np.array([p[0] for p in pairs])
+    dst = np.array([p[1] for p in pairs])
+    modes = [p[2] for p in pairs]
+    great_circle = haversine_np(lat[src], lon[src], lat[dst], lon[dst])
+    # Real legs are longer than the great circle, sea legs most of all
+    detour = np.array([{"land": 1.3, "sea": 1.5, "air": 1.05}[m] for m in modes])
+    distance = np.maximum(great_circle * detour * rng.uniform(1.0, 1.2, len(pairs)), 1.0)
+    speed = np.array([MODE_SPEED[m] for m in modes])
+    price_per_km = np.array([MODE_PRICE_PER_KM[m] for m in modes])
+    time = distance / speed * rng.uniform(1.0, 1.5, len(pairs))
+    price = distance * price_per_km * rng.uniform(1.0, 2.0, len(pairs))
+    emissions = distance * np.array([EMISSION_FACTORS[m] for m in modes])
+
+    # Normalization bounds start at zero, like the production graph
+    bounds = {"time": (0.0, float(time.max())), "price": (0.0, float(price.max())),
+              "emissions": (0.0, float(emissions.max()))}
+
+    def norm(values, name):
+        lo, hi = bounds[name]
+        return (values - lo) / (hi - lo) * 100
+
+    time_norm, price_norm, emissions_norm = norm(time, "time"), norm(price, "price"), norm(emissions, "emissions")
+    for k, (i, j, mode) in enumerate(pairs):
+        graph.add_edge(names[i], names[j], mode=mode, distance=float(distance[k]), time=float(time[k]),
+                       price=float(price[k]), time_norm=float(time_norm[k]),
+                       price_norm=float(price_norm[k]), emissions_norm=float(emissions_norm[k]))
+
+    graph.graph.update(
+        time_min=bounds["time"][0], time_max=bounds["time"][1],
+        price_min=bounds["price"][0], price_max=bounds["price"][1],
+        emissions_min=bounds["emissions"][0], emissions_max=bounds["emissions"][1],
+        max_speed=dict(MODE_SPEED), min_price_per_km=dict(MODE_PRICE_PER_KM),
+    )
+    return graph